@@ -0,0 +1,206 @@
+"""Benchmarks of newt queues against queue.Queue and asyncio.Queue.
+
+Usage:
+
+    python -m benchmark [-k FILTER] [-o results.json] [--compare old.json]
+
+Each case runs in its own process, so that the peak RSS is of the case
+only. It only depends on the standard library.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional
+)
+
+from .cases import (
+    all_cases,
+    find_case,
+    run_case
+)
+
+
+def _peak_rss_kib() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # In bytes on macOS, but in KiB on Linux
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _run_in_process(name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    command = [
+        sys.executable, '-m', 'benchmark',
+        '--case', name,
+        '--items', str(args.items),
+        '--producers', str(args.producers),
+        '--consumers', str(args.consumers),
+        '--maxsize', str(args.maxsize)
+    ]
+
+    output = subprocess.run(
+        command, stdout=subprocess.PIPE, check=True, timeout=args.timeout
+    ).stdout
+
+    return json.loads(output)
+
+
+def _best_of(name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    results = [_run_in_process(name, args) for _ in range(args.repeat)]
+    return max(results, key=lambda result: result['throughput'])
+
+
+def _compare(
+    results: List[Dict[str, Any]],
+    path: str,
+    threshold: float
+) -> List[str]:
+    """Return the names of the cases whose throughput regressed by more
+    than `threshold` compared with the results in `path`
+    """
+
+    with open(path) as f:
+        baseline = {
+            result['name']: result
+            for result in json.load(f)['results']
+        }
+
+    regressed = []
+
+    for result in results:
+        old = baseline.get(result['name'])
+        if old is None:
+            continue
+
+        change = result['throughput'] / old['throughput'] - 1
+        print(f'{result["name"]:<56} {change:+8.1%}')
+
+        if change < -threshold:
+            regressed.append(result['name'])
+
+    return regressed
+
+
+def _print_result(result: Dict[str, Any]) -> None:
+    print(
+        f'{result["name"]:<56} '
+        f'{result["throughput"]:>12,.0f}/s '
+        f'p50 {result["latency_p50_us"]:>10.1f}us '
+        f'p99 {result["latency_p99_us"]:>10.1f}us '
+        f'rss {result["peak_rss_kib"] / 1024:>7.1f}MiB',
+        flush=True
+    )
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmark',
+        description=(
+            'Measure the throughput, the put-to-get latency and the peak RSS '
+            'of each producer/consumer topology'
+        )
+    )
+
+    parser.add_argument(
+        '-n', '--items', type=int, default=100000,
+        help='items passed through the queue in each case')
+    parser.add_argument(
+        '--producers', type=int, default=4,
+        help='the N of the N:1 and N:M topologies')
+    parser.add_argument(
+        '--consumers', type=int, default=4,
+        help='the M of the N:M topology')
+    parser.add_argument(
+        '--maxsize', type=int, default=128,
+        help='maxsize of the bounded queues')
+    parser.add_argument(
+        '--repeat', type=int, default=1,
+        help='run each case this many times, and keep the fastest run')
+    parser.add_argument(
+        '-k', '--filter', action='append', default=[],
+        help='only run the cases whose names contain all of the filters')
+    parser.add_argument(
+        '-o', '--output',
+        help='write the results as JSON to this file')
+    parser.add_argument(
+        '--compare',
+        help='compare the throughput with the results of this JSON file')
+    parser.add_argument(
+        '--threshold', type=float, default=0.1,
+        help='exit with 1 if any case is slower than --compare by more than '
+             'this fraction')
+    parser.add_argument(
+        '--timeout', type=float, default=600,
+        help='seconds before a case is killed')
+    parser.add_argument(
+        '--list', action='store_true',
+        help='list the cases and exit')
+
+    # Internal: run a single case in this process and print its result
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+
+    if args.case is not None:
+        result = run_case(
+            find_case(args.case),
+            args.items, args.producers, args.consumers, args.maxsize)
+        result['peak_rss_kib'] = _peak_rss_kib()
+        print(json.dumps(result))
+        return 0
+
+    cases = [
+        case for case in all_cases()
+        if all(pattern in case.name for pattern in args.filter)
+    ]
+
+    if args.list:
+        for case in cases:
+            print(case.name)
+        return 0
+
+    results = []
+    for case in cases:
+        result = _best_of(case.name, args)
+        _print_result(result)
+        results.append(result)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'created_at': time.time(),
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'items': args.items,
+                'producers': args.producers,
+                'consumers': args.consumers,
+                'maxsize': args.maxsize,
+                'repeat': args.repeat,
+                'results': results
+            }, f, indent=2)
+
+    if args.compare is not None:
+        regressed = _compare(results, args.compare, args.threshold)
+        if regressed:
+            print(f'{len(regressed)} case(s) regressed by more than '
+                  f'{args.threshold:.0%}')
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+import asyncio
+import queue
+import threading
+from time import perf_counter
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple
+)
+
+import newt
+
+
+DIRECTIONS = (
+    'thread->coroutine',
+    'coroutine->thread',
+    'thread->thread',
+    'coroutine->coroutine'
+)
+
+TOPOLOGIES = ('1:1', 'N:1', 'N:M')
+
+NEWT_QUEUES = ('Queue', 'LifoQueue', 'PriorityQueue')
+
+
+class Endpoints(NamedTuple):
+    """How threads and coroutines put into and get from a queue, where
+    `None` means the side is not supported by the queue
+    """
+
+    sync_put: Optional[Callable[[Any], None]]
+    sync_get: Optional[Callable[[], Any]]
+    async_put: Optional[Callable[[Any], Any]]
+    async_get: Optional[Callable[[], Any]]
+
+
+def _newt_endpoints(name: str) -> Callable[[int], Endpoints]:
+    cls = getattr(newt, name)
+
+    def create(maxsize: int) -> Endpoints:
+        q = cls(maxsize)
+        return Endpoints(
+            q.sync_queue.put,
+            q.sync_queue.get,
+            q.async_queue.put,
+            q.async_queue.get
+        )
+
+    return create
+
+
+def _queue_endpoints(maxsize: int) -> Endpoints:
+    q = queue.Queue(maxsize)
+
+    async def put_from_coroutine(item: Any) -> None:
+        # The usual way to feed threads from a coroutine, which never
+        # blocks the event loop only if the queue is unbounded
+        q.put_nowait(item)
+
+    return Endpoints(
+        q.put,
+        q.get,
+        None if maxsize else put_from_coroutine,
+        None
+    )
+
+
+def _asyncio_endpoints(maxsize: int) -> Endpoints:
+    q: asyncio.Queue = asyncio.Queue(maxsize)
+    loop = asyncio.get_running_loop()
+
+    def put_from_thread(item: Any) -> None:
+        # The usual way to feed coroutines from a thread, which could not
+        # wait for the room of a bounded queue
+        loop.call_soon_threadsafe(q.put_nowait, item)
+
+    return Endpoints(
+        None if maxsize else put_from_thread,
+        None,
+        q.put,
+        q.get
+    )
+
+
+# Name of the queue -> a function to create its endpoints with `maxsize`,
+# which is called in the event loop of the case
+QUEUES: Dict[str, Callable[[int], Endpoints]] = {
+    **{
+        f'newt.{name}': _newt_endpoints(name)
+        for name in NEWT_QUEUES
+    },
+    # Baselines
+    'queue.Queue': _queue_endpoints,
+    'asyncio.Queue': _asyncio_endpoints
+}
+
+
+class Case(NamedTuple):
+    queue: str
+    direction: str
+    topology: str
+    bounded: bool
+
+    @property
+    def name(self) -> str:
+        bound = 'bounded' if self.bounded else 'unbounded'
+        return f'{self.queue}/{self.direction}/{self.topology}/{bound}'
+
+    def workers(self, producers: int, consumers: int) -> Tuple[int, int]:
+        """Return the numbers of producers and consumers
+        """
+
+        if self.topology == '1:1':
+            return 1, 1
+        if self.topology == 'N:1':
+            return producers, 1
+        return producers, consumers
+
+
+def _supported(endpoints: Endpoints, direction: str) -> bool:
+    producer, consumer = direction.split('->')
+    put = endpoints.sync_put if producer == 'thread' else endpoints.async_put
+    get = endpoints.sync_get if consumer == 'thread' else endpoints.async_get
+    return put is not None and get is not None
+
+
+# Which sides each baseline supports, without creating the queue
+_BASELINE_DIRECTIONS = {
+    'queue.Queue': {
+        True: ('thread->thread',),
+        False: ('thread->thread', 'coroutine->thread')
+    },
+    'asyncio.Queue': {
+        True: ('coroutine->coroutine',),
+        False: ('coroutine->coroutine', 'thread->coroutine')
+    }
+}
+
+
+def all_cases() -> List[Case]:
+    cases = []
+
+    for name in QUEUES:
+        for direction in DIRECTIONS:
+            for topology in TOPOLOGIES:
+                for bounded in (False, True):
+                    directions = _BASELINE_DIRECTIONS.get(name)
+                    if directions is not None and (
+                        direction not in directions[bounded]
+                    ):
+                        continue
+
+                    cases.append(Case(name, direction, topology, bounded))
+
+    return cases
+
+
+def find_case(name: str) -> Case:
+    for case in all_cases():
+        if case.name == name:
+            return case
+
+    raise ValueError(f'unknown case {name!r}')
+
+
+# Producers and consumers
+# --------------------------------------------------------------
+# Each item is the `perf_counter()` when it is put, which is comparable
+# for PriorityQueue, and from which the consumer measures the latency
+
+def _produce_sync(put: Callable, count: int) -> None:
+    for _ in range(count):
+        put(perf_counter())
+
+
+def _consume_sync(get: Callable, count: int, latencies: List[float]) -> None:
+    append = latencies.append
+    for _ in range(count):
+        item = get()
+        append(perf_counter() - item)
+
+
+async def _produce_async(put: Callable, count: int) -> None:
+    for _ in range(count):
+        await put(perf_counter())
+
+
+async def _consume_async(
+    get: Callable,
+    count: int,
+    latencies: List[float]
+) -> None:
+    append = latencies.append
+    for _ in range(count):
+        item = await get()
+        append(perf_counter() - item)
+
+
+def _split(items: int, workers: int) -> List[int]:
+    share, rest = divmod(items, workers)
+    return [share + (i < rest) for i in range(workers)]
+
+
+async def _run(
+    case: Case,
+    items: int,
+    producers: int,
+    consumers: int,
+    maxsize: int
+) -> Dict[str, Any]:
+    endpoints = QUEUES[case.queue](maxsize if case.bounded else 0)
+    if not _supported(endpoints, case.direction):
+        raise ValueError(f'{case.queue} does not support {case.direction}')
+
+    producer_side, consumer_side = case.direction.split('->')
+    producers, consumers = case.workers(producers, consumers)
+    loop = asyncio.get_running_loop()
+
+    threads: List[threading.Thread] = []
+    coroutines = []
+    latencies: List[List[float]] = []
+
+    for count in _split(items, producers):
+        if producer_side == 'thread':
+            threads.append(threading.Thread(
+                target=_produce_sync, args=(endpoints.sync_put, count)))
+        else:
+            coroutines.append(_produce_async(endpoints.async_put, count))
+
+    for count in _split(items, consumers):
+        samples: List[float] = []
+        latencies.append(samples)
+
+        if consumer_side == 'thread':
+            threads.append(threading.Thread(
+                target=_consume_sync,
+                args=(endpoints.sync_get, count, samples)))
+        else:
+            coroutines.append(
+                _consume_async(endpoints.async_get, count, samples))
+
+    start = perf_counter()
+
+    for thread in threads:
+        thread.start()
+
+    await asyncio.gather(*coroutines)
+
+    for thread in threads:
+        await loop.run_in_executor(None, thread.join)
+
+    seconds = perf_counter() - start
+
+    merged = sorted(
+        latency
+        for samples in latencies
+        for latency in samples
+    )
+
+    return {
+        'name': case.name,
+        'queue': case.queue,
+        'direction': case.direction,
+        'topology': case.topology,
+        'bounded': case.bounded,
+        'producers': producers,
+        'consumers': consumers,
+        'maxsize': maxsize if case.bounded else 0,
+        'items': items,
+        'seconds': seconds,
+        'throughput': items / seconds,
+        'latency_p50_us': _percentile(merged, 50) * 1e6,
+        'latency_p99_us': _percentile(merged, 99) * 1e6
+    }
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.
+
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+def run_case(
+    case: Case,
+    items: int,
+    producers: int,
+    consumers: int,
+    maxsize: int
+) -> Dict[str, Any]:
+    """Run `case` in a new event loop of the current thread, and return its
+    result without the memory usage
+    """
+
+    return asyncio.run(_run(case, items, producers, consumers, maxsize))
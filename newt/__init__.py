@@ -1,10 +1,17 @@
+from asyncio import AbstractEventLoop
 from heapq import heappop, heappush
 from typing import (
+    Any,
+    Callable,
+    Deque,
+    Generic,
     List,
-    Deque
+    Optional
 )
 
 from collections import deque
+from itertools import count
+from operator import itemgetter
 
 from .common import (
     T,
@@ -13,11 +20,30 @@ from .common import (
 from .queue import AbstractQueue
 from .proxy_sync import SyncQueueProxy
 from .proxy_async import AsyncQueueProxy
+from .spsc import SPSCQueue
+from .delay import DelayQueue
+from .process import ProcessQueue
+from .spill import SpillQueue
+from .durable import DurableQueue
+from .arena import BytesQueue, BytesChunk
+from .metrics import render_prometheus
 
 __all__ = (
     'Queue',
     'PriorityQueue',
-    'LifoQueue'
+    'IndexedPriorityQueue',
+    'BucketPriorityQueue',
+    'PriorityHandle',
+    'LifoQueue',
+    'RingQueue',
+    'DelayQueue',
+    'SpillQueue',
+    'DurableQueue',
+    'BytesQueue',
+    'BytesChunk',
+    'SPSCQueue',
+    'ProcessQueue',
+    'render_prometheus'
 )
 
 
@@ -34,8 +60,17 @@ class _AbstractQueue(AbstractQueue[T]):
     def async_queue(self) -> AsyncQueueProxy[T]:
         return AsyncQueueProxy(self)
 
+    def _create_async_proxy(
+        self,
+        loop: AbstractEventLoop
+    ) -> AsyncQueueProxy[T]:
+        return AsyncQueueProxy(self, loop)
+
 
 class Queue(_AbstractQueue[T]):
+    _overflow_policies = ('block', 'drop_newest', 'drop_oldest')
+    _handoff = True
+
     _queue: Deque
 
     def _init(self, maxsize: int) -> None:
@@ -52,33 +87,448 @@ class Queue(_AbstractQueue[T]):
     def _get(self) -> T:
         return self._queue.popleft()
 
+    def _drop_oldest(self) -> T:
+        return self._queue.popleft()
+
+    def _requeue_front(self, item: T) -> None:
+        self._queue.appendleft(item)
+
+
+class RingQueue(_AbstractQueue[T]):
+    """Variant of bounded Queue which preallocates `maxsize` slots and uses
+    them as a ring buffer, so that memory usage stays stable however the
+    queue fills and drains.
+    """
+
+    _overflow_policies = ('block', 'drop_newest', 'drop_oldest')
+    _handoff = True
+
+    _ring: List
+
+    def _init(self, maxsize: int) -> None:
+        if maxsize <= 0:
+            raise ValueError("'maxsize' must be a positive number")
+
+        self._ring = [None] * maxsize
+        self._head = 0
+        self._size = 0
+
+    def _qsize(self) -> int:
+        return self._size
+
+    def _put(self, item: T) -> None:
+        self._ring[(self._head + self._size) % self._maxsize] = item
+        self._size += 1
+
+    def _get(self) -> T:
+        ring = self._ring
+        head = self._head
+
+        item = ring[head]
+        # Release the reference of the item
+        ring[head] = None
+
+        self._head = (head + 1) % self._maxsize
+        self._size -= 1
+        return item
+
+    def _drop_oldest(self) -> T:
+        return self._get()
+
+    def _requeue_front(self, item: T) -> None:
+        # The slot of the only handed item is reserved for it, so the ring
+        # is never full here
+        self._head = (self._head - 1) % self._maxsize
+        self._ring[self._head] = item
+        self._size += 1
+
 
 class PriorityQueue(_AbstractQueue[T]):
     """Variant of Queue that retrieves open entries in priority order
     (lowest first).
 
     Entries are typically tuples of the form: (priority number, data).
+
+    If `key` is specified, the priority of an entry is `key(entry)`. The
+    entries themselves are then never compared, and entries of equal
+    priorities are retrieved in FIFO order.
     """
 
-    _heap_queue: List[T]
+    _overflow_policies = ('block', 'drop_newest', 'evict_lowest_priority')
+
+    # Without `key`, the heap contains the entries themselves. Otherwise,
+    # it contains (priority, insertion sequence, entry), and since the
+    # sequence is unique, comparisons never fall back to the entry
+    _heap_queue: List
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        *,
+        key: Optional[Callable[[T], Any]] = None,
+        sizer: Optional[Callable[[T], int]] = None,
+        maxcost: int = 0,
+        overflow: str = 'block'
+    ) -> None:
+        self._key = key
+        super().__init__(
+            maxsize, sizer=sizer, maxcost=maxcost, overflow=overflow)
 
     def _init(self, maxsize: int) -> None:
         self._heap_queue = []
+        self._seq = count()
 
     def _qsize(self) -> int:
         return len(self._heap_queue)
 
     def _put(self, item: T) -> None:
-        heappush(self._heap_queue, item)
+        key = self._key
+        if key is None:
+            heappush(self._heap_queue, item)
+        else:
+            heappush(self._heap_queue, (key(item), next(self._seq), item))
 
     def _get(self) -> T:
-        return heappop(self._heap_queue)
+        entry = heappop(self._heap_queue)
+        return entry if self._key is None else entry[2]
+
+    def _evict_for(self, item: T) -> Optional[T]:
+        """Evict the entry of the lowest priority if `item` has a higher
+        priority.
+
+        Finding the entry scans the leaves, which are half of the heap, so
+        it is O(n), while the heap is restored in O(log n).
+        """
+
+        heap = self._heap_queue
+        size = len(heap)
+
+        # The entry of the lowest priority is one of the leaves
+        index = max(range(size >> 1, size), key=heap.__getitem__)
+        entry = heap[index]
+
+        if self._key is None:
+            if not item < entry:
+                return None
+        elif not self._key(item) < entry[0]:
+            return None
+
+        last = heap.pop()
+        if index < len(heap):
+            heap[index] = last
+            # A leaf has no children, so the last entry moved into it
+            # could only be out of order with its ancestors
+            _sift_up(heap, index)
+
+        return entry if self._key is None else entry[2]
+
+
+def _sift_up(heap: List, index: int) -> None:
+    entry = heap[index]
+
+    while index > 0:
+        parent_index = (index - 1) >> 1
+        parent = heap[parent_index]
+        if not entry < parent:
+            break
+
+        heap[index] = parent
+        index = parent_index
+
+    heap[index] = entry
+
+
+class BucketPriorityQueue(_AbstractQueue[T]):
+    """Variant of PriorityQueue for small integer priorities in
+    `range(levels)`, with O(1) put and get.
+
+    Entries are typically tuples of the form: (priority number, data), and
+    the priority of an entry is `key(entry)` if `key` is specified, or
+    `entry[0]` otherwise. Entries of equal priorities are retrieved in FIFO
+    order.
+    """
+
+    _overflow_policies = ('block', 'drop_newest', 'evict_lowest_priority')
+
+    _buckets: List[Deque[T]]
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        *,
+        levels: int = 16,
+        key: Optional[Callable[[T], int]] = None,
+        sizer: Optional[Callable[[T], int]] = None,
+        maxcost: int = 0,
+        overflow: str = 'block'
+    ) -> None:
+        if levels <= 0:
+            raise ValueError("'levels' must be a positive number")
+
+        self._levels = levels
+        self._key = itemgetter(0) if key is None else key
+        super().__init__(
+            maxsize, sizer=sizer, maxcost=maxcost, overflow=overflow)
+
+    def _init(self, maxsize: int) -> None:
+        self._buckets = [deque() for _ in range(self._levels)]
+        # Bit `n` is set if the bucket of priority `n` is not empty
+        self._bitmap = 0
+        self._size = 0
+
+    def _qsize(self) -> int:
+        return self._size
+
+    def _priority(self, item: T) -> int:
+        priority = self._key(item)
+        if not 0 <= priority < self._levels:
+            raise ValueError(
+                f'priority must be in range({self._levels}), '
+                f'but got {priority!r}'
+            )
+
+        return priority
+
+    def _put(self, item: T) -> None:
+        priority = self._priority(item)
+
+        self._buckets[priority].append(item)
+        self._bitmap |= 1 << priority
+        self._size += 1
+
+    def _get(self) -> T:
+        bitmap = self._bitmap
+        # The lowest set bit is the lowest non-empty priority
+        priority = (bitmap & -bitmap).bit_length() - 1
+
+        bucket = self._buckets[priority]
+        item = bucket.popleft()
+        if not bucket:
+            self._bitmap = bitmap & ~(1 << priority)
+
+        self._size -= 1
+        return item
+
+    def _evict_for(self, item: T) -> Optional[T]:
+        bitmap = self._bitmap
+        # The highest set bit is the lowest non-empty priority
+        lowest = bitmap.bit_length() - 1
+
+        if self._priority(item) >= lowest:
+            return None
+
+        # The newest item of the lowest priority is evicted
+        bucket = self._buckets[lowest]
+        evicted = bucket.pop()
+        if not bucket:
+            self._bitmap = bitmap & ~(1 << lowest)
+
+        self._size -= 1
+        return evicted
+
+
+class PriorityHandle(Generic[T]):
+    """The handle of an item in an `IndexedPriorityQueue`, which is returned
+    by `put()`.
+    """
+
+    __slots__ = ('item', '_key', '_index')
+
+    def __init__(self, item: T, priority: Any, seq: int) -> None:
+        self.item = item
+        # Heap entries only compare (priority, seq), never the item
+        self._key = (priority, seq)
+        # The position in the heap, or -1 if it is no longer in the queue
+        self._index = -1
+
+    @property
+    def priority(self) -> Any:
+        return self._key[0]
+
+    @property
+    def queued(self) -> bool:
+        """Whether the item is still in the queue
+        """
+
+        return self._index >= 0
+
+
+class IndexedPriorityQueue(_AbstractQueue[T]):
+    """Variant of PriorityQueue whose `put()` returns a `PriorityHandle`,
+    with which the item could be re-prioritized or removed in O(log n).
+
+    The priority of an item is `key(item)`, or the item itself if `key` is
+    not specified. Items of equal priorities are retrieved in FIFO order.
+    """
+
+    _overflow_policies = ('block', 'drop_newest', 'evict_lowest_priority')
+
+    _heap: List[PriorityHandle[T]]
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        *,
+        key: Optional[Callable[[T], Any]] = None,
+        sizer: Optional[Callable[[T], int]] = None,
+        maxcost: int = 0,
+        overflow: str = 'block'
+    ) -> None:
+        self._key = key
+        super().__init__(
+            maxsize, sizer=sizer, maxcost=maxcost, overflow=overflow)
+
+    def update_priority(
+        self,
+        handle: PriorityHandle[T],
+        priority: Any
+    ) -> bool:
+        """Change the priority of a queued item.
+
+        Returns `False` if the item is no longer in the queue.
+        """
+
+        with self._sync_mutex:
+            index = handle._index
+            if index < 0:
+                return False
+
+            old_key = handle._key
+            handle._key = (priority, old_key[1])
+
+            if handle._key < old_key:
+                self._sift_up(index)
+            else:
+                self._sift_down(index)
+
+            return True
+
+    def remove(self, handle: PriorityHandle[T]) -> bool:
+        """Remove a queued item, which then doesn't need `task_done()`.
+
+        Returns `False` if the item is no longer in the queue.
+        """
+
+        with self._sync_mutex:
+            if handle._index < 0:
+                return False
+
+            self._remove_at(handle._index)
+            self._discard_internal([handle.item])
+            return True
+
+    def peek(self) -> T:
+        """Return the item of the lowest priority without removing it.
+
+        Raises `IndexError` if the queue is empty.
+        """
+
+        with self._sync_mutex:
+            if not self._heap:
+                raise IndexError('peek from an empty queue')
+
+            return self._heap[0].item
+
+    def _init(self, maxsize: int) -> None:
+        self._heap = []
+        self._seq = 0
+
+    def _qsize(self) -> int:
+        return len(self._heap)
+
+    def _put(self, item: T) -> PriorityHandle[T]:
+        priority = item if self._key is None else self._key(item)
+        handle = PriorityHandle(item, priority, self._seq)
+        self._seq += 1
+
+        index = len(self._heap)
+        handle._index = index
+        self._heap.append(handle)
+        self._sift_up(index)
+        return handle
+
+    def _get(self) -> T:
+        return self._remove_at(0).item
+
+    def _evict_for(self, item: T) -> Optional[T]:
+        heap = self._heap
+        size = len(heap)
+
+        # The handle of the lowest priority is one of the leaves
+        index = max(range(size >> 1, size), key=lambda i: heap[i]._key)
+        priority = item if self._key is None else self._key(item)
+
+        if not priority < heap[index].priority:
+            return None
+
+        return self._remove_at(index).item
+
+    def _remove_at(self, index: int) -> PriorityHandle[T]:
+        heap = self._heap
+        handle = heap[index]
+        last = heap.pop()
+
+        if last is not handle:
+            heap[index] = last
+            last._index = index
+            self._sift_down(index)
+            self._sift_up(last._index)
+
+        handle._index = -1
+        return handle
+
+    def _sift_up(self, index: int) -> None:
+        heap = self._heap
+        handle = heap[index]
+        key = handle._key
+
+        while index > 0:
+            parent_index = (index - 1) >> 1
+            parent = heap[parent_index]
+            if key >= parent._key:
+                break
+
+            heap[index] = parent
+            parent._index = index
+            index = parent_index
+
+        heap[index] = handle
+        handle._index = index
+
+    def _sift_down(self, index: int) -> None:
+        heap = self._heap
+        size = len(heap)
+        handle = heap[index]
+        key = handle._key
+
+        while True:
+            child_index = 2 * index + 1
+            if child_index >= size:
+                break
+
+            right = child_index + 1
+            if right < size and heap[right]._key < heap[child_index]._key:
+                child_index = right
+
+            child = heap[child_index]
+            if key <= child._key:
+                break
+
+            heap[index] = child
+            child._index = index
+            index = child_index
+
+        heap[index] = handle
+        handle._index = index
 
 
 class LifoQueue(_AbstractQueue[T]):
     """Variant of Queue that retrieves most recently added entries first.
     """
 
+    _overflow_policies = ('block', 'drop_newest', 'drop_oldest')
+    _handoff = True
+
     _queue: Deque
 
     def _init(self, maxsize: int) -> None:
@@ -92,3 +542,11 @@ class LifoQueue(_AbstractQueue[T]):
 
     def _get(self) -> T:
         return self._queue.pop()
+
+    def _drop_oldest(self) -> T:
+        return self._queue.popleft()
+
+    # The item is older than any item put after it,
+    # so it goes to the bottom of the stack
+    def _requeue_front(self, item: T) -> None:
+        self._queue.appendleft(item)
@@ -0,0 +1,217 @@
+from asyncio import AbstractEventLoop
+from collections import deque
+
+from typing import (
+    Deque,
+    Optional,
+    Union
+)
+
+from .common import lazy_property
+from .queue import AbstractQueue
+from .proxy_sync import SyncQueueProxy
+from .proxy_async import AsyncQueueProxy
+
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class BytesChunk:
+    """A chunk of `BytesQueue`, which is a read-only view of the arena of
+    the queue.
+
+    The room of the chunk is reused once it is released by `release()` or
+    by leaving the `with` block, after which the chunk should not be
+    accessed, including any slice of `view`.
+    """
+
+    __slots__ = ('_parent', '_view', '_end', '_released')
+
+    def __init__(
+        self,
+        parent: 'BytesQueue',
+        view: memoryview,
+        end: int
+    ) -> None:
+        self._parent = parent
+        self._view = view
+        # The end offset of the room of the chunk in the ring
+        self._end = end
+        self._released = False
+
+    @property
+    def view(self) -> memoryview:
+        if self._released:
+            raise ValueError('operation on a released chunk')
+
+        return self._view
+
+    @property
+    def released(self) -> bool:
+        return self._released
+
+    def __len__(self) -> int:
+        return self._view.nbytes
+
+    def __bytes__(self) -> bytes:
+        return self.view.tobytes()
+
+    def tobytes(self) -> bytes:
+        return self.view.tobytes()
+
+    def __enter__(self) -> memoryview:
+        return self.view
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+    def release(self) -> None:
+        """Release the room of the chunk. It is safe to call it more than
+        once.
+        """
+
+        if not self._released:
+            self._parent._release(self)
+
+
+class BytesQueue(AbstractQueue[BytesChunk]):
+    """FIFO queue of bytes-like objects, which is bounded by `capacity` in
+    bytes instead of the number of items.
+
+    Items are copied into a preallocated arena, which is used as a ring
+    buffer, and getters get `BytesChunk`s which are views of the arena, so
+    there is no allocation for the data after the arena is created. An
+    item is only copied once, and the producer could reuse its buffer right
+    after `put()`.
+
+    The room of a chunk is only reused after the chunk is released, so
+    every chunk which is got must be released. An item should be at most
+    `capacity` bytes, otherwise `put()` raises `ValueError`.
+    """
+
+    _traceable = False
+
+    _chunks: Deque[BytesChunk]
+    _rooms: Deque[BytesChunk]
+
+    def __init__(self, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError("'capacity' must be a positive number")
+
+        self._capacity = capacity
+        super().__init__()
+
+    @lazy_property
+    def sync_queue(self) -> SyncQueueProxy[BytesChunk]:
+        return SyncQueueProxy(self)
+
+    @lazy_property
+    def async_queue(self) -> AsyncQueueProxy[BytesChunk]:
+        return AsyncQueueProxy(self)
+
+    def _create_async_proxy(
+        self,
+        loop: AbstractEventLoop
+    ) -> AsyncQueueProxy[BytesChunk]:
+        return AsyncQueueProxy(self, loop)
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def used(self) -> int:
+        """Bytes of the arena which are not released, including the padding
+        where an item did not fit before the end of the arena
+        """
+
+        return self._tail - self._head
+
+    def _init(self, maxsize: int) -> None:
+        self._arena = memoryview(bytearray(self._capacity))
+
+        # Offsets of the ring which only increase
+        self._head = 0
+        self._tail = 0
+
+        # Chunks which are not got yet
+        self._chunks = deque()
+        # Chunks which are not released yet, in the order of the ring
+        self._rooms = deque()
+
+    def _qsize(self) -> int:
+        return len(self._chunks)
+
+    def _full(self) -> bool:
+        return self._tail - self._head >= self._capacity
+
+    def _full_for(self, item: BytesLike) -> bool:
+        return self._room_end(_nbytes(item)) is None
+
+    def _room_end(self, size: int) -> Optional[int]:
+        """Return the end offset of the room for `size` bytes, or `None` if
+        there is not enough room
+        """
+
+        capacity = self._capacity
+        if size > capacity:
+            raise ValueError(
+                f'the item of {size} bytes exceeds the capacity')
+
+        tail = self._tail
+        offset = tail % capacity
+
+        end = tail + size
+        if offset + size > capacity:
+            # A chunk is contiguous, so it starts from the beginning of
+            # the arena if it does not fit before the end
+            end += capacity - offset
+
+        return None if end - self._head > capacity else end
+
+    def _put(self, item: BytesLike) -> None:
+        data = memoryview(item).cast('B')
+        size = data.nbytes
+
+        end = self._room_end(size)
+        start = (end - size) % self._capacity
+
+        self._arena[start:start + size] = data
+
+        chunk = BytesChunk(
+            self, self._arena[start:start + size].toreadonly(), end)
+        self._tail = end
+        self._chunks.append(chunk)
+        self._rooms.append(chunk)
+
+    def _get(self) -> BytesChunk:
+        return self._chunks.popleft()
+
+    def _release(self, chunk: BytesChunk) -> None:
+        with self._sync_mutex:
+            if chunk._released:
+                return
+
+            chunk._released = True
+            chunk._view.release()
+
+            rooms = self._rooms
+            head = self._head
+            while rooms and rooms[0]._released:
+                head = rooms.popleft()._end
+
+            if head == self._head:
+                # An earlier chunk is not released yet
+                return
+
+            self._head = head
+
+            # The room is offered to every putter,
+            # since items differ in size
+            self._notify_sync_not_full(self._sync_putters)
+            self._notify_async_not_full(
+                len(self._async_putters), threadsafe=True)
+
+
+def _nbytes(item: BytesLike) -> int:
+    return item.nbytes if isinstance(item, memoryview) else len(item)
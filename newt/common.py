@@ -9,6 +9,13 @@ import asyncio
 T = TypeVar('T')
 OptInt = Optional[int]
 
+# The default number of items fetched at a time by queue iterators
+ITER_CHUNK_SIZE = 64
+
+# What a blocked getter is woken up with if it is not handed an item,
+# which is distinct from any item including `None`
+WOKEN = object()
+
 
 def lazy_property(fn: Callable[..., T]):
     """
@@ -30,20 +37,6 @@ def lazy_property(fn: Callable[..., T]):
     return property(helper)
 
 
-def has_loop(fn):
-    """
-    Only execute fn when there is a loop
-    """
-
-    def helper(self, *args, **kwargs) -> None:
-        if self._loop_ is None:
-            return
-
-        fn(self, *args, **kwargs)
-
-    return helper
-
-
 def check_closing(fn: Callable[..., T]):
     def helper(self, *args, **kwargs) -> T:
         if self._parent._closing:
@@ -0,0 +1,213 @@
+from asyncio import AbstractEventLoop
+from heapq import heappop, heappush
+from itertools import count
+from collections import deque
+import time
+
+from typing import (
+    Any,
+    Deque,
+    Generic,
+    List,
+    Optional,
+    Tuple
+)
+
+from .common import (
+    T,
+    OptInt,
+    lazy_property
+)
+from .queue import AbstractQueue
+from .proxy_sync import SyncQueueProxy
+from .proxy_async import AsyncQueueProxy
+
+
+class _Delayed(Generic[T]):
+    __slots__ = ('due', 'item')
+
+    def __init__(self, due: float, item: T) -> None:
+        self.due = due
+        self.item = item
+
+
+def _delayed(
+    item: T,
+    delay: Optional[float],
+    at: Optional[float]
+) -> Any:
+    if delay is None:
+        if at is None:
+            return item
+
+        # `at` is a `time.time()` timestamp,
+        # but due times are kept in the monotonic clock
+        delay = at - time.time()
+
+    elif at is not None:
+        raise ValueError("'delay' and 'at' could not be both specified")
+
+    if delay <= 0:
+        return item
+
+    return _Delayed(time.monotonic() + delay, item)
+
+
+class DelayQueue(AbstractQueue[T]):
+    """Variant of Queue whose items could be put with a `delay` in seconds,
+    or `at` a `time.time()` timestamp, and only become available to getters
+    once they are due.
+
+    Items which are due are retrieved in FIFO order of when they became
+    due. `qsize()` only counts the items which are due, while `maxsize`
+    bounds all items in the queue.
+    """
+
+    _traceable = False
+
+    _ready: Deque[T]
+    _delayed: List[Tuple[float, int, T]]
+
+    @lazy_property
+    def sync_queue(self) -> 'DelaySyncQueueProxy[T]':
+        return DelaySyncQueueProxy(self)
+
+    @lazy_property
+    def async_queue(self) -> 'DelayAsyncQueueProxy[T]':
+        return DelayAsyncQueueProxy(self)
+
+    def _create_async_proxy(
+        self,
+        loop: AbstractEventLoop
+    ) -> 'DelayAsyncQueueProxy[T]':
+        return DelayAsyncQueueProxy(self, loop)
+
+    def _init(self, maxsize: int) -> None:
+        self._ready = deque()
+        # A heap of (due time, insertion sequence, item)
+        self._delayed = []
+        self._seq = count()
+
+    def _qsize(self) -> int:
+        # Also called without the mutex by `qsize()` and `empty()`, so due
+        # items are only counted here, and moved by `_promote()`
+        size = len(self._ready)
+        delayed = self._delayed
+
+        if not delayed:
+            return size
+
+        now = time.monotonic()
+        # Due items form a subtree at the root of the heap
+        stack = [0]
+
+        try:
+            while stack:
+                index = stack.pop()
+                if index >= len(delayed) or delayed[index][0] > now:
+                    continue
+
+                size += 1
+                child = 2 * index + 1
+                stack.append(child)
+                stack.append(child + 1)
+        except IndexError:
+            # Items promoted concurrently, so the size is approximate
+            pass
+
+        return size
+
+    def _promote(self) -> None:
+        delayed = self._delayed
+
+        if delayed:
+            now = time.monotonic()
+            ready = self._ready
+            while delayed and delayed[0][0] <= now:
+                ready.append(heappop(delayed)[2])
+
+    def _full(self) -> bool:
+        return 0 < self._maxsize <= len(self._ready) + len(self._delayed)
+
+    def _cost_of(self, item: Any) -> int:
+        if isinstance(item, _Delayed):
+            item = item.item
+
+        return self._sizer(item)
+
+    def _put(self, item: Any) -> None:
+        if isinstance(item, _Delayed):
+            heappush(self._delayed, (item.due, next(self._seq), item.item))
+        else:
+            # Items which became due before are retrieved first
+            self._promote()
+            self._ready.append(item)
+
+    def _get(self) -> T:
+        self._promote()
+        return self._ready.popleft()
+
+    def _ready_in(self) -> Optional[float]:
+        if not self._delayed:
+            return None
+
+        return max(self._delayed[0][0] - time.monotonic(), 0.)
+
+
+class DelaySyncQueueProxy(SyncQueueProxy[T]):
+    def put(
+        self,
+        item: T,
+        block: bool = True,
+        timeout: OptInt = None,
+        *,
+        delay: Optional[float] = None,
+        at: Optional[float] = None
+    ) -> None:
+        """Put item into the queue, which becomes available after `delay`
+        seconds, or at the `time.time()` timestamp `at`.
+
+        `block` and `timeout` are the same as `SyncQueueProxy.put()`, and
+        are about waiting for a free slot of a bounded queue.
+        """
+
+        super().put(_delayed(item, delay, at), block, timeout)
+
+    def put_nowait(
+        self,
+        item: T,
+        *,
+        delay: Optional[float] = None,
+        at: Optional[float] = None
+    ) -> None:
+        self.put(item, False, delay=delay, at=at)
+
+
+class DelayAsyncQueueProxy(AsyncQueueProxy[T]):
+    async def put(
+        self,
+        item: T,
+        timeout: Optional[float] = None,
+        *,
+        delay: Optional[float] = None,
+        at: Optional[float] = None
+    ) -> None:
+        """Put item into the queue, which becomes available after `delay`
+        seconds, or at the `time.time()` timestamp `at`.
+
+        `timeout` is the same as `AsyncQueueProxy.put()`, and is about
+        waiting for a free slot of a bounded queue.
+
+        This method is a coroutine.
+        """
+
+        await super().put(_delayed(item, delay, at), timeout)
+
+    def put_nowait(
+        self,
+        item: T,
+        *,
+        delay: Optional[float] = None,
+        at: Optional[float] = None
+    ) -> None:
+        super().put_nowait(_delayed(item, delay, at))
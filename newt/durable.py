@@ -0,0 +1,559 @@
+from asyncio import AbstractEventLoop, Future
+from collections import deque
+from contextvars import ContextVar
+import os
+import pickle
+import struct
+import threading
+import zlib
+
+from typing import (
+    Any,
+    BinaryIO,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple
+)
+
+from .common import (
+    T,
+    OptInt,
+    lazy_property,
+    get_running_loop
+)
+from .queue import AbstractQueue
+from .proxy_sync import SyncQueueProxy
+from .proxy_async import AsyncQueueProxy
+
+
+# A record is the crc32 of the rest of the record, the size of the payload,
+# the record type and the item id, followed by the payload
+_RECORD = struct.Struct('<IIBQ')
+_CHECKED = struct.Struct('<BQ')
+
+_PUT = 1
+_ACK = 2
+
+_SEGMENT_PREFIX = 'log-'
+_SEGMENT_SUFFIX = '.wal'
+
+
+def _record(kind: int, item_id: int, payload: bytes = b'') -> bytes:
+    checked = _CHECKED.pack(kind, item_id)
+    crc = zlib.crc32(payload, zlib.crc32(checked))
+    return _RECORD.pack(crc, len(payload), kind, item_id) + payload
+
+
+def _read_segment(path: str) -> Iterable[Tuple[int, int, bytes]]:
+    """Yield (type, item id, payload) of the valid records of a segment, and
+    truncate the segment after the last valid record, which is usually a
+    torn write of a crash
+    """
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    offset = 0
+    end = len(data)
+
+    while offset + _RECORD.size <= end:
+        crc, size, kind, item_id = _RECORD.unpack_from(data, offset)
+        start = offset + _RECORD.size
+        payload = data[start:start + size]
+
+        if len(payload) < size:
+            break
+
+        if zlib.crc32(
+            payload, zlib.crc32(_CHECKED.pack(kind, item_id))
+        ) != crc:
+            break
+
+        yield kind, item_id, payload
+        offset = start + size
+
+    if offset < end:
+        os.truncate(path, offset)
+
+
+class _Log:
+    """The write-ahead log of a DurableQueue, which is split into segments.
+
+    Records are appended to a buffer, and written by a committer thread in
+    batches, so that concurrent puts share one fsync. A segment is deleted
+    once it and all segments before it only contain acknowledged items.
+    """
+
+    _buffer: List[Tuple[int, bytes]]
+    _futures: Deque[Tuple[int, Future]]
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int,
+        batch_size: int,
+        max_delay: float
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+
+        self._directory = directory
+        self._segment_size = segment_size
+        self._batch_size = batch_size
+        self._max_delay = max_delay
+
+        lock = threading.Lock()
+        # Putters wait for it until their records are committed
+        self._cond = threading.Condition(lock)
+        # Only the committer waits for it
+        self._has_records = threading.Condition(lock)
+
+        # Records to write, with the segment each record belongs to
+        self._buffer = []
+        # The number of records ever appended and committed respectively
+        self._appended = 0
+        self._committed = 0
+        # Coroutines waiting for commits, which register themselves without
+        # `_cond`, so that the event loop never waits for the committer
+        self._futures = deque()
+
+        # The number of unacknowledged items by segment
+        self._unacked: Dict[int, int] = {}
+
+        self._segment = 0
+        self._segment_bytes = 0
+        self._oldest = 0
+
+        self._error: Optional[BaseException] = None
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+
+    def recover(self) -> Tuple[List[Tuple[int, int, Any]], int]:
+        """Return unacknowledged (item id, segment, item)s in order, and the
+        next item id
+        """
+
+        segments = sorted(
+            int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+            for name in os.listdir(self._directory)
+            if _is_segment(name)
+        )
+
+        items: Dict[int, Tuple[int, bytes]] = {}
+        next_id = 0
+
+        for segment in segments:
+            self._unacked[segment] = 0
+
+            for kind, item_id, payload in _read_segment(self._path(segment)):
+                if kind == _PUT:
+                    items[item_id] = (segment, payload)
+                    next_id = max(next_id, item_id + 1)
+                else:
+                    items.pop(item_id, None)
+
+        for segment, _ in items.values():
+            self._unacked[segment] += 1
+
+        if segments:
+            self._oldest = segments[0]
+            # Never append to a segment which might have a torn tail
+            self._segment = segments[-1] + 1
+        _remove_all(self._compact())
+
+        return [
+            (item_id, segment, pickle.loads(payload))
+            for item_id, (segment, payload) in items.items()
+        ], next_id
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name='newt-durable-log', daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closing = True
+            self._has_records.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+
+    def append_put(self, item_id: int, payload: bytes) -> int:
+        """Append the record of a put, and return the segment of it
+        """
+
+        record = _record(_PUT, item_id, payload)
+
+        with self._cond:
+            if self._segment_bytes >= self._segment_size:
+                self._segment += 1
+                self._segment_bytes = 0
+
+            segment = self._segment
+            self._segment_bytes += len(record)
+            self._unacked[segment] = self._unacked.get(segment, 0) + 1
+            self._append(segment, record)
+            return segment
+
+    def append_ack(self, item_id: int, segment: int) -> None:
+        record = _record(_ACK, item_id)
+
+        with self._cond:
+            self._segment_bytes += len(record)
+            self._unacked[segment] -= 1
+            self._append(self._segment, record)
+
+    def wait(self, lsn: int) -> None:
+        """Wait until the first `lsn` records are committed
+        """
+
+        with self._cond:
+            while self._committed < lsn:
+                self._raise_error()
+                self._cond.wait()
+
+    async def wait_async(self, lsn: int) -> None:
+        if self._committed >= lsn:
+            return
+
+        self._raise_error()
+        future = get_running_loop().create_future()
+        self._futures.append((lsn, future))
+
+        # The committer might have woken up the futures right before this
+        # one is registered
+        if self._committed < lsn and self._error is None:
+            await future
+
+        self._raise_error()
+
+    @property
+    def appended(self) -> int:
+        return self._appended
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(
+            self._directory,
+            f'{_SEGMENT_PREFIX}{segment:010d}{_SEGMENT_SUFFIX}'
+        )
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError('failed to write the log') from self._error
+
+    # Should be called with `_cond` held
+    def _append(self, segment: int, record: bytes) -> None:
+        self._buffer.append((segment, record))
+        self._appended += 1
+
+        # Wake up the committer for the first record to wait for a batch,
+        # and once the batch is full
+        size = len(self._buffer)
+        if size == 1 or size == self._batch_size:
+            self._has_records.notify()
+
+    def _run(self) -> None:
+        file: Optional[BinaryIO] = None
+        writing = -1
+
+        try:
+            while True:
+                with self._cond:
+                    while not self._buffer and not self._closing:
+                        self._has_records.wait()
+
+                    if not self._buffer:
+                        break
+
+                    batching = len(self._buffer) < self._batch_size
+                    if batching and not self._closing:
+                        # Group commit
+                        self._has_records.wait(self._max_delay)
+
+                    batch = self._buffer
+                    self._buffer = []
+                    lsn = self._appended
+
+                for segment, record in batch:
+                    if segment != writing:
+                        if file is not None:
+                            file.flush()
+                            os.fsync(file.fileno())
+                            file.close()
+
+                        path = self._path(segment)
+                        created = not os.path.exists(path)
+                        file = open(path, 'ab')
+                        writing = segment
+
+                        if created:
+                            # Otherwise the new segment itself could be
+                            # lost in a crash, with its committed records
+                            _fsync_directory(self._directory)
+
+                    file.write(record)
+
+                file.flush()
+                os.fsync(file.fileno())
+
+                with self._cond:
+                    self._committed = lsn
+                    self._cond.notify_all()
+                    self._wake_futures()
+                    removed = self._compact(writing)
+
+                _remove_all(removed)
+
+        except BaseException as e:
+            with self._cond:
+                self._error = e
+                self._cond.notify_all()
+                self._wake_futures(True)
+            raise
+
+        finally:
+            if file is not None:
+                file.close()
+
+    # Should be called with `_cond` held, after `_committed` or `_error` is
+    # updated
+    def _wake_futures(self, all: bool = False) -> None:
+        futures = self._futures
+        waiting = []
+
+        while futures:
+            lsn, future = futures.popleft()
+            if not all and lsn > self._committed:
+                waiting.append((lsn, future))
+                continue
+
+            try:
+                future.get_loop().call_soon_threadsafe(_set_result, future)
+            except RuntimeError:
+                # The loop is closed
+                pass
+
+        futures.extend(waiting)
+
+    # Should be called with `_cond` held, and returns the paths of the
+    # segments to remove, which are removed without it
+    def _compact(self, writing: Optional[int] = None) -> List[str]:
+        # Segments from the one being written might still get records
+        end = self._segment if writing is None else writing
+        removed = []
+
+        while self._oldest < end and not self._unacked.get(self._oldest):
+            self._unacked.pop(self._oldest, None)
+            removed.append(self._path(self._oldest))
+            self._oldest += 1
+
+        return removed
+
+
+def _is_segment(name: str) -> bool:
+    return name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)
+
+
+def _remove_all(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _fsync_directory(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _set_result(future: Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class DurableQueue(AbstractQueue[T]):
+    """FIFO queue which survives restarts, backed by a write-ahead log in
+    `directory`.
+
+    `put()` returns once the item is committed to the log, and concurrent
+    puts of threads and coroutines share one fsync: the records appended
+    during a commit are committed together by the next one. The log could
+    also wait for at most `max_delay` seconds, or until `batch_size` records
+    are appended, before each commit. Items must be picklable.
+    `put_nowait()` of `async_queue` does not wait for the commit.
+
+    `task_done()` acknowledges the earliest item got in the same thread or
+    task which is not acknowledged yet, or the earliest unacknowledged item
+    if there is none. On startup, the queue contains the items which were
+    not acknowledged, so items are delivered at least once. Acknowledgements
+    are not waited for, so an item might be delivered again if the process
+    crashes right after `task_done()`.
+
+    The log is split into segment files of about `segment_size` bytes,
+    which are deleted once all items of them are acknowledged.
+    """
+
+    _queue: Deque[Tuple[int, int, T]]
+    _in_flight: Dict[int, int]
+
+    def __init__(
+        self,
+        directory: str,
+        maxsize: int = 0,
+        *,
+        batch_size: int = 256,
+        max_delay: float = 0.,
+        segment_size: int = 64 << 20
+    ) -> None:
+        if batch_size <= 0:
+            raise ValueError("'batch_size' must be a positive number")
+
+        if max_delay < 0:
+            raise ValueError("'max_delay' must be a non-negative number")
+
+        self._log = _Log(directory, segment_size, batch_size, max_delay)
+
+        super().__init__(maxsize)
+
+        self._unfinished_tasks = len(self._queue)
+        self._log.start()
+
+    @lazy_property
+    def sync_queue(self) -> 'DurableSyncQueueProxy[T]':
+        return DurableSyncQueueProxy(self)
+
+    @lazy_property
+    def async_queue(self) -> 'DurableAsyncQueueProxy[T]':
+        return DurableAsyncQueueProxy(self)
+
+    def _create_async_proxy(
+        self,
+        loop: AbstractEventLoop
+    ) -> 'DurableAsyncQueueProxy[T]':
+        return DurableAsyncQueueProxy(self, loop)
+
+    def close(self) -> None:
+        """Close the queue, and commit the rest of the log
+        """
+
+        super().close()
+        self._log.close()
+
+    def _init(self, maxsize: int) -> None:
+        items, self._next_id = self._log.recover()
+        self._queue = deque(items)
+
+        # The segments of items which are got but not acknowledged yet,
+        # by item id in the order they were got
+        self._in_flight = {}
+        self._got: ContextVar[Optional[Deque[int]]] = ContextVar(
+            'newt_durable_got', default=None)
+
+    def _qsize(self) -> int:
+        return len(self._queue)
+
+    def _put(self, item: T) -> None:
+        item_id = self._next_id
+        self._next_id += 1
+
+        segment = self._log.append_put(
+            item_id, pickle.dumps(item, pickle.HIGHEST_PROTOCOL))
+        self._queue.append((item_id, segment, item))
+
+    def _get(self) -> T:
+        item_id, segment, item = self._queue.popleft()
+        self._in_flight[item_id] = segment
+
+        got = self._got.get()
+        if got is None:
+            got = deque()
+            self._got.set(got)
+        got.append(item_id)
+
+        return item
+
+    def _task_done(self) -> None:
+        in_flight = self._in_flight
+        got = self._got.get()
+
+        item_id = None
+        while got:
+            candidate = got.popleft()
+            if candidate in in_flight:
+                item_id = candidate
+                break
+
+        if item_id is None:
+            if not in_flight:
+                # `task_done()` is called before any `get()`
+                return
+
+            # `task_done()` is called in another thread or task than `get()`
+            item_id = next(iter(in_flight))
+
+        self._log.append_ack(item_id, in_flight.pop(item_id))
+
+
+class DurableSyncQueueProxy(SyncQueueProxy[T]):
+    def put(
+        self,
+        item: T,
+        block: bool = True,
+        timeout: OptInt = None
+    ) -> None:
+        """Put item into the queue, and return once it is committed to the
+        log.
+        """
+
+        super().put(item, block, timeout)
+        self._parent._log.wait(self._parent._log.appended)
+
+    def put_many(
+        self,
+        items: Iterable[T],
+        block: bool = True,
+        timeout: OptInt = None
+    ) -> None:
+        """Put items into the queue, and return once the items are committed
+        to the log.
+        """
+
+        super().put_many(items, block, timeout)
+        self._parent._log.wait(self._parent._log.appended)
+
+
+class DurableAsyncQueueProxy(AsyncQueueProxy[T]):
+    async def put(
+        self,
+        item: T,
+        timeout: Optional[float] = None
+    ) -> None:
+        """Put an item into the queue, and return once it is committed to the
+        log.
+
+        This method is a coroutine.
+        """
+
+        await super().put(item, timeout)
+        await self._parent._log.wait_async(self._parent._log.appended)
+
+    async def put_many(
+        self,
+        items: Iterable[T],
+        timeout: Optional[float] = None
+    ) -> None:
+        """Put items into the queue, and return once the items are committed
+        to the log.
+
+        This method is a coroutine.
+        """
+
+        await super().put_many(items, timeout)
+        await self._parent._log.wait_async(self._parent._log.appended)
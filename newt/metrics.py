@@ -0,0 +1,147 @@
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping
+)
+
+from .profile import (
+    Histogram,
+    _BUCKETS,
+    _upper_bound
+)
+
+
+class QueueMetrics:
+    """Metrics of a queue, which are only updated with `_sync_mutex` of the
+    queue held
+    """
+
+    __slots__ = (
+        'puts',
+        'gets',
+        'timeouts',
+        'max_depth',
+        'get_wait',
+        'put_wait',
+        'join_lag',
+        'finished_at'
+    )
+
+    def __init__(self) -> None:
+        self.puts = 0
+        self.gets = 0
+        # Blocking `get()`s and `put()`s which timed out
+        self.timeouts = 0
+        self.max_depth = 0
+
+        # Seconds blocked getters and putters waited, including timeouts
+        self.get_wait = Histogram()
+        self.put_wait = Histogram()
+
+        # Seconds from the last `task_done()` to the return of a blocked
+        # `join()`
+        self.join_lag = Histogram()
+        self.finished_at = 0.
+
+    def on_put(self, depth: int) -> None:
+        self.puts += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def snapshot(self, **gauges: int) -> Dict[str, Any]:
+        return {
+            'puts': self.puts,
+            'gets': self.gets,
+            'timeouts': self.timeouts,
+            'max_depth': self.max_depth,
+            'get_wait': self.get_wait.snapshot(),
+            'put_wait': self.put_wait.snapshot(),
+            'join_lag': self.join_lag.snapshot(),
+            **gauges
+        }
+
+
+# name, type, help, key of the snapshot
+_METRICS = (
+    ('newt_queue_depth', 'gauge',
+     'The number of items in the queue.', 'depth'),
+    ('newt_queue_max_depth', 'gauge',
+     'The most items the queue has held.', 'max_depth'),
+    ('newt_queue_unfinished_tasks', 'gauge',
+     'Items put but not marked done yet.', 'unfinished_tasks'),
+    ('newt_queue_puts_total', 'counter',
+     'Items put into the queue.', 'puts'),
+    ('newt_queue_gets_total', 'counter',
+     'Items got from the queue.', 'gets'),
+    ('newt_queue_timeouts_total', 'counter',
+     'Blocking gets and puts which timed out.', 'timeouts'),
+    ('newt_queue_dropped_total', 'counter',
+     'Items dropped by the overflow policy.', 'dropped'),
+    ('newt_queue_get_wait_seconds', 'histogram',
+     'Seconds blocked getters waited.', 'get_wait'),
+    ('newt_queue_put_wait_seconds', 'histogram',
+     'Seconds blocked putters waited.', 'put_wait'),
+    ('newt_queue_join_lag_seconds', 'histogram',
+     'Seconds from the last task_done() to the return of join().',
+     'join_lag')
+)
+
+
+# The upper bounds of the buckets of histograms, other than `+Inf`
+_BOUNDS = tuple(_upper_bound(index) for index in range(_BUCKETS - 1))
+
+
+def render_prometheus(queues: Mapping[str, Any]) -> str:
+    """Render the metrics of `queues`, a mapping of names to queues, in the
+    Prometheus text format, where each queue is labeled by its name.
+
+    Queues whose metrics are not enabled are skipped.
+    """
+
+    snapshots = []
+    for name, queue in queues.items():
+        snapshot = queue.metrics_snapshot()
+        if snapshot is not None:
+            snapshots.append((_label(name), snapshot))
+
+    lines: List[str] = []
+
+    for name, kind, help_text, key in _METRICS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+        for label, snapshot in snapshots:
+            value = snapshot[key]
+            if kind != 'histogram':
+                lines.append(f'{name}{{queue="{label}"}} {value}')
+                continue
+
+            # Every bound is rendered, even of empty buckets, so that the
+            # series of a histogram never change between scrapes
+            counts = dict(map(tuple, value['buckets']))
+            cumulative = 0
+            for bound in _BOUNDS:
+                cumulative += counts.get(bound, 0)
+                lines.append(
+                    f'{name}_bucket{{queue="{label}",le="{bound!r}"}} '
+                    f'{cumulative}'
+                )
+
+            lines.append(
+                f'{name}_bucket{{queue="{label}",le="+Inf"}} '
+                f'{value["count"]}'
+            )
+            lines.append(f'{name}_sum{{queue="{label}"}} {value["sum"]!r}')
+            lines.append(f'{name}_count{{queue="{label}"}} {value["count"]}')
+
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def _label(value: str) -> str:
+    return (
+        value.replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
@@ -0,0 +1,627 @@
+import asyncio
+from asyncio import (
+    AbstractEventLoop,
+    Future,
+    QueueEmpty,
+    QueueFull
+)
+import multiprocessing
+from multiprocessing import reduction
+from multiprocessing.context import BaseContext
+from multiprocessing.shared_memory import SharedMemory
+import os
+import pickle
+from queue import Empty, Full
+import select
+import struct
+import time
+
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    List,
+    Optional
+)
+
+from .common import (
+    T,
+    OptInt,
+    lazy_property,
+    check_closing,
+    get_running_loop
+)
+from .queue import _lock_async
+
+
+# The header of the shared memory, only accessed with the lock held:
+# head, tail (byte offsets which only increase), the number of frames,
+# the number of blocked getters and putters, and the closing flag
+_HEADER = struct.Struct('<6q')
+_HEAD, _TAIL, _COUNT, _GETTERS, _PUTTERS, _CLOSING = range(6)
+_FIELD = struct.Struct('<q')
+
+# Each frame is a pickled item prefixed with its length
+_FRAME = struct.Struct('<I')
+
+_TOKEN = b'\0'
+
+
+class _Doorbell:
+    """A pipe through which blocked waiters of any process are woken up.
+
+    One token is written for each waiter to wake up, and the waiter which
+    takes it is the one woken up. The read end is non-blocking, so a waiter
+    which loses the token to another one just waits again.
+    """
+
+    def __init__(self, read_fd: int, write_fd: int) -> None:
+        os.set_blocking(read_fd, False)
+
+        self._read_fd = read_fd
+        self._write_fd = write_fd
+
+        # Coroutines of this process blocked on the doorbell, by event loop
+        self._futures: Dict[AbstractEventLoop, List[Future]] = {}
+
+    def ring(self, n: int) -> None:
+        os.write(self._write_fd, _TOKEN * n)
+
+    def take(self) -> bool:
+        try:
+            return bool(os.read(self._read_fd, 1))
+        except BlockingIOError:
+            return False
+
+    def wait(self, endtime: Optional[float]) -> bool:
+        """Wait until the token is taken, or return `False` at `endtime`
+        """
+
+        while True:
+            if endtime is None:
+                timeout = None
+            else:
+                timeout = endtime - time.monotonic()
+                if timeout <= 0:
+                    return False
+
+            select.select([self._read_fd], [], [], timeout)
+
+            if self.take():
+                return True
+
+    async def wait_async(self, endtime: Optional[float]) -> bool:
+        loop = get_running_loop()
+
+        while True:
+            if endtime is None:
+                timeout = None
+            else:
+                timeout = endtime - loop.time()
+                if timeout <= 0:
+                    return False
+
+            future = loop.create_future()
+            futures = self._futures.get(loop)
+            if futures is None:
+                # The loop only watches the pipe while a coroutine is blocked
+                futures = self._futures[loop] = []
+                loop.add_reader(self._read_fd, self._on_readable, loop)
+            futures.append(future)
+
+            timer = None if timeout is None else loop.call_later(
+                timeout, _set_result, future)
+
+            try:
+                await future
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                self._discard(loop, future)
+
+            if self.take():
+                return True
+
+    def _on_readable(self, loop: AbstractEventLoop) -> None:
+        # Every blocked coroutine of the loop competes for the tokens
+        for future in self._futures.pop(loop, ()):
+            _set_result(future)
+
+        loop.remove_reader(self._read_fd)
+
+    def _discard(self, loop: AbstractEventLoop, future: Future) -> None:
+        futures = self._futures.get(loop)
+        if futures is None:
+            return
+
+        try:
+            futures.remove(future)
+        except ValueError:
+            pass
+
+        if not futures:
+            del self._futures[loop]
+            loop.remove_reader(self._read_fd)
+
+    def close(self) -> None:
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+
+def _set_result(future: Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class ProcessQueue(Generic[T]):
+    """A queue which could be shared by multiple processes, and be used by
+    threads and coroutines of each process.
+
+    Items are pickled into a ring buffer of `capacity` bytes in shared
+    memory. Blocked getters and putters of any process are woken up through
+    pipes, which coroutines watch with `loop.add_reader()`, so there is no
+    feeder thread.
+
+    The queue should be passed to child processes either by inheritance or
+    as an argument of `multiprocessing.Process`, and `ctx` should be the
+    multiprocessing context of the processes if it is not the default one.
+    It is only supported on POSIX. `task_done()` and `join()` are not
+    supported.
+
+    Coroutines never block the event loop on the lock of the queue, which
+    another process could hold while it is descheduled, but retry on later
+    iterations of the loop, and then wait for it in a thread of the default
+    executor, except `put_nowait()` and `get_nowait()` which could not wait.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1 << 20,
+        *,
+        ctx: Optional[BaseContext] = None
+    ) -> None:
+        if capacity <= _FRAME.size:
+            raise ValueError(
+                f"'capacity' must be greater than {_FRAME.size} bytes")
+
+        self._capacity = capacity
+        self._shm = SharedMemory(create=True, size=_HEADER.size + capacity)
+        self._owner = True
+
+        _HEADER.pack_into(self._shm.buf, 0, 0, 0, 0, 0, 0, 0)
+
+        self._lock = (ctx or multiprocessing).Lock()
+        self._not_empty = _Doorbell(*os.pipe())
+        self._not_full = _Doorbell(*os.pipe())
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {
+            'capacity': self._capacity,
+            'name': self._shm.name,
+            'lock': self._lock,
+            'fds': [
+                reduction.DupFd(fd)
+                for doorbell in (self._not_empty, self._not_full)
+                for fd in (doorbell._read_fd, doorbell._write_fd)
+            ]
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._capacity = state['capacity']
+        self._shm = SharedMemory(name=state['name'])
+        self._owner = False
+        self._lock = state['lock']
+
+        fds = [fd.detach() for fd in state['fds']]
+        self._not_empty = _Doorbell(fds[0], fds[1])
+        self._not_full = _Doorbell(fds[2], fds[3])
+
+    @lazy_property
+    def sync_queue(self) -> 'ProcessSyncQueueProxy[T]':
+        return ProcessSyncQueueProxy(self)
+
+    @lazy_property
+    def async_queue(self) -> 'ProcessAsyncQueueProxy[T]':
+        return ProcessAsyncQueueProxy(self)
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def close(self) -> None:
+        """Close the queue for all processes
+        """
+
+        with self._lock:
+            self._set(_CLOSING, 1)
+
+    async def wait_closed(self) -> None:
+        if not self._closing:
+            raise RuntimeError('waiting for non-closed queue')
+        # give execution chances for the pending wakeups
+        await asyncio.sleep(0)
+
+    @property
+    def closed(self) -> bool:
+        return self._closing
+
+    def release(self) -> None:
+        """Release the resources of the queue held by the current process.
+
+        The shared memory is destroyed once the process which created the
+        queue releases it, so it should be the last one to do so.
+        """
+
+        self._not_empty.close()
+        self._not_full.close()
+
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    @property
+    def _closing(self) -> bool:
+        return bool(self._header(_CLOSING))
+
+    def _header(self, field: int) -> int:
+        return _HEADER.unpack_from(self._shm.buf, 0)[field]
+
+    def _set(self, field: int, value: int) -> None:
+        _FIELD.pack_into(self._shm.buf, field * _FIELD.size, value)
+
+    def _qsize(self) -> int:
+        return self._header(_COUNT)
+
+    def _free(self) -> int:
+        head, tail = _HEADER.unpack_from(self._shm.buf, 0)[:2]
+        return self._capacity - (tail - head)
+
+    # These methods should be called with `_lock` held
+
+    def _try_put(self, frame: bytes) -> bool:
+        """Write a frame made by `_frame()` if there is enough free space
+        """
+
+        buf = self._shm.buf
+        head, tail, count, getters, putters, closing = _HEADER.unpack_from(
+            buf, 0)
+        size = len(frame)
+        if size > self._capacity - (tail - head):
+            return False
+
+        self._write(tail, frame)
+
+        if getters:
+            self._not_empty.ring(1)
+            getters -= 1
+
+        _HEADER.pack_into(
+            buf, 0, head, tail + size, count + 1, getters, putters, closing)
+        return True
+
+    def _try_get(self) -> Optional[bytes]:
+        buf = self._shm.buf
+        head, tail, count, getters, putters, closing = _HEADER.unpack_from(
+            buf, 0)
+        if not count:
+            return None
+
+        size, = _FRAME.unpack(self._read(head, _FRAME.size))
+        data = self._read(head + _FRAME.size, size)
+
+        # Frames differ in size, so the space is offered to every putter
+        if putters:
+            self._not_full.ring(putters)
+
+        _HEADER.pack_into(
+            buf, 0, head + _FRAME.size + size, tail, count - 1, getters, 0,
+            closing)
+        return data
+
+    def _add_waiter(self, field: int) -> None:
+        self._set(field, self._header(field) + 1)
+
+    def _remove_waiter(self, field: int, doorbell: _Doorbell) -> None:
+        # The waiter gives up, but it might have been woken up already,
+        # in which case the token is taken instead
+        if not doorbell.take():
+            self._set(field, self._header(field) - 1)
+
+    def _write(self, offset: int, data: bytes) -> None:
+        buf = self._shm.buf
+        capacity = self._capacity
+        start = offset % capacity
+        end = start + len(data)
+
+        if end <= capacity:
+            buf[_HEADER.size + start:_HEADER.size + end] = data
+            return
+
+        split = capacity - start
+        buf[_HEADER.size + start:_HEADER.size + capacity] = data[:split]
+        buf[_HEADER.size:_HEADER.size + end - capacity] = data[split:]
+
+    def _read(self, offset: int, size: int) -> bytes:
+        buf = self._shm.buf
+        capacity = self._capacity
+        start = offset % capacity
+        end = start + size
+
+        if end <= capacity:
+            return bytes(buf[_HEADER.size + start:_HEADER.size + end])
+
+        first = bytes(buf[_HEADER.size + start:_HEADER.size + capacity])
+        return first + bytes(buf[_HEADER.size:_HEADER.size + end - capacity])
+
+    def _frame(self, item: T) -> bytes:
+        data = pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+        frame = _FRAME.pack(len(data)) + data
+
+        if len(frame) > self._capacity:
+            raise ValueError(
+                f'the pickled item of {len(data)} bytes exceeds the capacity')
+
+        return frame
+
+
+class ProcessSyncQueueProxy(Generic[T]):
+    def __init__(self, parent: ProcessQueue[T]) -> None:
+        self._parent = parent
+
+    @property
+    def capacity(self) -> int:
+        return self._parent._capacity
+
+    def qsize(self) -> int:
+        return self._parent._qsize()
+
+    def empty(self) -> bool:
+        return not self._parent._qsize()
+
+    def full(self) -> bool:
+        return self._parent._free() <= _FRAME.size
+
+    @check_closing
+    def put(
+        self,
+        item: T,
+        block: bool = True,
+        timeout: OptInt = None
+    ) -> None:
+        """Put item into the queue, with the same `block` and `timeout`
+        semantics as `queue.Queue.put()`.
+
+        Raises `ValueError` if the pickled item could never fit in the queue.
+        """
+
+        parent = self._parent
+        frame = parent._frame(item)
+        endtime = _endtime(block, timeout)
+
+        while True:
+            with parent._lock:
+                if parent._try_put(frame):
+                    return
+
+                if not block:
+                    raise Full
+
+                parent._add_waiter(_PUTTERS)
+
+            if not parent._not_full.wait(endtime):
+                with parent._lock:
+                    parent._remove_waiter(_PUTTERS, parent._not_full)
+                    if parent._try_put(frame):
+                        return
+                raise Full
+
+    def put_nowait(self, item: T) -> None:
+        self.put(item, False)
+
+    @check_closing
+    def get(
+        self,
+        block: bool = True,
+        timeout: OptInt = None
+    ) -> T:
+        """Remove and return an item from the queue, with the same `block`
+        and `timeout` semantics as `queue.Queue.get()`.
+        """
+
+        parent = self._parent
+        endtime = _endtime(block, timeout)
+
+        while True:
+            with parent._lock:
+                data = parent._try_get()
+                if data is None:
+                    if not block:
+                        raise Empty
+
+                    parent._add_waiter(_GETTERS)
+
+            if data is not None:
+                return pickle.loads(data)
+
+            if not parent._not_empty.wait(endtime):
+                with parent._lock:
+                    parent._remove_waiter(_GETTERS, parent._not_empty)
+                    data = parent._try_get()
+
+                if data is None:
+                    raise Empty
+                return pickle.loads(data)
+
+    def get_nowait(self) -> T:
+        return self.get(False)
+
+
+class ProcessAsyncQueueProxy(Generic[T]):
+    def __init__(self, parent: ProcessQueue[T]) -> None:
+        self._parent = parent
+
+    @property
+    def capacity(self) -> int:
+        return self._parent._capacity
+
+    def qsize(self) -> int:
+        return self._parent._qsize()
+
+    def empty(self) -> bool:
+        return not self._parent._qsize()
+
+    def full(self) -> bool:
+        return self._parent._free() <= _FRAME.size
+
+    @check_closing
+    async def put(self, item: T, timeout: Optional[float] = None) -> None:
+        """Put an item into the queue, and wait for enough free space if the
+        queue is full.
+
+        If `timeout` is not `None`, raise `asyncio.TimeoutError` if there was
+        not enough free space within `timeout` seconds.
+
+        This method is a coroutine.
+        """
+
+        parent = self._parent
+        lock = parent._lock
+        frame = parent._frame(item)
+        endtime = _async_endtime(timeout)
+
+        while True:
+            if not lock.acquire(False):
+                await _lock_async(lock, endtime)
+            try:
+                if parent._try_put(frame):
+                    return
+                parent._add_waiter(_PUTTERS)
+            finally:
+                lock.release()
+
+            try:
+                woken = await parent._not_full.wait_async(endtime)
+            except BaseException:
+                await _relock_async(lock)
+                try:
+                    parent._remove_waiter(_PUTTERS, parent._not_full)
+                finally:
+                    lock.release()
+                raise
+
+            if not woken:
+                await _relock_async(lock)
+                try:
+                    parent._remove_waiter(_PUTTERS, parent._not_full)
+                    if parent._try_put(frame):
+                        return
+                finally:
+                    lock.release()
+                raise asyncio.TimeoutError
+
+    @check_closing
+    def put_nowait(self, item: T) -> None:
+        parent = self._parent
+        frame = parent._frame(item)
+
+        with parent._lock:
+            if not parent._try_put(frame):
+                raise QueueFull
+
+    @check_closing
+    async def get(self, timeout: Optional[float] = None) -> T:
+        """Remove and return an item from the queue, and wait until an item
+        is available if the queue is empty.
+
+        If `timeout` is not `None`, raise `asyncio.TimeoutError` if no item
+        was available within `timeout` seconds.
+
+        This method is a coroutine.
+        """
+
+        parent = self._parent
+        lock = parent._lock
+        endtime = _async_endtime(timeout)
+
+        while True:
+            if not lock.acquire(False):
+                await _lock_async(lock, endtime)
+            try:
+                data = parent._try_get()
+                if data is None:
+                    parent._add_waiter(_GETTERS)
+            finally:
+                lock.release()
+
+            if data is not None:
+                return pickle.loads(data)
+
+            try:
+                woken = await parent._not_empty.wait_async(endtime)
+            except BaseException:
+                await _relock_async(lock)
+                try:
+                    parent._remove_waiter(_GETTERS, parent._not_empty)
+                finally:
+                    lock.release()
+                raise
+
+            if not woken:
+                await _relock_async(lock)
+                try:
+                    parent._remove_waiter(_GETTERS, parent._not_empty)
+                    data = parent._try_get()
+                finally:
+                    lock.release()
+
+                if data is None:
+                    raise asyncio.TimeoutError
+                return pickle.loads(data)
+
+    @check_closing
+    def get_nowait(self) -> T:
+        parent = self._parent
+
+        with parent._lock:
+            data = parent._try_get()
+
+        if data is None:
+            raise QueueEmpty
+        return pickle.loads(data)
+
+
+async def _relock_async(lock: Any) -> None:
+    # Callers rely on holding the lock however it returns,
+    # so a cancellation meanwhile is only raised once it is acquired
+    cancelled = None
+
+    while not lock.acquire(False):
+        try:
+            await _lock_async(lock)
+        except asyncio.CancelledError as e:
+            cancelled = e
+        else:
+            break
+
+    if cancelled is not None:
+        raise cancelled
+
+
+def _endtime(block: bool, timeout: OptInt) -> Optional[float]:
+    if not block or timeout is None:
+        return None
+
+    if timeout < 0:
+        raise ValueError("'timeout' must be a non-negative number")
+
+    return time.monotonic() + timeout
+
+
+def _async_endtime(timeout: Optional[float]) -> Optional[float]:
+    if timeout is None:
+        return None
+
+    if timeout < 0:
+        raise ValueError("'timeout' must be a non-negative number")
+
+    return get_running_loop().time() + timeout
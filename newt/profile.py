@@ -0,0 +1,158 @@
+from asyncio import _get_running_loop
+from time import perf_counter
+
+from typing import (
+    Any,
+    Dict,
+    List,
+    Set
+)
+
+
+# Buckets of durations, of which the upper bounds are powers of two
+# microseconds, from 1μs to about 1 hour, and the last one is unbounded
+_BUCKETS = 33
+
+
+class Histogram:
+    """Histogram of durations in seconds, with logarithmic buckets
+    """
+
+    __slots__ = ('_counts', 'count', 'sum', 'max')
+
+    def __init__(self) -> None:
+        self._counts = [0] * _BUCKETS
+        self.count = 0
+        self.sum = 0.
+        self.max = 0.
+
+    def record(self, seconds: float) -> None:
+        index = int(seconds * 1e6).bit_length()
+        self._counts[index if index < _BUCKETS else _BUCKETS - 1] += 1
+
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def buckets(self) -> List[List[float]]:
+        """Return [upper bound, count] of non-empty buckets, where the upper
+        bound of the last bucket is `inf`
+        """
+
+        return [
+            [_upper_bound(index), count]
+            for index, count in enumerate(self._counts)
+            if count
+        ]
+
+    def percentile(self, percent: float) -> float:
+        """Return the upper bound of the bucket of the `percent` percentile,
+        which is at most `max`, or `0.` if there is no record
+        """
+
+        rank = self.count * percent / 100
+        seen = 0
+
+        for index, count in enumerate(self._counts):
+            seen += count
+            if count and seen >= rank:
+                return min(_upper_bound(index), self.max)
+
+        return 0.
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'buckets': self.buckets()
+        }
+
+
+def _upper_bound(index: int) -> float:
+    return float('inf') if index == _BUCKETS - 1 else (1 << index) * 1e-6
+
+
+def in_event_loop() -> bool:
+    return _get_running_loop() is not None
+
+
+class Profile:
+    """What the profiling mode of a queue records, which is only updated
+    with `_sync_mutex` of the queue held
+    """
+
+    __slots__ = (
+        'sync_lock_wait',
+        'async_lock_wait',
+        'loop_stall',
+        'wakeups_sent',
+        'wakeups_needed',
+        'cross_waiters'
+    )
+
+    def __init__(self) -> None:
+        # Contended acquisitions of the mutex only
+        self.sync_lock_wait = Histogram()
+        self.async_lock_wait = Histogram()
+        self.loop_stall = Histogram()
+
+        # Wakeups of waiters of one side from the other side, and how many
+        # of the woken waiters found what they waited for
+        self.wakeups_sent = 0
+        self.wakeups_needed = 0
+
+        # Async waiters which are woken up from the other side,
+        # until they are resumed
+        self.cross_waiters: Set[Any] = set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'sync_lock_wait': self.sync_lock_wait.snapshot(),
+            'async_lock_wait': self.async_lock_wait.snapshot(),
+            'loop_stall': self.loop_stall.snapshot(),
+            'wakeups_sent': self.wakeups_sent,
+            'wakeups_needed': self.wakeups_needed
+        }
+
+
+class ProfiledLock:
+    """Wrapper of `_sync_mutex` in the profiling mode, which records the time
+    blocked to acquire it, as a loop stall if in an event loop
+    """
+
+    __slots__ = ('lock', '_profile', 'release', 'locked')
+
+    def __init__(self, lock: Any, profile: Profile) -> None:
+        self.lock = lock
+        self._profile = profile
+        self.release = lock.release
+        self.locked = lock.locked
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        lock = self.lock
+        if lock.acquire(False):
+            return True
+
+        if not blocking:
+            return False
+
+        start = perf_counter()
+        if not lock.acquire(True, timeout):
+            return False
+
+        profile = self._profile
+        histogram = (
+            profile.loop_stall if in_event_loop()
+            else profile.sync_lock_wait
+        )
+        histogram.record(perf_counter() - start)
+        return True
+
+    __enter__ = acquire
+
+    def __exit__(self, *args) -> None:
+        self.lock.release()
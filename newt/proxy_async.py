@@ -1,10 +1,23 @@
-from typing import Generic
+import asyncio
+from asyncio import AbstractEventLoop
+from time import perf_counter
+from typing import (
+    Any,
+    AsyncIterator,
+    Generic,
+    Iterable,
+    List,
+    Optional
+)
 from asyncio import QueueEmpty
 from asyncio import QueueFull
 
 from .common import (
     T,
-    check_closing
+    ITER_CHUNK_SIZE,
+    WOKEN,
+    check_closing,
+    get_running_loop
 )
 from .queue import AbstractQueue
 
@@ -13,13 +26,24 @@ class AsyncQueueProxy(Generic[T]):
     """Create a queue object with a given maximum size.
 
     If maxsize is <= 0, the queue size is infinite.
+
+    If `loop` is specified, the proxy could only be used in the event loop
+    `loop`, otherwise it could be used in any event loop.
+
+    The coroutine methods never block the event loop for the mutex which is
+    shared with the sync side, but wait for it if it is held by a thread.
+    The other methods, such as `put_nowait()`, could only block the loop
+    while a thread holds the mutex, which is counted by `loop_stalls` and
+    `loop_stall_time` of the queue.
     """
 
     def __init__(
         self,
-        parent: AbstractQueue[T]
+        parent: AbstractQueue[T],
+        loop: Optional[AbstractEventLoop] = None
     ) -> None:
         self._parent = parent
+        self._loop = loop
 
     @property
     def maxsize(self) -> int:
@@ -41,40 +65,122 @@ class AsyncQueueProxy(Generic[T]):
         then `full()` never returns `True`.
         """
 
-        if self._parent._maxsize <= 0:
-            return False
-        else:
-            return self.qsize() >= self._parent._maxsize
+        return self._parent._full() or self._parent._over_cost()
 
     @check_closing
-    async def get(self) -> T:
+    async def get(self, timeout: Optional[float] = None) -> T:
         """Remove and return an item from the queue.
 
         If queue is empty, wait until an item is available.
+
+        If `timeout` is not `None`, raise `asyncio.TimeoutError` if no item
+        was available within `timeout` seconds.
+        """
+
+        parent = self._parent
+        self._check_loop()
+        endtime = self._endtime(timeout)
+
+        mutex = parent._sync_mutex
+        if not mutex.acquire(False):
+            await parent._lock_async(endtime)
+
+        try:
+            if parent._qsize() == 0:
+                item = await self._wait_not_empty(endtime)
+                if item is not WOKEN:
+                    # Handed directly by a putter
+                    return item
+
+            item = parent._get_internal()
+            parent._notify_async_not_full(threadsafe=False)
+            parent._notify_sync_not_full()
+            return item
+        finally:
+            mutex.release()
+
+    @check_closing
+    async def get_many(
+        self,
+        max_items: int,
+        timeout: Optional[float] = None
+    ) -> List[T]:
+        """Remove and return at most `max_items` items from the queue.
+
+        If queue is empty, wait until an item is available, then return all
+        items which are available at that moment, up to `max_items`.
+
+        If `timeout` is not `None`, raise `asyncio.TimeoutError` if no item
+        was available within `timeout` seconds.
         """
 
-        async with self._parent._async_not_empty:
-            self._parent._sync_mutex.acquire()
-            locked = True
+        if max_items <= 0:
+            raise ValueError("'max_items' must be a positive number")
+
+        parent = self._parent
+        self._check_loop()
+        endtime = self._endtime(timeout)
+
+        mutex = parent._sync_mutex
+        if not mutex.acquire(False):
+            await parent._lock_async(endtime)
+
+        try:
+            if parent._qsize() == 0:
+                item = await self._wait_not_empty(endtime)
+                if item is not WOKEN:
+                    return [item] + self._get_items(max_items - 1)
+
+            return self._get_items(max_items)
+        finally:
+            mutex.release()
+
+    async def __aiter__(self) -> AsyncIterator[T]:
+        """Iterate over items of the queue, and stop once the queue is
+        closed and drained.
+
+        Items are fetched in chunks under one lock acquisition.
+        """
+
+        async for chunk in self.chunked():
+            for item in chunk:
+                yield item
+
+    async def chunked(
+        self,
+        max_items: int = ITER_CHUNK_SIZE
+    ) -> AsyncIterator[List[T]]:
+        """Iterate over lists of at most `max_items` items of the queue, and
+        stop once the queue is closed and drained.
+        """
+
+        if max_items <= 0:
+            raise ValueError("'max_items' must be a positive number")
+
+        parent = self._parent
+        self._check_loop()
+
+        mutex = parent._sync_mutex
+
+        while True:
+            if not mutex.acquire(False):
+                await parent._lock_async()
+
             try:
-                do_wait = True
-                while do_wait:
-                    do_wait = self._parent._qsize() == 0
-
-                    if do_wait:
-                        locked = False
-                        self._parent._sync_mutex.release()
-                        await self._parent._async_not_empty.wait()
-                        self._parent._sync_mutex.acquire()
-                        locked = True
-
-                item = self._parent._get()
-                self._parent._async_not_full.notify()
-                self._parent._notify_sync_not_full()
-                return item
+                item = WOKEN
+                while item is WOKEN and parent._qsize() == 0:
+                    if parent._closing:
+                        return
+                    item = await parent._wait_async_not_empty()
+
+                if item is WOKEN:
+                    chunk = self._get_items(max_items)
+                else:
+                    chunk = [item] + self._get_items(max_items - 1)
             finally:
-                if locked:
-                    self._parent._sync_mutex.release()
+                mutex.release()
+
+            yield chunk
 
     @check_closing
     def get_nowait(self) -> T:
@@ -84,14 +190,22 @@ class AsyncQueueProxy(Generic[T]):
         else raise `QueueEmpty`.
         """
 
-        with self._parent._sync_mutex:
+        self._check_loop()
+
+        mutex = self._parent._sync_mutex
+        if not mutex.acquire(False):
+            self._parent._lock_stalling()
+
+        try:
             if self._parent._qsize() == 0:
                 raise QueueEmpty
 
-            item = self._parent._get()
+            item = self._parent._get_internal()
             self._parent._notify_async_not_full(threadsafe=False)
             self._parent._notify_sync_not_full()
             return item
+        finally:
+            mutex.release()
 
     async def join(self) -> None:
         """Block until all items in the queue have been gotten and processed.
@@ -102,61 +216,170 @@ class AsyncQueueProxy(Generic[T]):
         When the count of unfinished tasks drops to zero, `join()` unblocks.
         """
 
-        while True:
-            with self._parent._sync_mutex:
-                if self._parent._unfinished_tasks == 0:
-                    break
-            await self._parent._finished.wait()
+        self._check_loop()
+
+        parent = self._parent
+
+        mutex = parent._sync_mutex
+        if not mutex.acquire(False):
+            await parent._lock_async()
+
+        try:
+            if parent._unfinished_tasks:
+                while parent._unfinished_tasks:
+                    await parent._wait_async_finished()
+
+                parent._record_join_lag()
+        finally:
+            mutex.release()
 
     @check_closing
-    async def put(self, item: T) -> None:
+    async def put(
+        self,
+        item: T,
+        timeout: Optional[float] = None
+    ) -> Any:
         """Put an item into the queue.
 
         Put an item into the queue. If the queue is full, wait until a free
         slot is available before adding item.
 
+        If `timeout` is not `None`, raise `asyncio.TimeoutError` if no free
+        slot was available within `timeout` seconds.
+
+        If the queue has an overflow policy other than 'block', it never
+        waits, and the policy decides which item to drop if the queue is
+        full.
+
+        If the queue is empty and a getter is waiting, the item is handed
+        directly to the getter, if the queue organization allows it.
+
+        Returns what the queue organization returns for the new item, such
+        as a handle for `IndexedPriorityQueue`, or `None` for most queues or
+        if the item is dropped.
+
         This method is a coroutine.
         """
 
-        async with self._parent._async_not_full:
-            self._parent._sync_mutex.acquire()
-            locked = True
-            try:
-                if self._parent._maxsize > 0:
-                    do_wait = True
-                    while do_wait:
-                        do_wait = (
-                            self._parent._qsize() >= self._parent._maxsize
-                        )
-                        if do_wait:
-                            locked = False
-                            self._parent._sync_mutex.release()
-                            await self._parent._async_not_full.wait()
-                            self._parent._sync_mutex.acquire()
-                            locked = True
-
-                self._parent._put_internal(item)
-                self._parent._async_not_empty.notify()
-                self._parent._notify_sync_not_empty()
-            finally:
-                if locked:
-                    self._parent._sync_mutex.release()
+        parent = self._parent
+        self._check_loop()
+        endtime = self._endtime(timeout)
+
+        mutex = parent._sync_mutex
+        if not mutex.acquire(False):
+            await parent._lock_async(endtime)
+
+        try:
+            if parent._try_handoff(item, threadsafe=False):
+                return None
+
+            if parent._full_for(item):
+                if parent._overflow == 'block':
+                    await self._wait_not_full(item, endtime)
+                elif not parent._make_room(item):
+                    # Dropped by the overflow policy
+                    return None
+
+            result = parent._put_internal(item)
+            parent._notify_async_not_empty(threadsafe=False)
+            parent._notify_sync_not_empty()
+            return result
+        finally:
+            mutex.release()
 
     @check_closing
-    def put_nowait(self, item: T) -> None:
+    async def put_many(
+        self,
+        items: Iterable[T],
+        timeout: Optional[float] = None
+    ) -> None:
+        """Put items into the queue.
+
+        The mutex is acquired once for the whole batch, and waiters are
+        notified once for all items put at a time.
+
+        If the queue is bounded, items are put as long as there are free
+        slots, and it only waits for free slots for the rest of the items.
+
+        If `timeout` is not `None`, raise `asyncio.TimeoutError` if not all
+        items could be put within `timeout` seconds, in which case the items
+        before the rest are already in the queue.
+
+        This method is a coroutine.
+        """
+
+        parent = self._parent
+        self._check_loop()
+
+        items = list(items)
+        count = len(items)
+        index = 0
+        endtime = self._endtime(timeout)
+
+        mutex = parent._sync_mutex
+        if not mutex.acquire(False):
+            await parent._lock_async(endtime)
+
+        try:
+            while True:
+                put = 0
+                try:
+                    while index < count and not parent._full_for(items[index]):
+                        item = items[index]
+                        if not parent._try_handoff(item, threadsafe=False):
+                            parent._put_internal(item)
+                            put += 1
+                        index += 1
+                finally:
+                    # Also the items put before one which raised, e.g. an
+                    # invalid priority, are announced to the waiters
+                    if put:
+                        parent._notify_async_not_empty(put, threadsafe=False)
+                        parent._notify_sync_not_empty(put)
+
+                if index == count:
+                    return
+
+                if parent._overflow != 'block':
+                    if not parent._make_room(items[index]):
+                        # Dropped by the overflow policy
+                        index += 1
+                    continue
+
+                await self._wait_not_full(items[index], endtime)
+        finally:
+            mutex.release()
+
+    @check_closing
+    def put_nowait(self, item: T) -> Any:
         """Put an item into the queue without blocking.
 
         If no free slot is immediately available, raise QueueFull.
         """
 
-        with self._parent._sync_mutex:
-            if self._parent._maxsize > 0:
-                if self._parent._qsize() >= self._parent._maxsize:
+        self._check_loop()
+
+        mutex = self._parent._sync_mutex
+        if not mutex.acquire(False):
+            self._parent._lock_stalling()
+
+        try:
+            if self._parent._try_handoff(item, threadsafe=False):
+                return None
+
+            if self._parent._full_for(item):
+                if self._parent._overflow == 'block':
                     raise QueueFull
+                if not self._parent._make_room(item):
+                    # Dropped by the overflow policy
+                    return None
 
-            self._parent._put_internal(item)
+            result = self._parent._put_internal(item)
             self._parent._notify_async_not_empty(threadsafe=False)
             self._parent._notify_sync_not_empty()
+            return result
+        finally:
+            mutex.release()
 
     def qsize(self) -> int:
         """Return the number of items in the queue.
@@ -178,10 +401,98 @@ class AsyncQueueProxy(Generic[T]):
         placed in the queue.
         """
 
-        with self._parent._all_tasks_done:
+        self._check_loop()
+
+        mutex = self._parent._sync_mutex
+        if not mutex.acquire(False):
+            self._parent._lock_stalling()
+
+        try:
             if self._parent._unfinished_tasks <= 0:
                 raise ValueError('task_done() called too many times')
             self._parent._unfinished_tasks -= 1
+            self._parent._task_done()
             if self._parent._unfinished_tasks == 0:
-                self._parent._finished.set()
+                self._parent._notify_async_finished(threadsafe=False)
                 self._parent._all_tasks_done.notify_all()
+        finally:
+            mutex.release()
+
+    def _check_loop(self) -> None:
+        if self._loop is not None and self._loop is not get_running_loop():
+            raise RuntimeError(
+                'the async queue proxy is bound to a different event loop')
+
+    # The end of `timeout`, which also covers the wait for the mutex
+    def _endtime(self, timeout: Optional[float]) -> Optional[float]:
+        if timeout is None:
+            return None
+
+        if timeout < 0:
+            raise ValueError("'timeout' must be a non-negative number")
+
+        return get_running_loop().time() + timeout
+
+    # These methods should be called with `_sync_mutex` held
+
+    def _get_items(self, max_items: int) -> List[T]:
+        parent = self._parent
+        items = parent._get_items(max_items)
+        got = len(items)
+        if not got:
+            return items
+
+        parent._notify_async_not_full(got, threadsafe=False)
+        parent._notify_sync_not_full(got)
+        return items
+
+    # Only called if the queue is empty or full respectively
+
+    # Returns the item handed directly by a putter, or `WOKEN`
+    async def _wait_not_empty(self, endtime: Optional[float]) -> Any:
+        parent = self._parent
+        item = WOKEN
+        start = perf_counter()
+
+        if endtime is None:
+            while item is WOKEN and parent._qsize() == 0:
+                item = await parent._wait_async_not_empty()
+        else:
+            time = get_running_loop().time
+            try:
+                while item is WOKEN and parent._qsize() == 0:
+                    remaining = endtime - time()
+                    if remaining <= 0.0:
+                        raise asyncio.TimeoutError
+                    item = await parent._wait_async_not_empty(remaining)
+            except asyncio.TimeoutError:
+                parent._record_wait(True, start, timed_out=True)
+                raise
+
+        parent._record_wait(True, start)
+        return item
+
+    async def _wait_not_full(
+        self,
+        item: T,
+        endtime: Optional[float]
+    ) -> None:
+        parent = self._parent
+        start = perf_counter()
+
+        if endtime is None:
+            while parent._full_for(item):
+                await parent._wait_async_not_full()
+        else:
+            time = get_running_loop().time
+            try:
+                while parent._full_for(item):
+                    remaining = endtime - time()
+                    if remaining <= 0.0:
+                        raise asyncio.TimeoutError
+                    await parent._wait_async_not_full(remaining)
+            except asyncio.TimeoutError:
+                parent._record_wait(False, start, timed_out=True)
+                raise
+
+        parent._record_wait(False, start)
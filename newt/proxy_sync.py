@@ -1,10 +1,23 @@
-from typing import Generic
+from typing import (
+    Any,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional
+)
 from queue import Empty
 from queue import Full
+from time import (
+    monotonic,
+    perf_counter
+)
 
 from .common import (
     T,
     OptInt,
+    ITER_CHUNK_SIZE,
+    WOKEN,
     check_closing
 )
 from .queue import AbstractQueue
@@ -61,7 +74,7 @@ class SyncQueueProxy(Generic[T]):
         a subsequent call to `put()` will not block.
         """
 
-        return 0 < self._parent._maxsize <= self._parent._qsize()
+        return self._parent._full() or self._parent._over_cost()
 
     @check_closing
     def put(
@@ -69,7 +82,7 @@ class SyncQueueProxy(Generic[T]):
         item: T,
         block: bool = True,
         timeout: OptInt = None
-    ) -> None:
+    ) -> Any:
         """Put item into the queue.
 
         If optional args `block` is `True` and `timeout` is `None`
@@ -82,35 +95,99 @@ class SyncQueueProxy(Generic[T]):
         Otherwise (`block` is `False`), put an item on the queue if a free
         slot is immediately available, else raise the Full exception (timeout
         is ignored in that case).
+
+        If the queue has an overflow policy other than 'block', it never
+        blocks, and the policy decides which item to drop if the queue is
+        full.
+
+        If the queue is empty and a getter is blocked, the item is handed
+        directly to the getter, if the queue organization allows it.
+
+        Returns what the queue organization returns for the new item, such
+        as a handle for `IndexedPriorityQueue`, or `None` for most queues or
+        if the item is dropped.
         """
 
-        with self._parent._sync_not_full:
-            if self._parent._maxsize > 0:
-                if not block:
-                    if self._parent._qsize() >= self._parent._maxsize:
-                        raise Full
-                elif timeout is None:
-                    while self._parent._qsize() >= self._parent._maxsize:
-                        self._parent._sync_not_full.wait()
-                elif timeout < 0:
-                    raise ValueError("'timeout' must be a non-negative number")
-                else:
-                    time = self._parent._loop.time
-                    endtime = time() + timeout
-                    while self._parent._qsize() >= self._parent._maxsize:
-                        remaining = endtime - time()
-                        if remaining <= 0.0:
-                            raise Full
-                        self._parent._sync_not_full.wait(remaining)
-            self._parent._put_internal(item)
-            self._parent._sync_not_empty.notify()
-            self._parent._notify_async_not_empty(threadsafe=True)
-
-    def put_nowait(self, item) -> None:
+        parent = self._parent
+
+        with parent._sync_mutex:
+            if parent._try_handoff(item, threadsafe=True):
+                return None
+
+            if parent._full_for(item):
+                if parent._overflow == 'block':
+                    self._wait_not_full(
+                        item, block, self._endtime(block, timeout))
+                elif not parent._make_room(item):
+                    # Dropped by the overflow policy
+                    return None
+
+            result = parent._put_internal(item)
+            parent._notify_sync_not_empty()
+            parent._notify_async_not_empty(threadsafe=True)
+            return result
+
+    @check_closing
+    def put_many(
+        self,
+        items: Iterable[T],
+        block: bool = True,
+        timeout: OptInt = None
+    ) -> None:
+        """Put items into the queue.
+
+        The mutex is acquired once for the whole batch, and waiters are
+        notified once for all items put at a time.
+
+        If the queue is bounded, items are put as long as there are free
+        slots, and it only blocks for the rest of the items, with the same
+        `block` and `timeout` semantics as `put()`. If the Full exception is
+        raised, the items before the one which raised are already in the
+        queue.
+        """
+
+        parent = self._parent
+        items = list(items)
+        count = len(items)
+        index = 0
+        endtime = None
+
+        with parent._sync_mutex:
+            while True:
+                put = 0
+                try:
+                    while index < count and not parent._full_for(items[index]):
+                        item = items[index]
+                        if not parent._try_handoff(item, threadsafe=True):
+                            parent._put_internal(item)
+                            put += 1
+                        index += 1
+                finally:
+                    # Also the items put before one which raised, e.g. an
+                    # invalid priority, are announced to the waiters
+                    if put:
+                        parent._notify_sync_not_empty(put)
+                        parent._notify_async_not_empty(put, threadsafe=True)
+
+                if index == count:
+                    return
+
+                if parent._overflow != 'block':
+                    if not parent._make_room(items[index]):
+                        # Dropped by the overflow policy
+                        index += 1
+                    continue
+
+                if endtime is None:
+                    endtime = self._endtime(block, timeout)
+
+                self._wait_not_full(items[index], block, endtime)
+
+    def put_nowait(self, item) -> Any:
         """Equivalent to `put(item, False)`.
         """
 
-        self.put(item, False)
+        return self.put(item, False)
 
     @check_closing
     def get(
@@ -132,28 +209,87 @@ class SyncQueueProxy(Generic[T]):
         that case).
         """
 
-        with self._parent._sync_not_empty:
-            if not block:
-                if not self._parent._qsize():
-                    raise Empty
-            elif timeout is None:
-                while not self._parent._qsize():
-                    self._parent._sync_not_empty.wait()
-            elif timeout < 0:
-                raise ValueError("'timeout' must be a non-negative number")
-            else:
-                time = self._parent._loop.time
-                endtime = time() + timeout
-                while not self._parent._qsize():
-                    remaining = endtime - time()
-                    if remaining <= 0.0:
-                        raise Empty
-                    self._parent._sync_not_empty.wait(remaining)
-            item = self._parent._get()
-            self._parent._sync_not_full.notify()
-            self._parent._notify_async_not_full(threadsafe=True)
+        parent = self._parent
+
+        with parent._sync_mutex:
+            if not parent._qsize():
+                item = self._wait_not_empty(
+                    block, self._endtime(block, timeout))
+                if item is not WOKEN:
+                    # Handed directly by a putter
+                    return item
+
+            item = parent._get_internal()
+            parent._notify_sync_not_full()
+            parent._notify_async_not_full(threadsafe=True)
             return item
 
+    @check_closing
+    def get_many(
+        self,
+        max_items: int,
+        block: bool = True,
+        timeout: OptInt = None
+    ) -> List[T]:
+        """Remove and return at most `max_items` items from the queue.
+
+        It waits for the first item with the same `block` and `timeout`
+        semantics as `get()`, then returns all items which are available at
+        that moment, up to `max_items`, without waiting any further.
+        """
+
+        if max_items <= 0:
+            raise ValueError("'max_items' must be a positive number")
+
+        parent = self._parent
+
+        with parent._sync_mutex:
+            if not parent._qsize():
+                item = self._wait_not_empty(
+                    block, self._endtime(block, timeout))
+                if item is not WOKEN:
+                    return [item] + self._get_items(max_items - 1)
+
+            return self._get_items(max_items)
+
+    def __iter__(self) -> Iterator[T]:
+        """Iterate over items of the queue, and stop once the queue is
+        closed and drained.
+
+        Items are fetched in chunks under one lock acquisition.
+        """
+
+        for chunk in self.chunked():
+            yield from chunk
+
+    def chunked(
+        self,
+        max_items: int = ITER_CHUNK_SIZE
+    ) -> Iterator[List[T]]:
+        """Iterate over lists of at most `max_items` items of the queue, and
+        stop once the queue is closed and drained.
+        """
+
+        if max_items <= 0:
+            raise ValueError("'max_items' must be a positive number")
+
+        parent = self._parent
+
+        while True:
+            with parent._sync_mutex:
+                item = WOKEN
+                while item is WOKEN and not parent._qsize():
+                    if parent._closing:
+                        return
+                    item = parent._wait_sync_not_empty()
+
+                if item is WOKEN:
+                    chunk = self._get_items(max_items)
+                else:
+                    chunk = [item] + self._get_items(max_items - 1)
+
+            yield chunk
+
     def get_nowait(self) -> T:
         return self.get(False)
 
@@ -179,9 +315,9 @@ class SyncQueueProxy(Generic[T]):
                 if unfinished < 0:
                     raise ValueError('task_done() called too many times')
                 self._parent._all_tasks_done.notify_all()
-                self._parent._loop.call_soon_threadsafe(
-                    self._parent._finished.set)
+                self._parent._notify_async_finished(threadsafe=True)
             self._parent._unfinished_tasks = unfinished
+            self._parent._task_done()
 
     def join(self) -> None:
         """Blocks until all items in the Queue have been gotten and processed.
@@ -194,6 +330,95 @@ class SyncQueueProxy(Generic[T]):
         When the count of unfinished tasks drops to zero, `join()` unblocks.
         """
 
-        with self._parent._all_tasks_done:
-            while self._parent._unfinished_tasks:
-                self._parent._all_tasks_done.wait()
+        parent = self._parent
+
+        with parent._all_tasks_done:
+            if not parent._unfinished_tasks:
+                return
+
+            while parent._unfinished_tasks:
+                parent._all_tasks_done.wait()
+
+            parent._record_join_lag()
+
+    # These methods should be called with `_sync_mutex` held
+
+    def _get_items(self, max_items: int) -> List[T]:
+        parent = self._parent
+        items = parent._get_items(max_items)
+        got = len(items)
+        if not got:
+            return items
+
+        parent._notify_sync_not_full(got)
+        parent._notify_async_not_full(got, threadsafe=True)
+        return items
+
+    def _endtime(
+        self,
+        block: bool,
+        timeout: OptInt
+    ) -> Optional[float]:
+        if not block or timeout is None:
+            return None
+
+        if timeout < 0:
+            raise ValueError("'timeout' must be a non-negative number")
+
+        return monotonic() + timeout
+
+    # Only called if `item` could not be put
+    def _wait_not_full(
+        self,
+        item: T,
+        block: bool,
+        endtime: Optional[float]
+    ) -> None:
+        parent = self._parent
+
+        if not block:
+            raise Full
+
+        start = perf_counter()
+
+        if endtime is None:
+            while parent._full_for(item):
+                parent._wait_sync_not_full()
+        else:
+            while parent._full_for(item):
+                remaining = endtime - monotonic()
+                if remaining <= 0.0:
+                    parent._record_wait(False, start, timed_out=True)
+                    raise Full
+                parent._wait_sync_not_full(remaining)
+
+        parent._record_wait(False, start)
+
+    # Only called if the queue is empty,
+    # returns the item handed directly by a putter, or `WOKEN`
+    def _wait_not_empty(
+        self,
+        block: bool,
+        endtime: Optional[float]
+    ) -> Any:
+        parent = self._parent
+        item = WOKEN
+
+        if not block:
+            raise Empty
+
+        start = perf_counter()
+
+        if endtime is None:
+            while item is WOKEN and not parent._qsize():
+                item = parent._wait_sync_not_empty()
+        else:
+            while item is WOKEN and not parent._qsize():
+                remaining = endtime - monotonic()
+                if remaining <= 0.0:
+                    parent._record_wait(True, start, timed_out=True)
+                    raise Empty
+                item = parent._wait_sync_not_empty(remaining)
+
+        parent._record_wait(True, start)
+        return item
@@ -1,35 +1,136 @@
 import asyncio
 from asyncio import (
     AbstractEventLoop,
-    Future
+    Future,
+    TimerHandle
 )
 import threading
 from abc import ABC, abstractmethod
+from collections import deque
+from functools import partial
+from time import (
+    monotonic,
+    perf_counter
+)
 
 from typing import (
     Generic,
     Any,
-    Set,
     Callable,
-    Optional
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple
 )
+from weakref import WeakKeyDictionary
 
 from .common import (
     T,
-    lazy_property,
-    has_loop,
+    WOKEN,
     get_running_loop
 )
+from .metrics import QueueMetrics
+from .profile import (
+    Profile,
+    ProfiledLock,
+    in_event_loop
+)
+from .tracing import Tracer
+
+
+class _LoopState:
+    """The state of the queue which belongs to a certain event loop
+    """
+
+    __slots__ = ('wakeups', 'wakeup_scheduled', 'ready_timer')
+
+    def __init__(self) -> None:
+        # Async waiters which are woken up from outside of the loop,
+        # but not yet resolved in the loop, with their results
+        self.wakeups: List[Tuple[Future, Any]] = []
+        self.wakeup_scheduled = False
+
+        self.ready_timer: Optional[TimerHandle] = None
+
+
+# How many times a coroutine retries for the contended mutex on the next
+# iteration of the loop, before it waits for it in a thread of the executor
+_LOCK_SPINS = 16
+
+
+class _SyncGetter:
+    """A blocked sync getter, which could be handed an item directly
+    """
+
+    __slots__ = ('lock', 'item', 'cross')
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.lock.acquire()
+        self.item = WOKEN
+
+        # Whether it is woken up from an event loop, only for profiling
+        self.cross = False
 
 
 class AbstractQueue(Generic[T], ABC):
-    _loop_: Optional[AbstractEventLoop]
-    _pending: Set[Future]
+    # The overflow policies supported by the queue organization
+    _overflow_policies = ('block', 'drop_newest')
+
+    # Whether `_get()` returns the very objects which are put, so that the
+    # items could be traced by their identities
+    _traceable = True
+
+    # Whether an item put into the empty queue could be handed directly to
+    # a blocked getter, which is only valid if `_put()` and `_get()` of a
+    # single item have no side effect other than storing it
+    _handoff = False
+
+    _sync_getters: Deque[_SyncGetter]
+    _async_getters: Deque[Future]
+    _async_putters: Deque[Future]
+    _async_joiners: Deque[Future]
+    _loop_states: 'WeakKeyDictionary[AbstractEventLoop, _LoopState]'
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        *,
+        sizer: Optional[Callable[[T], int]] = None,
+        maxcost: int = 0,
+        overflow: str = 'block'
+    ) -> None:
+        if overflow not in self._overflow_policies:
+            supported = ', '.join(map(repr, self._overflow_policies))
+            raise ValueError(
+                f'overflow policy {overflow!r} is not supported by '
+                f'{type(self).__name__}, which supports {supported}'
+            )
 
-    def __init__(self, maxsize: int = 0) -> None:
-        self._loop_ = None
         self._maxsize = maxsize
 
+        # What to do if an item could not be put: wait for the room,
+        # drop the item, or drop other items to make room for it
+        self._overflow = overflow
+        self._dropped = 0
+
+        # If `maxcost` is positive, the queue is also bounded by the total
+        # cost of items, which is kept as a running total
+        if maxcost > 0:
+            if sizer is None:
+                raise ValueError("'sizer' is required for 'maxcost'")
+
+            self._sizer = sizer
+        else:
+            self._sizer = None
+
+        self._maxcost = maxcost
+        self._cost = 0
+
+        # Items handed directly to getters which have not received them
+        self._handed = 0
+
         self._init(maxsize)
 
         self._unfinished_tasks = 0
@@ -37,41 +138,59 @@ class AbstractQueue(Generic[T], ABC):
         sync_mutex = threading.Lock()
         self._sync_mutex = sync_mutex
 
-        self._sync_not_empty = threading.Condition(sync_mutex)
         self._sync_not_full = threading.Condition(sync_mutex)
         self._all_tasks_done = threading.Condition(sync_mutex)
 
-        try:
-            async_mutex = asyncio.Lock()
+        # Blocked waiters of each side and direction,
+        # only accessed with `_sync_mutex` held.
+        # Async waiters are futures which could belong to different loops,
+        # and are woken up in FIFO order whichever loop they belong to
+        self._sync_getters = deque()
+        self._sync_putters = 0
+        self._async_getters = deque()
+        self._async_putters = deque()
+        self._async_joiners = deque()
 
-        # This will not throw an error since Python 3.10
-        except RuntimeError as e:
-            raise RuntimeError(f'''{e}
+        self._loop_states = WeakKeyDictionary()
+        self._async_proxies = WeakKeyDictionary()
 
-This is usually not an issue of newt.
-You should make sure there is a event loop in the current thread, especially after running `asyncio.run()`.
+        self._loop_stalls = 0
+        self._loop_stall_time = 0.
 
-Check https://github.com/kaelzhang/python-newt for details.''')
+        self._profile: Optional[Profile] = None
+        self._metrics: Optional[QueueMetrics] = None
+        self._tracer: Optional[Tracer] = None
 
-        self._async_mutex = async_mutex
+        self._closing = False
 
-        self._async_not_empty = asyncio.Condition(async_mutex)
-        self._async_not_full = asyncio.Condition(async_mutex)
-        self._finished = asyncio.Event()
-        self._finished.set()
+    def async_queue_for(self, loop: AbstractEventLoop) -> Any:
+        """Return the async proxy which is bound to the event loop `loop`,
+        and could only be used in that loop.
 
-        self._closing = False
-        self._pending = set()
+        `async_queue` could be used in any loop, and so could the queue be
+        consumed and produced by coroutines in multiple loops at once.
+        """
+
+        with self._sync_mutex:
+            proxy = self._async_proxies.get(loop)
+            if proxy is None:
+                proxy = self._create_async_proxy(loop)
+                self._async_proxies[loop] = proxy
 
-    @lazy_property
-    def _loop(self) -> asyncio.AbstractEventLoop:
-        return get_running_loop()
+            return proxy
+
+    def _create_async_proxy(self, loop: AbstractEventLoop) -> Any:
+        raise NotImplementedError
 
     def close(self) -> None:
         with self._sync_mutex:
             self._closing = True
-            for fut in self._pending:
-                fut.cancel()
+
+            # Wake up all blocked getters,
+            # so that iterators could stop once the queue is drained
+            self._notify_sync_not_empty(len(self._sync_getters))
+            self._notify_async_not_empty(
+                len(self._async_getters), threadsafe=True)
 
     async def wait_closed(self) -> None:
         # should be called from loop after close().
@@ -79,27 +198,450 @@ Check https://github.com/kaelzhang/python-newt for details.''')
         # so lock acquiring is not required
         if not self._closing:
             raise RuntimeError('waiting for non-closed queue')
-        # give execution chances for the task-done callbacks
-        # of async tasks created inside
-        # _notify_async_not_empty, _notify_async_not_full
-        # methods.
+        # give execution chances for the wakeup callbacks
+        # scheduled from outside of the current loop
         await asyncio.sleep(0)
-        if not self._pending:
-            return
-        await asyncio.wait(self._pending)
+
+        state = self._loop_states.get(get_running_loop())
+        while state is not None and state.wakeup_scheduled:
+            await asyncio.sleep(0)
 
     @property
     def closed(self) -> bool:
-        return self._closing and not self._pending
+        return self._closing and not any(
+            state.wakeup_scheduled
+            for state in list(self._loop_states.values())
+        )
 
     @property
     def maxsize(self) -> int:
         return self._maxsize
 
-    def _put_internal(self, item: T) -> None:
-        self._put(item)
+    @property
+    def maxcost(self) -> int:
+        return self._maxcost
+
+    @property
+    def overflow(self) -> str:
+        return self._overflow
+
+    @property
+    def dropped(self) -> int:
+        """The number of items dropped by the overflow policy
+        """
+
+        return self._dropped
+
+    @property
+    def loop_stalls(self) -> int:
+        """The number of times an event loop was blocked by the contended
+        mutex of the queue, which only happens in the async methods which
+        are not coroutines, such as `put_nowait()`
+        """
+
+        return self._loop_stalls
+
+    @property
+    def loop_stall_time(self) -> float:
+        """The total seconds event loops were blocked by the mutex
+        """
+
+        return self._loop_stall_time
+
+    def enable_profiling(self) -> None:
+        """Start recording where the time of the queue goes, until
+        `disable_profiling()`, which is read by `profile_snapshot()`.
+
+        It costs nothing while disabled, and a little for contended and
+        blocking operations only while enabled.
+        """
+
+        with self._sync_mutex:
+            if self._profile is None:
+                profile = self._profile = Profile()
+                self._sync_mutex = ProfiledLock(self._sync_mutex, profile)
+
+    def disable_profiling(self) -> None:
+        """Stop recording and discard what is recorded
+        """
+
+        with self._sync_mutex:
+            if self._profile is not None:
+                self._profile = None
+                self._sync_mutex = self._sync_mutex.lock
+
+    def profile_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Return what is recorded since profiling is enabled, or `None` if
+        it is disabled:
+
+        - 'sync_lock_wait': histogram of seconds threads are blocked for
+          the contended mutex
+        - 'async_lock_wait': histogram of seconds coroutines wait for the
+          contended mutex, during which the loop runs
+        - 'loop_stall': histogram of seconds event loops are blocked for the
+          mutex
+        - 'wakeups_sent': the number of waiters of one side woken up by the
+          other side, sync waiters by coroutines and async waiters by threads
+          or other loops
+        - 'wakeups_needed': how many of them found the item or the room they
+          waited for
+
+        A histogram is a dict of 'count', 'sum', 'max', 'p50', 'p99' and
+        'buckets', which is a list of [upper bound, count] of non-empty
+        buckets, whose upper bounds are powers of two microseconds.
+        """
+
+        with self._sync_mutex:
+            profile = self._profile
+            return None if profile is None else profile.snapshot()
+
+    def enable_metrics(self) -> None:
+        """Start recording the metrics of the queue, which are read by
+        `metrics_snapshot()`, or rendered by `newt.render_prometheus()`
+        """
+
+        with self._sync_mutex:
+            if self._metrics is None:
+                self._metrics = QueueMetrics()
+
+    def disable_metrics(self) -> None:
+        """Stop recording the metrics and discard them
+        """
+
+        with self._sync_mutex:
+            self._metrics = None
+
+    def metrics_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Return the metrics since they are enabled, or `None` if they are
+        disabled:
+
+        - 'puts', 'gets': the numbers of items put and got
+        - 'timeouts': the number of blocking gets and puts which timed out
+        - 'dropped': the number of items dropped by the overflow policy
+        - 'depth', 'max_depth': the current and the most number of items
+        - 'unfinished_tasks': the number of items not marked done yet
+        - 'get_wait', 'put_wait': histograms of seconds blocked getters and
+          putters waited
+        - 'join_lag': histogram of seconds from the last `task_done()` to
+          the return of a blocked `join()`
+
+        The histograms are the same as those of `profile_snapshot()`.
+        """
+
+        with self._sync_mutex:
+            metrics = self._metrics
+            if metrics is None:
+                return None
+
+            return metrics.snapshot(
+                depth=self._qsize(),
+                dropped=self._dropped,
+                unfinished_tasks=self._unfinished_tasks
+            )
+
+    def enable_tracing(
+        self,
+        rate: float = 0.01,
+        *,
+        accuracy: float = 0.01
+    ) -> None:
+        """Start tracing the fraction `rate` of items from `put()` to
+        `get()`, until `disable_tracing()`, which is read by
+        `trace_snapshot()`.
+
+        The items are not changed, but stamped in side storage by their
+        identities, so only distinct objects are traced correctly. If an
+        object is in the queue more than once, e.g. `None` or a small int,
+        the stamp of a later put could be matched by the get of an earlier
+        one. The percentiles of `trace_snapshot()` are within the relative
+        error `accuracy`.
+        """
+
+        if not self._traceable:
+            raise TypeError(
+                f'{type(self).__name__} does not support tracing, '
+                'since it gets other objects than those put')
+
+        tracer = Tracer(rate, accuracy)
+
+        with self._sync_mutex:
+            self._tracer = tracer
+
+    def disable_tracing(self) -> None:
+        """Stop tracing and discard the results
+        """
+
+        with self._sync_mutex:
+            self._tracer = None
+
+    def trace_snapshot(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Return the seconds traced items stayed in the queue, by the
+        direction 'sync->async', 'async->sync', 'sync->sync' or
+        'async->async', or `None` if tracing is disabled.
+
+        A side is async if `put()` or `get()` is called in an event loop.
+        Each direction is a dict of 'count', 'mean', 'min', 'max', 'p50',
+        'p90', 'p99' and 'p999'.
+        """
+
+        with self._sync_mutex:
+            tracer = self._tracer
+            return None if tracer is None else tracer.snapshot()
+
+    @property
+    def cost(self) -> int:
+        """The total cost of items in the queue, if `maxcost` is specified
+        """
+
+        return self._cost
+
+    def _full(self) -> bool:
+        # Items handed to getters which are not resumed yet still take up
+        # slots, as if they were in the queue, since they could be put back
+        return 0 < self._maxsize <= self._qsize() + self._handed
+
+    def _full_for(self, item: T) -> bool:
+        """Whether `item` could not be put now, which is `_full()` unless
+        the room for an item depends on the item itself
+        """
+
+        if self._sizer is None:
+            return self._full()
+
+        if self._full():
+            return True
+
+        # An item which costs more than `maxcost` could still be put into
+        # an empty queue, otherwise it could never be put
+        cost = self._cost
+        return cost > 0 and cost + self._cost_of(item) > self._maxcost
+
+    def _cost_of(self, item: Any) -> int:
+        """The cost of an item which is passed to `_put()`, which could be
+        overridden if it wraps the item which is retrieved by `_get()`
+        """
+
+        return self._sizer(item)
+
+    def _make_room(self, item: T) -> bool:
+        """Apply the overflow policy, other than 'block', for `item` which
+        could not be put, and return whether it could be put now.
+
+        Should be called with `_sync_mutex` held.
+        """
+
+        overflow = self._overflow
+        dropped = []
+
+        if overflow == 'drop_oldest':
+            while self._qsize() and self._full_for(item):
+                dropped.append(self._drop_oldest())
+
+        elif overflow == 'evict_lowest_priority':
+            while self._qsize() and self._full_for(item):
+                evicted = self._evict_for(item)
+                if evicted is None:
+                    break
+                dropped.append(evicted)
+
+        if dropped:
+            self._dropped += len(dropped)
+            self._discard_internal(dropped)
+
+        if self._full_for(item):
+            # 'drop_newest', or no item could be evicted for it
+            self._dropped += 1
+            return False
+
+        return True
+
+    def _over_cost(self) -> bool:
+        return self._sizer is not None and self._cost >= self._maxcost
+
+    def _get_internal(self) -> T:
+        item = self._get()
+        if self._sizer is not None:
+            self._cost -= self._sizer(item)
+        if self._metrics is not None:
+            self._metrics.gets += 1
+        tracer = self._tracer
+        if tracer is not None and id(item) in tracer.stamps:
+            tracer.on_get(item)
+        return item
+
+    def _get_items(self, max_items: int) -> List[T]:
+        items = []
+        qsize = self._qsize()
+        get = self._get
+
+        while qsize and max_items:
+            items.append(get())
+            qsize -= 1
+            max_items -= 1
+
+        sizer = self._sizer
+        if sizer is not None:
+            self._cost -= sum(map(sizer, items))
+
+        if self._metrics is not None:
+            self._metrics.gets += len(items)
+
+        tracer = self._tracer
+        if tracer is not None:
+            stamps = tracer.stamps
+            for item in items:
+                if id(item) in stamps:
+                    tracer.on_get(item)
+
+        return items
+
+    def _put_internal(self, item: T) -> Any:
+        result = self._put(item)
         self._unfinished_tasks += 1
-        self._finished.clear()
+        if self._sizer is not None:
+            self._cost += self._cost_of(item)
+        if self._metrics is not None:
+            self._metrics.on_put(self._qsize())
+        tracer = self._tracer
+        if tracer is not None:
+            tracer.countdown -= 1
+            if not tracer.countdown:
+                tracer.stamp(item)
+        return result
+
+    def _try_handoff(self, item: T, *, threadsafe: bool) -> bool:
+        """Hand `item` directly to a blocked getter if the queue is empty,
+        bypassing the container, and return whether it is handed.
+
+        The getter is the one which is woken up, so that no other getter
+        could take the item first. A getter of the side of the putter is
+        preferred, which is woken up without crossing the thread/loop.
+
+        Should be called with `_sync_mutex` held, before the item is put.
+        """
+
+        if not self._handoff:
+            return False
+
+        if not (self._sync_getters or self._async_getters):
+            return False
+
+        # Getters which are already woken up take the items in the
+        # container first
+        if self._qsize():
+            return False
+
+        # Only one item is handed at a time, so that an item which is put
+        # back by `_requeue()` is always the oldest one, and takes the slot
+        # which is reserved for it
+        if self._handed:
+            return False
+
+        if threadsafe:
+            handed = self._handoff_sync(item)
+            if not handed:
+                handed = self._handoff_async(item, threadsafe=True)
+        else:
+            handed = self._handoff_async(item, threadsafe=False)
+            if not handed:
+                handed = self._handoff_sync(item)
+
+        if handed:
+            self._unfinished_tasks += 1
+            self._handed += 1
+
+            metrics = self._metrics
+            if metrics is not None:
+                metrics.puts += 1
+                metrics.gets += 1
+
+            # Traced once the getter receives it
+            tracer = self._tracer
+            if tracer is not None:
+                tracer.countdown -= 1
+                if not tracer.countdown:
+                    tracer.stamp(item)
+
+        return handed
+
+    def _receive_handed(self, *, threadsafe: bool) -> None:
+        """Release the slot of an item which is handed to a getter, once
+        the getter receives it.
+
+        Should be called with `_sync_mutex` held.
+        """
+
+        self._handed -= 1
+
+        if self._maxsize > 0:
+            self._notify_sync_not_full()
+            self._notify_async_not_full(threadsafe=threadsafe)
+
+    def _requeue(self, item: T, *, threadsafe: bool) -> None:
+        """Put back an item which is handed to a getter which gave up,
+        e.g. was cancelled, so that the item is not lost.
+
+        Should be called with `_sync_mutex` held.
+        """
+
+        # The item takes up the slot which is reserved for it, before any
+        # item put after it. The task of the item is already counted
+        self._handed -= 1
+        self._requeue_front(item)
+        if self._sizer is not None:
+            self._cost += self._sizer(item)
+        if self._metrics is not None:
+            # It was counted as got when it was handed
+            self._metrics.gets -= 1
+
+        self._notify_sync_not_empty()
+        self._notify_async_not_empty(threadsafe=threadsafe)
+
+    def _discard_internal(self, items: List[T]) -> None:
+        """Account for items which are removed from the queue without
+        `get()`, so they will never be marked as done by `task_done()`.
+
+        Should be called with `_sync_mutex` held, from any thread.
+        """
+
+        count = len(items)
+
+        if self._tracer is not None:
+            self._tracer.on_discard(items)
+
+        sizer = self._sizer
+        if sizer is not None:
+            self._cost -= sum(map(sizer, items))
+
+        self._unfinished_tasks -= count
+        if self._unfinished_tasks == 0:
+            self._all_tasks_done.notify_all()
+            self._notify_async_finished(threadsafe=True)
+
+        self._notify_sync_not_full(count)
+        self._notify_async_not_full(count, threadsafe=True)
+
+    # Called with `_sync_mutex` held once a blocked getter or putter returns,
+    # where `start` is the `perf_counter()` when it started to wait
+    def _record_wait(
+        self,
+        getter: bool,
+        start: float,
+        timed_out: bool = False
+    ) -> None:
+        metrics = self._metrics
+        if metrics is None:
+            return
+
+        histogram = metrics.get_wait if getter else metrics.put_wait
+        histogram.record(perf_counter() - start)
+        if timed_out:
+            metrics.timeouts += 1
+
+    def _record_join_lag(self) -> None:
+        metrics = self._metrics
+        if metrics is not None and metrics.finished_at:
+            metrics.join_lag.record(perf_counter() - metrics.finished_at)
 
     # Override these methods to implement other queue organizations
     # --------------------------------------------------------------
@@ -116,8 +658,9 @@ Check https://github.com/kaelzhang/python-newt for details.''')
         ...
 
     @abstractmethod
-    def _put(self, item: T) -> None:
-        """Put a new item in the queue
+    def _put(self, item: T) -> Any:
+        """Put a new item in the queue,
+        the return value will be returned by `put()` of the proxies
         """
         ...
 
@@ -127,77 +670,518 @@ Check https://github.com/kaelzhang/python-newt for details.''')
         """
         ...
 
-    # Utilities for async queue to notify sync queue
+    def _drop_oldest(self) -> T:
+        """Remove and return the oldest item,
+        for the overflow policy 'drop_oldest'
+        """
+
+        raise NotImplementedError
+
+    def _evict_for(self, item: T) -> Optional[T]:
+        """Remove and return the item of the lowest priority if it is of
+        lower priority than `item`, or return `None`,
+        for the overflow policy 'evict_lowest_priority'
+        """
+
+        raise NotImplementedError
+
+    def _requeue_front(self, item: T) -> None:
+        """Put back an item handed to a getter which gave up, so that it is
+        got before any item put after it,
+        for queues which support `_handoff`
+        """
+
+        raise NotImplementedError
+
+    def _task_done(self) -> None:
+        """Called for each valid `task_done()` of the proxies,
+        e.g. to acknowledge the item which is done
+        """
+
+    def _ready_in(self) -> Optional[float]:
+        """Seconds until an item which is already in the queue but is not
+        counted by `_qsize()` yet becomes available, or `None` if there is no
+        such item (e.g. delayed items).
+
+        Blocked getters are woken up at that time.
+        """
+
+        return None
+
+    # Utilities for sync waiters
     # --------------------------------------------------------------
-    # This methods are always called in a event loop,
-    # so we do not need to check loop initialization
+    # These methods are always called with `_sync_mutex` held,
+    # so the sync waiters could be notified directly
+
+    def _wait_sync_not_empty(self, timeout: Optional[float] = None) -> Any:
+        """Wait until woken up or `timeout`, and return the item handed to
+        the getter by a putter, or `WOKEN`
+        """
+
+        ready_in = self._ready_in()
+        if ready_in is not None and (timeout is None or ready_in < timeout):
+            timeout = ready_in
+
+        getters = self._sync_getters
+        waiter = _SyncGetter()
+        getters.append(waiter)
+
+        self._sync_mutex.release()
+        try:
+            woken = waiter.lock.acquire(
+                True, -1 if timeout is None else timeout)
+        except BaseException:
+            self._sync_mutex.acquire()
+            try:
+                getters.remove(waiter)
+            except ValueError:
+                if waiter.item is not WOKEN:
+                    self._requeue(waiter.item, threadsafe=True)
+                else:
+                    self._notify_sync_not_empty()
+            raise
+
+        self._sync_mutex.acquire()
+        if not woken:
+            try:
+                getters.remove(waiter)
+            except ValueError:
+                # Woken up right after the timeout,
+                # so the handed item, if any, is still taken
+                pass
+
+        if waiter.cross and self._profile is not None and (
+            waiter.item is not WOKEN or self._qsize() or self._closing
+        ):
+            self._profile.wakeups_needed += 1
+
+        item = waiter.item
+        if item is not WOKEN:
+            self._receive_handed(threadsafe=True)
+            if self._tracer is not None:
+                self._tracer.on_get(item)
+
+        return item
+
+    def _wait_sync_not_full(self, timeout: Optional[float] = None) -> None:
+        self._sync_putters += 1
+        try:
+            self._sync_not_full.wait(timeout)
+        finally:
+            self._sync_putters -= 1
+
+    def _notify_sync_not_empty(self, n: int = 1) -> None:
+        getters = self._sync_getters
+        cross = None
 
-    def _notify_sync_not_empty(self) -> None:
-        def f() -> None:
-            with self._sync_mutex:
-                self._sync_not_empty.notify()
+        while n > 0 and getters:
+            waiter = getters.popleft()
 
-        self._loop.run_in_executor(None, f)
+            if self._profile is not None:
+                if cross is None:
+                    cross = in_event_loop()
+                if cross:
+                    waiter.cross = True
+                    self._profile.wakeups_sent += 1
 
-    def _notify_sync_not_full(self) -> None:
-        def f() -> None:
-            with self._sync_mutex:
-                self._sync_not_full.notify()
+            waiter.lock.release()
+            n -= 1
 
-        fut = self._loop.run_in_executor(None, f)
-        fut.add_done_callback(self._pending.discard)  # type: ignore
-        self._pending.add(fut)  # type: ignore
+    def _handoff_sync(self, item: T) -> bool:
+        getters = self._sync_getters
+        if not getters:
+            return False
 
-    # Utilities for sync queue to notify async queue
+        waiter = getters.popleft()
+        waiter.item = item
+        waiter.lock.release()
+
+        profile = self._profile
+        if profile is not None and in_event_loop():
+            profile.wakeups_sent += 1
+            profile.wakeups_needed += 1
+
+        return True
+
+    def _notify_sync_not_full(self, n: int = 1) -> None:
+        putters = self._sync_putters
+        if putters:
+            needed = n
+            if self._sizer is not None:
+                # The room for one item might be enough for several items
+                # of less cost, so every putter checks it
+                n = putters
+            self._sync_not_full.notify(n)
+
+            profile = self._profile
+            if profile is not None and in_event_loop():
+                # Sync putters share a condition, so the wakeups which are
+                # beyond the room are counted as not needed
+                woken = min(n, putters)
+                profile.wakeups_sent += woken
+                profile.wakeups_needed += min(needed, woken)
+
+    # Utilities for async waiters
     # --------------------------------------------------------------
+    # These methods are called with `_sync_mutex` held, and only cross
+    # the thread/loop boundary if there is a blocked async waiter
 
-    # If loop is not initialized, then do nothing
-    @has_loop
-    def _notify_async_not_empty(self, *, threadsafe: bool) -> None:
-        async def f() -> None:
-            async with self._async_mutex:
-                self._async_not_empty.notify()
+    async def _lock_async(self, endtime: Optional[float] = None) -> None:
+        """Acquire the contended `_sync_mutex` in the event loop, which
+        never blocks the loop, or raise `asyncio.TimeoutError` if it is not
+        acquired by `endtime` of the loop clock.
 
-        def task_maker() -> None:
-            task = self._loop.create_task(f())
-            task.add_done_callback(self._pending.discard)
-            self._pending.add(task)
+        The mutex is not held if it is cancelled or times out.
+        """
 
-        if threadsafe:
-            self._call_soon_threadsafe(task_maker)
-        else:
-            self._call_soon(task_maker)
+        mutex = self._sync_mutex
+        start = perf_counter()
 
-    @has_loop
-    def _notify_async_not_full(self, *, threadsafe: bool) -> None:
-        async def f() -> None:
-            async with self._async_mutex:
-                self._async_not_full.notify()
+        # The executor thread should not count as a blocked thread
+        if isinstance(mutex, ProfiledLock):
+            mutex = mutex.lock
 
-        def task_maker() -> None:
-            task = self._loop.create_task(f())
-            task.add_done_callback(self._pending.discard)
-            self._pending.add(task)
+        await _lock_async(mutex, endtime)
 
-        if threadsafe:
-            self._call_soon_threadsafe(task_maker)
+        if self._profile is not None:
+            self._profile.async_lock_wait.record(perf_counter() - start)
+
+    async def _relock_async(self) -> None:
+        # Callers rely on holding the mutex however it returns,
+        # so a cancellation meanwhile is only raised once it is acquired
+        cancelled = None
+
+        while not self._sync_mutex.acquire(False):
+            try:
+                await self._lock_async()
+            except asyncio.CancelledError as e:
+                cancelled = e
+            else:
+                break
+
+        if cancelled is not None:
+            raise cancelled
+
+    def _lock_stalling(self) -> None:
+        # Called in the event loop if the mutex is contended,
+        # but the caller could not wait for it
+        start = monotonic()
+        self._sync_mutex.acquire()
+        self._loop_stalls += 1
+        self._loop_stall_time += monotonic() - start
+
+    async def _wait_async_not_empty(
+        self,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """Wait until woken up, and return the item handed to the getter by
+        a putter, or `WOKEN`
+        """
+
+        self._arm_ready_timer()
+        item = await self._wait_async(self._async_getters, timeout)
+
+        if item is not WOKEN:
+            self._receive_handed(threadsafe=False)
+            if self._tracer is not None:
+                self._tracer.on_get(item)
+
+        return item
+
+    async def _wait_async_not_full(
+        self,
+        timeout: Optional[float] = None
+    ) -> None:
+        await self._wait_async(self._async_putters, timeout)
+
+    async def _wait_async_finished(self) -> None:
+        await self._wait_async(self._async_joiners, None)
+
+    async def _wait_async(
+        self,
+        waiters: Deque[Future],
+        timeout: Optional[float]
+    ) -> Any:
+        # Called in the event loop with `_sync_mutex` held,
+        # and returns with `_sync_mutex` held again.
+        # Raises `asyncio.TimeoutError` if not woken up within `timeout`
+        loop = get_running_loop()
+        waiter = loop.create_future()
+        waiters.append(waiter)
+
+        timer = None if timeout is None else loop.call_later(
+            timeout, _set_timeout, waiter)
+
+        self._sync_mutex.release()
+        try:
+            result = await waiter
+        except BaseException:
+            await self._relock_async()
+            if self._profile is not None:
+                self._profile.cross_waiters.discard(waiter)
+
+            try:
+                waiters.remove(waiter)
+            except ValueError:
+                item = _handed_item(waiter)
+                if item is not WOKEN:
+                    # Handed an item right before cancelled
+                    self._requeue(item, threadsafe=False)
+                else:
+                    # The waiter has already been woken up,
+                    # so pass the wakeup on to the next one
+                    self._wakeup_async(waiters, threadsafe=False)
+            raise
         else:
-            self._call_soon(task_maker)
+            await self._relock_async()
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+        profile = self._profile
+        if profile is not None and waiter in profile.cross_waiters:
+            profile.cross_waiters.discard(waiter)
+            if result is not WOKEN or self._resumable(waiters):
+                profile.wakeups_needed += 1
+
+        return result
+
+    def _resumable(self, waiters: Deque[Future]) -> bool:
+        # Whether async waiters of `waiters` could proceed now
+        if waiters is self._async_getters:
+            return bool(self._qsize()) or self._closing
+        if waiters is self._async_putters:
+            return not (self._full() or self._over_cost())
+        return not self._unfinished_tasks
+
+    def _notify_async_not_empty(self, n: int = 1, *, threadsafe: bool) -> None:
+        if self._async_getters:
+            self._wakeup_async(self._async_getters, n, threadsafe=threadsafe)
+
+    def _notify_async_not_full(self, n: int = 1, *, threadsafe: bool) -> None:
+        if self._async_putters:
+            if self._sizer is not None:
+                n = len(self._async_putters)
+            self._wakeup_async(self._async_putters, n, threadsafe=threadsafe)
+
+    def _notify_async_finished(self, *, threadsafe: bool) -> None:
+        # Called once all tasks are done, for blocked joiners of both sides
+        if self._metrics is not None:
+            self._metrics.finished_at = perf_counter()
 
-    def _call_soon_threadsafe(
+        if self._async_joiners:
+            self._wakeup_async(
+                self._async_joiners,
+                len(self._async_joiners),
+                threadsafe=threadsafe
+            )
+
+    def _wakeup_async(
         self,
-        callback: Callable[..., None],
-        *args: Any
+        waiters: Deque[Future],
+        n: int = 1,
+        *,
+        threadsafe: bool
+    ) -> None:
+        # `threadsafe` is `True` if it is not called in an event loop
+        current = None if threadsafe else get_running_loop()
+
+        while n > 0 and waiters:
+            waiter = waiters.popleft()
+            if waiter.done():
+                continue
+
+            n -= 1
+
+            loop = waiter.get_loop()
+            if loop is current:
+                waiter.set_result(WOKEN)
+            else:
+                self._schedule_wakeup(loop, waiter, WOKEN)
+
+    def _handoff_async(self, item: T, *, threadsafe: bool) -> bool:
+        current = None if threadsafe else get_running_loop()
+        getters = self._async_getters
+
+        while getters:
+            waiter = getters.popleft()
+            if waiter.done():
+                continue
+
+            loop = waiter.get_loop()
+            if loop is current:
+                waiter.set_result(item)
+            else:
+                self._schedule_wakeup(loop, waiter, item)
+            return True
+
+        return False
+
+    def _loop_state(self, loop: AbstractEventLoop) -> _LoopState:
+        state = self._loop_states.get(loop)
+        if state is None:
+            state = self._loop_states[loop] = _LoopState()
+        return state
+
+    def _schedule_wakeup(
+        self,
+        loop: AbstractEventLoop,
+        waiter: Future,
+        result: Any
     ) -> None:
+        state = self._loop_state(loop)
+        state.wakeups.append((waiter, result))
+
+        profile = self._profile
+        if profile is not None:
+            profile.wakeups_sent += 1
+            profile.cross_waiters.add(waiter)
+
+        # While a wakeup callback is pending, later wakeups just attach
+        # to it, so a burst of puts from a thread costs one loop callback
+        if not state.wakeup_scheduled:
+            state.wakeup_scheduled = True
+            try:
+                loop.call_soon_threadsafe(self._flush_wakeups, state)
+            except RuntimeError:
+                # The loop is closed
+                pass
+
+    def _call_locked(self, callback: Callable[..., None], *args: Any) -> None:
+        """Call `callback(*args)` in the event loop with `_sync_mutex` held,
+        right away if the mutex is free, otherwise in a task which waits for
+        it as coroutines do, rather than block the loop or spin on it.
+        """
+
+        if not self._sync_mutex.acquire(False):
+            get_running_loop().create_task(
+                self._call_locked_async(callback, *args))
+            return
+
         try:
-            self._loop.call_soon_threadsafe(callback, *args)
-        except RuntimeError:
-            pass
+            callback(*args)
+        finally:
+            self._sync_mutex.release()
 
-    def _call_soon(
+    async def _call_locked_async(
         self,
         callback: Callable[..., None],
         *args: Any
     ) -> None:
-        if not self._loop.is_closed():
-            self._loop.call_soon(callback, *args)
+        await self._lock_async()
+        try:
+            callback(*args)
+        finally:
+            self._sync_mutex.release()
+
+    def _flush_wakeups(self, state: _LoopState) -> None:
+        self._call_locked(self._flush_wakeups_locked, state)
+
+    def _flush_wakeups_locked(self, state: _LoopState) -> None:
+        wakeups = state.wakeups
+        state.wakeups = []
+        state.wakeup_scheduled = False
+
+        for waiter, result in wakeups:
+            if not waiter.done():
+                waiter.set_result(result)
+            elif result is not WOKEN:
+                # The getter which is handed the item gave up meanwhile
+                self._requeue(result, threadsafe=False)
+
+            # Otherwise a cancelled waiter passes the wakeup on by itself
+
+    # There is at most one ready timer per loop, which is due when the next
+    # item becomes available, however many async getters are waiting for it
+    def _arm_ready_timer(self) -> None:
+        ready_in = self._ready_in()
+        if ready_in is None:
+            return
+
+        loop = get_running_loop()
+        state = self._loop_state(loop)
+        when = loop.time() + ready_in
+        timer = state.ready_timer
+
+        if timer is not None:
+            if timer.when() <= when:
+                return
+            timer.cancel()
+
+        state.ready_timer = loop.call_at(when, self._on_ready, state)
+
+    def _on_ready(self, state: _LoopState) -> None:
+        self._call_locked(self._on_ready_locked, state)
+
+    def _on_ready_locked(self, state: _LoopState) -> None:
+        state.ready_timer = None
+
+        ready = self._qsize()
+        if ready:
+            self._notify_async_not_empty(ready, threadsafe=False)
+
+        # For the getters which are still waiting for later items
+        if self._async_getters:
+            self._arm_ready_timer()
+
+
+async def _lock_async(lock: Any, endtime: Optional[float] = None) -> None:
+    """Acquire the contended `lock` in the event loop without blocking the
+    loop, or raise `asyncio.TimeoutError` if it is not acquired by `endtime`
+    of the loop clock.
+
+    The holder is most likely done within an iteration of the loop, so it
+    is first retried on the next iterations. Then it is waited for in a
+    thread of the default executor, which competes for it with other
+    threads on equal terms, while a coroutine which only polls it could
+    starve if threads keep taking it.
+
+    The lock is not held if it is cancelled or times out.
+    """
+
+    loop = get_running_loop()
+
+    for _ in range(_LOCK_SPINS):
+        if endtime is not None and loop.time() >= endtime:
+            raise asyncio.TimeoutError
+
+        await asyncio.sleep(0)
+        if lock.acquire(False):
+            return
+
+    if endtime is None:
+        acquiring = loop.run_in_executor(None, lock.acquire)
+    else:
+        acquiring = loop.run_in_executor(
+            None, lock.acquire, True, max(endtime - loop.time(), 0.))
+
+    try:
+        # Shielded, so that the lock is released if it is acquired after
+        # the coroutine is cancelled
+        acquired = await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        acquiring.add_done_callback(partial(_release_acquired, lock))
+        raise
+
+    if not acquired:
+        raise asyncio.TimeoutError
+
+
+def _release_acquired(lock: Any, acquiring: Future) -> None:
+    if not acquiring.cancelled() and acquiring.exception() is None and (
+        acquiring.result()
+    ):
+        lock.release()
+
+
+def _handed_item(waiter: Future) -> Any:
+    if waiter.done() and not waiter.cancelled() and (
+        waiter.exception() is None
+    ):
+        return waiter.result()
+    return WOKEN
+
+
+def _set_timeout(waiter: Future) -> None:
+    if not waiter.done():
+        waiter.set_exception(asyncio.TimeoutError())
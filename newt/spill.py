@@ -0,0 +1,432 @@
+from asyncio import AbstractEventLoop
+from collections import deque
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import weakref
+
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Deque,
+    List,
+    Optional
+)
+
+from .common import (
+    T,
+    lazy_property
+)
+from .queue import AbstractQueue
+from .proxy_sync import SyncQueueProxy
+from .proxy_async import AsyncQueueProxy
+
+
+# Each record of a segment file is a pickled item prefixed with its length,
+# or only a zero length for an item which could not be pickled
+_RECORD = struct.Struct('<I')
+
+# The most items which the spiller pickles or unpickles at a time, without
+# the mutex of the queue held
+_BATCH = 256
+
+# Seconds for which the spiller waits for more work before it exits
+_LINGER = 1.
+
+
+class _Segment:
+    """A sealed segment file which is read with mmap
+    """
+
+    __slots__ = ('path', 'count', '_file', '_map', '_offset')
+
+    def __init__(self, path: str, count: int) -> None:
+        self.path = path
+        # The number of items which are not read yet
+        self.count = count
+
+        self._file: Optional[BinaryIO] = None
+        self._map: Optional[mmap.mmap] = None
+        self._offset = 0
+
+    def read(self, kept: Deque[Any]) -> Any:
+        if self._map is None:
+            self._file = open(self.path, 'rb')
+            self._map = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offset = self._offset
+        size, = _RECORD.unpack_from(self._map, offset)
+        offset += _RECORD.size
+        self._offset = offset + size
+        self.count -= 1
+
+        if not size:
+            return kept.popleft()
+
+        return pickle.loads(self._map[offset:offset + size])
+
+    def remove(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+
+        os.remove(self.path)
+
+
+class SpillQueue(AbstractQueue[T]):
+    """Variant of Queue which keeps at most `memory_items` items, or items
+    of at most `memory_bytes` bytes in total, in memory, and spills the
+    rest to segment files in `directory`.
+
+    Spilled items are read back with mmap in FIFO order, and each segment
+    file is deleted once all its items are got. The size of an item in
+    memory is `memory_sizer(item)`, or `sys.getsizeof(item)` by default,
+    while `sizer` and `maxcost` bound the queue as they do for Queue.
+
+    If `directory` is not specified, a temporary directory is created, and
+    deleted with the queue.
+
+    Items are pickled, written, read and unpickled by a spiller thread,
+    without the mutex of the queue held, so neither putters nor getters,
+    and never the event loop, wait for the disk. An item which could not
+    be pickled is kept in memory in its place. `qsize()` only counts the
+    items in memory, which could be got right away, while `maxsize` bounds
+    all items, and `spilled` counts the rest.
+    """
+
+    _handoff = True
+    # Spilled items are got as copies
+    _traceable = False
+
+    _memory: Deque[T]
+    _sizes: Deque[int]
+    _outbox: Deque[T]
+    _segments: Deque[_Segment]
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        *,
+        memory_items: int = 10000,
+        memory_bytes: Optional[int] = None,
+        memory_sizer: Optional[Callable[[T], int]] = None,
+        directory: Optional[str] = None,
+        segment_size: int = 64 << 20,
+        sizer: Optional[Callable[[T], int]] = None,
+        maxcost: int = 0,
+        overflow: str = 'block'
+    ) -> None:
+        if memory_items <= 0:
+            raise ValueError("'memory_items' must be a positive number")
+
+        if memory_bytes is not None and memory_bytes <= 0:
+            raise ValueError("'memory_bytes' must be a positive number")
+
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='newt-spill-')
+            weakref.finalize(self, shutil.rmtree, directory, True)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        self._directory = directory
+        self._memory_items = memory_items
+        self._memory_bytes = memory_bytes
+        self._memory_sizer = memory_sizer or sys.getsizeof
+        self._segment_size = segment_size
+
+        super().__init__(
+            maxsize, sizer=sizer, maxcost=maxcost, overflow=overflow)
+
+        # Only the spiller waits for it, for items to write or to read back
+        self._has_work = threading.Condition(self._sync_mutex)
+
+    @lazy_property
+    def sync_queue(self) -> SyncQueueProxy[T]:
+        return SyncQueueProxy(self)
+
+    @lazy_property
+    def async_queue(self) -> AsyncQueueProxy[T]:
+        return AsyncQueueProxy(self)
+
+    def _create_async_proxy(
+        self,
+        loop: AbstractEventLoop
+    ) -> AsyncQueueProxy[T]:
+        return AsyncQueueProxy(self, loop)
+
+    @property
+    def spilled(self) -> int:
+        """The number of items which are not in memory
+        """
+
+        return self._spilled
+
+    def _init(self, maxsize: int) -> None:
+        self._memory = deque()
+        # The sizes of items in memory, only if `memory_bytes` is specified
+        self._sizes = deque()
+        self._size = 0
+
+        # The number of spilled items, which are the ones in `_outbox`,
+        # being written or read by the spiller, and on disk, in that order
+        # from the newest
+        self._spilled = 0
+        # Spilled items which the spiller has not taken to write yet
+        self._outbox = deque()
+        # The number of items written which are not taken to read back yet
+        self._on_disk = 0
+
+        self._spiller: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+        # The rest is only accessed by the spiller.
+        # Sealed segments to read, the first of which is being read
+        self._segments = deque()
+        # The segment being written, which is sealed once it is full,
+        # or once the reader catches up with it
+        self._writer: Optional[BinaryIO] = None
+        self._writer_path = ''
+        self._writer_count = 0
+        self._writer_size = 0
+        self._segment_seq = 0
+        # Items which could not be pickled, in the order of their records
+        self._kept: Deque[Any] = deque()
+
+    def _qsize(self) -> int:
+        return len(self._memory)
+
+    def _full(self) -> bool:
+        size = len(self._memory) + self._spilled + self._handed
+        return 0 < self._maxsize <= size
+
+    def _try_handoff(self, item: T, *, threadsafe: bool) -> bool:
+        # Spilled items are older than `item`
+        if self._spilled:
+            return False
+
+        return super()._try_handoff(item, threadsafe=threadsafe)
+
+    def _put(self, item: T) -> None:
+        # Once anything is spilled, later items are spilled as well,
+        # so that items are always got in FIFO order
+        if not self._spilled:
+            if self._memory_bytes is None:
+                if len(self._memory) < self._memory_items:
+                    self._memory.append(item)
+                    return
+            else:
+                size = self._memory_sizer(item)
+                fits = self._size + size <= self._memory_bytes
+                if fits and len(self._memory) < self._memory_items:
+                    self._memory.append(item)
+                    self._sizes.append(size)
+                    self._size += size
+                    return
+
+        if self._error is not None:
+            raise RuntimeError('failed to spill items') from self._error
+
+        self._outbox.append(item)
+        self._spilled += 1
+        self._wake_spiller()
+
+    def _get(self) -> T:
+        if self._memory_bytes is not None:
+            self._size -= self._sizes.popleft()
+        item = self._memory.popleft()
+
+        if self._spilled and self._needs_refill():
+            self._wake_spiller()
+
+        return item
+
+    def _requeue_front(self, item: T) -> None:
+        # Items in memory are older than the spilled ones
+        self._memory.appendleft(item)
+        if self._memory_bytes is not None:
+            size = self._memory_sizer(item)
+            self._sizes.appendleft(size)
+            self._size += size
+
+    # The spiller
+    # --------------------------------------------------------------
+    # A thread which is started once items are spilled, and exits once
+    # there is nothing to do for `_LINGER` seconds. The methods below are
+    # called with `_sync_mutex` held, but release it for the disk I/O
+
+    def _needs_refill(self) -> bool:
+        # Items are read back in batches, once memory is half empty
+        if len(self._memory) * 2 > self._memory_items:
+            return False
+
+        memory_bytes = self._memory_bytes
+        return memory_bytes is None or self._size * 2 <= memory_bytes
+
+    def _wake_spiller(self) -> None:
+        if self._spiller is not None:
+            self._has_work.notify()
+            return
+
+        self._spiller = threading.Thread(
+            target=self._run_spiller, name='newt-spill', daemon=True)
+        self._spiller.start()
+
+    def _run_spiller(self) -> None:
+        with self._sync_mutex:
+            idle = False
+
+            try:
+                while not self._closing:
+                    if self._spilled and self._needs_refill():
+                        if self._on_disk:
+                            self._read_batch()
+                        else:
+                            # Nothing is on disk, so the oldest spilled
+                            # items are still in memory
+                            self._take_back()
+                    elif self._outbox:
+                        self._write_batch()
+                    elif idle:
+                        break
+                    else:
+                        # Not trusting the result of `wait()`, which could
+                        # be notified right after the timeout
+                        idle = not self._has_work.wait(_LINGER)
+                        continue
+
+                    idle = False
+            except BaseException as e:
+                self._error = e
+                raise
+            finally:
+                self._spiller = None
+
+    def _write_batch(self) -> None:
+        outbox = self._outbox
+        items = [outbox.popleft() for _ in range(min(len(outbox), _BATCH))]
+
+        self._sync_mutex.release()
+        try:
+            for item in items:
+                self._write(item)
+        finally:
+            self._sync_mutex.acquire()
+
+        self._on_disk += len(items)
+
+    def _read_batch(self) -> None:
+        room = self._memory_items - len(self._memory)
+        count = min(room, self._on_disk, _BATCH)
+        self._on_disk -= count
+
+        memory_bytes = self._memory_bytes
+        if memory_bytes is not None:
+            memory_bytes -= self._size
+
+        items: List[T] = []
+        sizes: List[int] = []
+
+        self._sync_mutex.release()
+        try:
+            size = 0
+            # The last item could exceed `memory_bytes`, so that at least
+            # one item is read back
+            while len(items) < count and (
+                memory_bytes is None or size < memory_bytes
+            ):
+                item = self._read()
+                items.append(item)
+
+                if memory_bytes is not None:
+                    sizes.append(self._memory_sizer(item))
+                    size += sizes[-1]
+        finally:
+            self._sync_mutex.acquire()
+
+        self._on_disk += count - len(items)
+        self._refill(items, sizes)
+
+    def _take_back(self) -> None:
+        room = self._memory_items - len(self._memory)
+        outbox = self._outbox
+        memory_bytes = self._memory_bytes
+
+        items: List[T] = []
+        sizes: List[int] = []
+        size = self._size
+
+        while outbox and len(items) < room and (
+            memory_bytes is None or size < memory_bytes
+        ):
+            item = outbox.popleft()
+            items.append(item)
+
+            if memory_bytes is not None:
+                sizes.append(self._memory_sizer(item))
+                size += sizes[-1]
+
+        self._refill(items, sizes)
+
+    def _refill(self, items: List[T], sizes: List[int]) -> None:
+        self._memory.extend(items)
+        self._sizes.extend(sizes)
+        self._size += sum(sizes)
+        self._spilled -= len(items)
+
+        count = len(items)
+        self._notify_sync_not_empty(count)
+        self._notify_async_not_empty(count, threadsafe=True)
+
+    # Only called by the spiller without `_sync_mutex` held
+
+    def _write(self, item: T) -> None:
+        if self._writer is None:
+            self._segment_seq += 1
+            self._writer_path = os.path.join(
+                self._directory, f'segment-{self._segment_seq:08d}')
+            self._writer = open(self._writer_path, 'wb')
+
+        try:
+            data = pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            self._kept.append(item)
+            data = b''
+
+        self._writer.write(_RECORD.pack(len(data)))
+        self._writer.write(data)
+
+        self._writer_count += 1
+        self._writer_size += _RECORD.size + len(data)
+
+        if self._writer_size >= self._segment_size:
+            self._seal()
+
+    def _seal(self) -> None:
+        self._writer.close()
+        self._writer = None
+
+        self._segments.append(
+            _Segment(self._writer_path, self._writer_count))
+        self._writer_count = 0
+        self._writer_size = 0
+
+    def _read(self) -> T:
+        if not self._segments:
+            # The reader catches up with the writer
+            self._seal()
+
+        segment = self._segments[0]
+        item = segment.read(self._kept)
+
+        if not segment.count:
+            self._segments.popleft()
+            segment.remove()
+
+        return item
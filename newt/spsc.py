@@ -0,0 +1,359 @@
+import asyncio
+from asyncio import (
+    AbstractEventLoop,
+    Future,
+    QueueEmpty,
+    QueueFull
+)
+import threading
+from queue import Empty, Full
+
+from typing import (
+    Generic,
+    List,
+    Optional,
+    Union
+)
+
+from .common import (
+    T,
+    OptInt,
+    lazy_property,
+    check_closing,
+    get_running_loop
+)
+
+
+# Returned by `_try_get()` if the queue is empty,
+# since `None` is a valid item
+_EMPTY = object()
+
+
+# A waiter is only woken up by the peer, and the peer sees the same waiter
+# until it is unparked, so `_woken` avoids waking it up once per item
+class _SyncWaiter:
+    __slots__ = ('_lock', '_woken')
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._lock.acquire()
+        self._woken = False
+
+    def wait(self, timeout: Optional[float]) -> None:
+        self._lock.acquire(timeout=-1 if timeout is None else timeout)
+
+    def wake(self) -> None:
+        if self._woken:
+            return
+
+        self._woken = True
+        self._lock.release()
+
+
+class _AsyncWaiter:
+    __slots__ = ('_loop', '_woken', 'future')
+
+    def __init__(self, loop: AbstractEventLoop) -> None:
+        self._loop = loop
+        self._woken = False
+        self.future = loop.create_future()
+
+    def wake(self) -> None:
+        if self._woken:
+            return
+
+        self._woken = True
+        try:
+            self._loop.call_soon_threadsafe(_wake_future, self.future)
+        except RuntimeError:
+            # The loop is closed
+            pass
+
+
+def _wake_future(future: Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+Waiter = Union[_SyncWaiter, _AsyncWaiter]
+
+
+class SPSCQueue(Generic[T]):
+    """A fixed-capacity queue for exactly one producer and one consumer,
+    each of which could be either a thread or a coroutine.
+
+    The data path is a ring buffer with separate head and tail indices,
+    where the head is only written by the consumer and the tail is only
+    written by the producer, so it relies on GIL-atomic operations rather
+    than locks. It only blocks when the queue is empty or full.
+
+    Using it with more than one producer or more than one consumer at a
+    time is not supported. `task_done()` and `join()` are not supported.
+    """
+
+    _getter: Optional[Waiter]
+    _putter: Optional[Waiter]
+
+    def __init__(self, maxsize: int) -> None:
+        if maxsize <= 0:
+            raise ValueError("'maxsize' must be a positive number")
+
+        self._maxsize = maxsize
+        self._buffer: List = [None] * maxsize
+
+        # Only written by the consumer
+        self._head = 0
+        # Only written by the producer
+        self._tail = 0
+
+        # The parked consumer and producer, if any
+        self._getter = None
+        self._putter = None
+
+        self._closing = False
+
+    @lazy_property
+    def sync_queue(self) -> 'SPSCSyncQueueProxy[T]':
+        return SPSCSyncQueueProxy(self)
+
+    @lazy_property
+    def async_queue(self) -> 'SPSCAsyncQueueProxy[T]':
+        return SPSCAsyncQueueProxy(self)
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    def close(self) -> None:
+        self._closing = True
+
+    async def wait_closed(self) -> None:
+        if not self._closing:
+            raise RuntimeError('waiting for non-closed queue')
+        # give execution chances for the pending wakeups
+        await asyncio.sleep(0)
+
+    @property
+    def closed(self) -> bool:
+        return self._closing
+
+    def _qsize(self) -> int:
+        return self._tail - self._head
+
+    def _try_put(self, item: T) -> bool:
+        tail = self._tail
+        if tail - self._head >= self._maxsize:
+            return False
+
+        self._buffer[tail % self._maxsize] = item
+        # Publish the item before looking for a parked consumer,
+        # the consumer does it the other way round
+        self._tail = tail + 1
+
+        getter = self._getter
+        if getter is not None:
+            getter.wake()
+
+        return True
+
+    def _try_get(self):
+        head = self._head
+        if head == self._tail:
+            return _EMPTY
+
+        index = head % self._maxsize
+        buffer = self._buffer
+        item = buffer[index]
+        buffer[index] = None
+        self._head = head + 1
+
+        putter = self._putter
+        if putter is not None:
+            putter.wake()
+
+        return item
+
+
+class SPSCSyncQueueProxy(Generic[T]):
+    def __init__(self, parent: SPSCQueue[T]) -> None:
+        self._parent = parent
+
+    @property
+    def maxsize(self) -> int:
+        return self._parent._maxsize
+
+    def qsize(self) -> int:
+        return self._parent._qsize()
+
+    def empty(self) -> bool:
+        return not self._parent._qsize()
+
+    def full(self) -> bool:
+        return self._parent._qsize() >= self._parent._maxsize
+
+    @check_closing
+    def put(
+        self,
+        item: T,
+        block: bool = True,
+        timeout: OptInt = None
+    ) -> None:
+        """Put item into the queue, with the same `block` and `timeout`
+        semantics as `queue.Queue.put()`.
+        """
+
+        parent = self._parent
+
+        if parent._try_put(item):
+            return
+
+        if not block:
+            raise Full
+
+        if timeout is not None and timeout < 0:
+            raise ValueError("'timeout' must be a non-negative number")
+
+        while True:
+            waiter = _SyncWaiter()
+            parent._putter = waiter
+
+            # The consumer might have taken an item before it saw the waiter
+            if parent._try_put(item):
+                parent._putter = None
+                return
+
+            waiter.wait(timeout)
+            parent._putter = None
+
+            if parent._try_put(item):
+                return
+
+            if timeout is not None:
+                raise Full
+
+    def put_nowait(self, item: T) -> None:
+        self.put(item, False)
+
+    @check_closing
+    def get(
+        self,
+        block: bool = True,
+        timeout: OptInt = None
+    ) -> T:
+        """Remove and return an item from the queue, with the same `block`
+        and `timeout` semantics as `queue.Queue.get()`.
+        """
+
+        parent = self._parent
+
+        item = parent._try_get()
+        if item is not _EMPTY:
+            return item
+
+        if not block:
+            raise Empty
+
+        if timeout is not None and timeout < 0:
+            raise ValueError("'timeout' must be a non-negative number")
+
+        while True:
+            waiter = _SyncWaiter()
+            parent._getter = waiter
+
+            # The producer might have put an item before it saw the waiter
+            item = parent._try_get()
+            if item is not _EMPTY:
+                parent._getter = None
+                return item
+
+            waiter.wait(timeout)
+            parent._getter = None
+
+            item = parent._try_get()
+            if item is not _EMPTY:
+                return item
+
+            if timeout is not None:
+                raise Empty
+
+    def get_nowait(self) -> T:
+        return self.get(False)
+
+
+class SPSCAsyncQueueProxy(Generic[T]):
+    def __init__(self, parent: SPSCQueue[T]) -> None:
+        self._parent = parent
+
+    @property
+    def maxsize(self) -> int:
+        return self._parent._maxsize
+
+    def qsize(self) -> int:
+        return self._parent._qsize()
+
+    def empty(self) -> bool:
+        return not self._parent._qsize()
+
+    def full(self) -> bool:
+        return self._parent._qsize() >= self._parent._maxsize
+
+    @check_closing
+    async def put(self, item: T) -> None:
+        """Put an item into the queue, and wait for a free slot if the queue
+        is full.
+        """
+
+        parent = self._parent
+
+        while not parent._try_put(item):
+            waiter = _AsyncWaiter(get_running_loop())
+            parent._putter = waiter
+
+            # The consumer might have taken an item before it saw the waiter
+            if parent._try_put(item):
+                parent._putter = None
+                return
+
+            try:
+                await waiter.future
+            finally:
+                parent._putter = None
+
+    @check_closing
+    def put_nowait(self, item: T) -> None:
+        if not self._parent._try_put(item):
+            raise QueueFull
+
+    @check_closing
+    async def get(self) -> T:
+        """Remove and return an item from the queue, and wait until an item
+        is available if the queue is empty.
+        """
+
+        parent = self._parent
+
+        while True:
+            item = parent._try_get()
+            if item is not _EMPTY:
+                return item
+
+            waiter = _AsyncWaiter(get_running_loop())
+            parent._getter = waiter
+
+            # The producer might have put an item before it saw the waiter
+            item = parent._try_get()
+            if item is not _EMPTY:
+                parent._getter = None
+                return item
+
+            try:
+                await waiter.future
+            finally:
+                parent._getter = None
+
+    @check_closing
+    def get_nowait(self) -> T:
+        item = self._parent._try_get()
+        if item is _EMPTY:
+            raise QueueEmpty
+        return item
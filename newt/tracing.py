@@ -0,0 +1,193 @@
+import math
+from time import perf_counter
+
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple
+)
+
+from .profile import in_event_loop
+
+
+# The most sampled items which are in the queue at once. Beyond that, the
+# oldest stamps are forgotten, e.g. of items which are never got
+_MAX_PENDING = 10000
+
+_SIDES = ('sync', 'async')
+
+
+class Sketch:
+    """Percentile sketch of non-negative values, whose percentiles are within
+    the relative error `accuracy` of the true values, like DDSketch.
+
+    Values are counted in buckets of exponentially growing widths, so the
+    memory grows with the logarithm of the range of values only.
+    """
+
+    __slots__ = ('_gamma', '_log_gamma', '_bins', '_zeros', 'count', 'sum',
+                 'min', 'max')
+
+    # Values below it are counted as zero
+    _MIN_VALUE = 1e-9
+
+    def __init__(self, accuracy: float = 0.01) -> None:
+        if not 0 < accuracy < 1:
+            raise ValueError("'accuracy' must be between 0 and 1")
+
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._bins: Dict[int, int] = {}
+        self._zeros = 0
+
+        self.count = 0
+        self.sum = 0.
+        self.min = math.inf
+        self.max = 0.
+
+    def add(self, value: float) -> None:
+        if value < self._MIN_VALUE:
+            self._zeros += 1
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self._bins[key] = self._bins.get(key, 0) + 1
+
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> float:
+        """Return the estimated `percent` percentile, or `0.` if there is no
+        value
+        """
+
+        if not self.count:
+            return 0.
+
+        rank = percent / 100 * (self.count - 1)
+        seen = self._zeros
+        if seen > rank:
+            return 0.
+
+        for key in sorted(self._bins):
+            seen += self._bins[key]
+            if seen > rank:
+                # The middle of the bucket (gamma^(key-1), gamma^key]
+                value = 2 * self._gamma ** key / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        count = self.count
+        return {
+            'count': count,
+            'mean': self.sum / count if count else 0.,
+            'min': self.min if count else 0.,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9)
+        }
+
+
+class Tracer:
+    """Stamps every `stride`th item put into a queue, in side storage keyed
+    by the identity of the item, and adds the seconds until it is got to
+    the sketch of the direction, such as 'sync->async'.
+
+    The side of a put or a get is async if it is called in an event loop.
+    Only updated with `_sync_mutex` of the queue held.
+
+    For each item, the queue counts `countdown` down, and calls `stamp()`
+    once it reaches zero, then calls `on_get()` when the item is got only if
+    `id(item)` is in `stamps`, so that most items cost no call.
+
+    A stamp is matched by the identity of the item only, which could not
+    tell apart the puts of an object which is in the queue more than once.
+    """
+
+    __slots__ = ('_stride', 'countdown', 'stamps', '_pending', 'sketches')
+
+    def __init__(self, rate: float, accuracy: float) -> None:
+        if not 0 < rate <= 1:
+            raise ValueError("'rate' must be in (0, 1]")
+
+        self._stride = max(1, round(1 / rate))
+        self.countdown = self._stride
+
+        # id of item -> [(item, stamp, whether put in an event loop)],
+        # where the item is kept to tell it from a later item of the same id
+        self.stamps: Dict[int, List[Tuple[Any, float, bool]]] = {}
+        self._pending = 0
+
+        self.sketches = {
+            f'{put}->{get}': Sketch(accuracy)
+            for put in _SIDES
+            for get in _SIDES
+        }
+
+    def stamp(self, item: Any) -> None:
+        self.countdown = self._stride
+
+        if self._pending >= _MAX_PENDING:
+            self._forget_oldest()
+
+        self.stamps.setdefault(id(item), []).append(
+            (item, perf_counter(), in_event_loop()))
+        self._pending += 1
+
+    def on_get(self, item: Any) -> None:
+        entry = self._pop(item)
+        if entry is None:
+            return
+
+        _, stamp, put_in_loop = entry
+        direction = (
+            f'{_SIDES[put_in_loop]}->{_SIDES[in_event_loop()]}'
+        )
+        self.sketches[direction].add(perf_counter() - stamp)
+
+    def on_discard(self, items: List[Any]) -> None:
+        if self._pending:
+            for item in items:
+                self._pop(item)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            direction: sketch.snapshot()
+            for direction, sketch in self.sketches.items()
+        }
+
+    def _pop(self, item: Any) -> Any:
+        key = id(item)
+        entries = self.stamps.get(key)
+        if entries is None:
+            return None
+
+        for index, entry in enumerate(entries):
+            if entry[0] is item:
+                break
+        else:
+            return None
+
+        del entries[index]
+        if not entries:
+            del self.stamps[key]
+
+        self._pending -= 1
+        return entry
+
+    def _forget_oldest(self) -> None:
+        key = next(iter(self.stamps))
+        entries = self.stamps[key]
+        del entries[0]
+        if not entries:
+            del self.stamps[key]
+
+        self._pending -= 1
@@ -0,0 +1,107 @@
+import pytest
+import asyncio
+import threading
+from queue import Full
+
+from newt import (
+    BytesQueue
+)
+
+
+def test_chunks_are_views_of_the_arena():
+    q = BytesQueue(10)
+
+    with pytest.raises(ValueError):
+        BytesQueue(0)
+
+    with pytest.raises(ValueError, match='capacity'):
+        q.sync_queue.put(b'x' * 11)
+
+    buffer = bytearray(b'abcd')
+    q.sync_queue.put(buffer)
+    q.sync_queue.put(memoryview(b'efghij'))
+
+    # The producer could reuse its buffer right after put()
+    buffer[:] = b'zzzz'
+
+    assert q.sync_queue.full()
+    assert q.used == 10
+
+    with pytest.raises(Full):
+        q.sync_queue.put(b'k', timeout=0.01)
+
+    first, second = q.sync_queue.get_many(2)
+
+    assert bytes(first) == b'abcd'
+    assert first.view.readonly
+    assert len(second) == 6
+
+    # The room is only reused after the chunk is released
+    with pytest.raises(Full):
+        q.sync_queue.put_nowait(b'k')
+
+    with first as view:
+        assert view.tobytes() == b'abcd'
+
+    assert first.released
+    with pytest.raises(ValueError):
+        first.view
+
+    q.sync_queue.put(b'klm')
+    assert q.used == 9
+
+    # Does not fit before the end of the arena, so it wraps around,
+    # and could not be put before the second chunk is released
+    with pytest.raises(Full):
+        q.sync_queue.put_nowait(b'no')
+
+    second.release()
+    second.release()
+    assert q.used == 3
+
+    q.sync_queue.put(b'no')
+    assert q.used == 5
+
+    assert [chunk.tobytes() for chunk in q.sync_queue.get_many(2)] == [
+        b'klm', b'no'
+    ]
+
+
+def test_out_of_order_release():
+    q = BytesQueue(6)
+    q.sync_queue.put_many([b'ab', b'cd', b'ef'])
+
+    a, b, c = q.sync_queue.get_many(3)
+
+    b.release()
+    c.release()
+    assert q.used == 6
+
+    a.release()
+    assert q.used == 0
+
+
+@pytest.mark.asyncio
+async def test_async_producer_thread_consumer():
+    q = BytesQueue(1024)
+    payloads = [bytes([i]) * (i * 7 % 300 + 1) for i in range(200)]
+    got = []
+
+    def consume():
+        for _ in range(len(payloads)):
+            with q.sync_queue.get() as view:
+                got.append(view.tobytes())
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+
+    for payload in payloads:
+        await q.async_queue.put(payload)
+
+    await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+    assert got == payloads
+    assert q.used == 0
+
+    q.close()
+    await q.wait_closed()
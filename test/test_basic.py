@@ -1,6 +1,9 @@
 import pytest
+import asyncio
+import threading
 
 from asyncio import QueueEmpty
+from queue import Empty, Full
 
 from newt import (
     Queue
@@ -37,3 +40,183 @@ async def test_close_with_pending_and_not_full():
 
     q.close()
     await q.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_async_side_notifies_sync_waiters_directly():
+    q = Queue(1)
+
+    await q.async_queue.put(1)
+    assert await q.async_queue.get() == 1
+
+    # Nothing should be left behind for the event loop by the async proxy
+    assert not q._loop_states
+
+    q.close()
+    assert q.closed
+
+
+@pytest.mark.asyncio
+async def test_no_cross_domain_notification_without_waiters():
+    q = Queue()
+
+    await q.async_queue.put(1)
+
+    # The loop is bound, but no coroutine is waiting,
+    # so the sync side should not schedule anything on the loop
+    q.sync_queue.put(2)
+    assert q.sync_queue.get() == 1
+    assert not q._loop_states
+
+    assert await q.async_queue.get() == 2
+
+    q.close()
+    await q.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_coalesced_wakeups_from_sync_side():
+    q = Queue()
+
+    getters = [
+        asyncio.ensure_future(q.async_queue.get())
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    assert len(q._async_getters) == 3
+
+    def produce():
+        for i in range(3):
+            q.sync_queue.put(i)
+
+    # Block the loop on purpose, so that the burst is coalesced
+    thread = threading.Thread(target=produce)
+    thread.start()
+    thread.join()
+
+    state = q._loop_states[asyncio.get_running_loop()]
+    assert len(state.wakeups) == 3
+    assert state.wakeup_scheduled
+
+    assert sorted(await asyncio.gather(*getters)) == [0, 1, 2]
+    assert not state.wakeup_scheduled
+
+    q.close()
+    await q.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_getter_passes_wakeup_on():
+    q = Queue()
+
+    first = asyncio.ensure_future(q.async_queue.get())
+    second = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    thread = threading.Thread(target=q.sync_queue.put, args=(1,))
+    thread.start()
+    thread.join()
+
+    first.cancel()
+
+    assert await second == 1
+    assert first.cancelled()
+
+    q.close()
+    await q.wait_closed()
+
+
+def test_sync_timeouts_without_event_loop():
+    q = Queue(1)
+
+    with pytest.raises(Empty):
+        q.sync_queue.get(timeout=0.01)
+
+    q.sync_queue.put(1, timeout=0.01)
+
+    with pytest.raises(Full):
+        q.sync_queue.put(2, timeout=0.01)
+
+    assert q.sync_queue.get(timeout=0.01) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_timeouts():
+    q = Queue(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await q.async_queue.get(timeout=0.01)
+
+    await q.async_queue.put(1, timeout=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await q.async_queue.put(2, timeout=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await q.async_queue.put_many([2, 3], timeout=0.01)
+
+    assert not q._async_getters
+    assert not q._async_putters
+
+    getter = asyncio.ensure_future(q.async_queue.get(timeout=0))
+    assert await getter == 1
+
+    with pytest.raises(ValueError):
+        await q.async_queue.get(timeout=-1)
+
+    q.close()
+    await q.wait_closed()
+
+
+def test_consumers_on_multiple_event_loops():
+    q = Queue(4)
+    got = []
+    lock = threading.Lock()
+
+    async def consume():
+        async for item in q.async_queue:
+            with lock:
+                got.append(item)
+
+    threads = [
+        threading.Thread(target=asyncio.run, args=(consume(),))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+
+    async def produce():
+        await q.async_queue.put_many(range(200))
+
+    asyncio.run(produce())
+    q.close()
+
+    for thread in threads:
+        thread.join()
+
+    assert sorted(got) == list(range(200))
+
+
+@pytest.mark.asyncio
+async def test_async_queue_for_loop():
+    q = Queue()
+    loop = asyncio.get_running_loop()
+    async_queue = q.async_queue_for(loop)
+
+    assert q.async_queue_for(loop) is async_queue
+
+    await async_queue.put(1)
+
+    async def get_from_another_loop():
+        return await async_queue.get()
+
+    with pytest.raises(RuntimeError, match='different event loop'):
+        await loop.run_in_executor(
+            None, asyncio.run, get_from_another_loop())
+
+    assert await async_queue.get() == 1
+    async_queue.task_done()
+    await async_queue.join()
+
+    q.close()
+    await q.wait_closed()
@@ -0,0 +1,122 @@
+import pytest
+import asyncio
+import threading
+import time
+from queue import Empty, Full
+
+from newt import (
+    Queue,
+    BucketPriorityQueue
+)
+
+
+def test_sync_put_many_get_many():
+    q = Queue()
+
+    q.sync_queue.put_many(range(5))
+
+    assert q.sync_queue.qsize() == 5
+    assert q.sync_queue.get_many(3) == [0, 1, 2]
+    assert q.sync_queue.get_many(10) == [3, 4]
+
+    with pytest.raises(Empty):
+        q.sync_queue.get_many(1, block=False)
+
+    with pytest.raises(ValueError, match='max_items'):
+        q.sync_queue.get_many(0)
+
+
+def test_sync_put_many_bounded():
+    q = Queue(2)
+
+    with pytest.raises(Full):
+        q.sync_queue.put_many(range(3), block=False)
+
+    # The items which fit are already in the queue
+    assert q.sync_queue.get_many(3) == [0, 1]
+
+    with pytest.raises(Full):
+        q.sync_queue.put_many(range(3), timeout=0.01)
+
+    assert q.sync_queue.qsize() == 2
+
+
+@pytest.mark.asyncio
+async def test_async_put_many_blocks_for_the_rest():
+    q = Queue(2)
+    got = []
+
+    def consume():
+        while len(got) < 5:
+            got.extend(q.sync_queue.get_many(5))
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+
+    await q.async_queue.put_many(range(5))
+    await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+    assert got == list(range(5))
+
+    q.close()
+    await q.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_async_get_many():
+    q = Queue()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await q.async_queue.get_many(2, timeout=0.01)
+
+    assert not q._async_getters
+
+    thread = threading.Thread(
+        target=q.sync_queue.put_many, args=([1, 2, 3],))
+    getter = asyncio.ensure_future(q.async_queue.get_many(2))
+    await asyncio.sleep(0)
+
+    thread.start()
+    thread.join()
+
+    assert await getter == [1, 2]
+    assert await q.async_queue.get_many(2, timeout=1) == [3]
+
+    q.close()
+    await q.wait_closed()
+
+
+def test_sync_put_many_notifies_the_items_put_before_an_error():
+    q = BucketPriorityQueue(levels=4)
+    got = []
+
+    thread = threading.Thread(
+        target=lambda: got.append(q.sync_queue.get(timeout=5)))
+    thread.start()
+
+    while not q._sync_getters:
+        time.sleep(0.001)
+
+    with pytest.raises(ValueError):
+        q.sync_queue.put_many([(1, 'a'), (99, 'bad')])
+
+    # Woken up by the put, rather than by its timeout
+    thread.join(1)
+    assert got == [(1, 'a')]
+    thread.join()
+
+
+@pytest.mark.asyncio
+async def test_async_put_many_notifies_the_items_put_before_an_error():
+    q = BucketPriorityQueue(levels=4)
+
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    with pytest.raises(ValueError):
+        await q.async_queue.put_many([(1, 'a'), (99, 'bad')])
+
+    assert await asyncio.wait_for(getter, 5) == (1, 'a')
+
+    q.close()
+    await q.wait_closed()
@@ -0,0 +1,97 @@
+import pytest
+import asyncio
+import threading
+from queue import Full
+
+from newt import (
+    IndexedPriorityQueue,
+    PriorityQueue,
+    Queue
+)
+
+
+def test_bounded_by_cost():
+    q = Queue(maxcost=10, sizer=len)
+
+    with pytest.raises(ValueError, match='sizer'):
+        Queue(maxcost=10)
+
+    q.sync_queue.put('abcd')
+    q.sync_queue.put('efgh')
+    assert q.cost == 8
+    assert not q.sync_queue.full()
+
+    with pytest.raises(Full):
+        q.sync_queue.put_nowait('ijk')
+
+    # Items which fit are still accepted
+    q.sync_queue.put('ij')
+    assert q.cost == 10
+    assert q.sync_queue.full()
+    assert q.async_queue.full()
+
+    assert q.sync_queue.get() == 'abcd'
+    assert q.sync_queue.get_many(2) == ['efgh', 'ij']
+    assert q.cost == 0
+
+    # An item which costs more than `maxcost` only fits an empty queue
+    q.sync_queue.put('x' * 20)
+    assert q.cost == 20
+
+    with pytest.raises(Full):
+        q.sync_queue.put('y', timeout=0.01)
+
+
+def test_maxsize_still_applies():
+    q = PriorityQueue(2, maxcost=100, sizer=lambda x: x)
+
+    q.sync_queue.put_many([3, 1])
+    assert q.sync_queue.full()
+
+    with pytest.raises(Full):
+        q.sync_queue.put_nowait(1)
+
+    assert q.sync_queue.get() == 1
+    assert q.cost == 3
+
+
+def test_removed_items_release_cost():
+    q = IndexedPriorityQueue(maxcost=10, sizer=lambda x: x)
+
+    handle = q.sync_queue.put(6)
+    q.sync_queue.put(4)
+
+    thread = threading.Thread(target=q.sync_queue.put, args=(5,))
+    thread.start()
+
+    assert q.remove(handle)
+    thread.join()
+
+    assert q.cost == 9
+
+
+@pytest.mark.asyncio
+async def test_putters_wait_for_enough_cost():
+    q = Queue(maxcost=10, sizer=len)
+    q.sync_queue.put('x' * 10)
+
+    # All blocked putters are woken up by one get,
+    # since each of them fits after it
+    putters = [
+        asyncio.ensure_future(q.async_queue.put('abc'))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+
+    thread = threading.Thread(target=q.sync_queue.put, args=('a',))
+    thread.start()
+
+    assert await q.async_queue.get() == 'x' * 10
+    await asyncio.gather(*putters)
+    await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+    assert q.cost == 10
+    assert q.sync_queue.qsize() == 4
+
+    q.close()
+    await q.wait_closed()
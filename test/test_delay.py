@@ -0,0 +1,106 @@
+import pytest
+import asyncio
+import threading
+import time
+
+from newt import (
+    DelayQueue
+)
+
+
+def test_sync_getter_wakes_at_deadline():
+    q = DelayQueue()
+
+    q.sync_queue.put('b', delay=0.2)
+    q.sync_queue.put('a', delay=0.1)
+    q.sync_queue.put('now')
+
+    assert q.sync_queue.qsize() == 1
+    assert q.sync_queue.get() == 'now'
+    assert q.sync_queue.empty()
+
+    start = time.monotonic()
+    assert q.sync_queue.get() == 'a'
+    assert q.sync_queue.get() == 'b'
+    elapsed = time.monotonic() - start
+
+    assert 0.15 < elapsed < 0.5
+
+
+def test_put_at_and_bounded():
+    q = DelayQueue(2)
+
+    q.sync_queue.put(1, at=time.time() + 0.05)
+    q.sync_queue.put_nowait(2, delay=10)
+
+    # Delayed items count towards `maxsize`
+    assert q.sync_queue.full()
+
+    assert q.sync_queue.get(timeout=1) == 1
+
+    with pytest.raises(ValueError, match='both'):
+        q.sync_queue.put(3, delay=1, at=time.time())
+
+
+@pytest.mark.asyncio
+async def test_async_getters_wake_at_deadlines():
+    q = DelayQueue()
+
+    getters = [
+        asyncio.ensure_future(q.async_queue.get())
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0)
+
+    def produce():
+        q.sync_queue.put('b', delay=0.2)
+        q.sync_queue.put('a', delay=0.1)
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+    thread.join()
+
+    start = time.monotonic()
+    assert await getters[0] == 'a'
+    assert await getters[1] == 'b'
+    elapsed = time.monotonic() - start
+
+    assert 0.15 < elapsed < 0.5
+
+    q.async_queue.put_nowait('c', delay=0.01)
+    assert await q.async_queue.get() == 'c'
+    assert q._loop_states[asyncio.get_running_loop()].ready_timer is None
+
+    q.close()
+    await q.wait_closed()
+
+
+def test_qsize_does_not_move_items():
+    q = DelayQueue()
+
+    for i in range(5):
+        q.sync_queue.put(i, delay=0.01 * (i + 1))
+    q.sync_queue.put('later', delay=10)
+
+    time.sleep(0.1)
+
+    # Counted without the mutex, so the heap must be left as it is
+    assert q.sync_queue.qsize() == 5
+    assert not q.async_queue.empty()
+    assert len(q._delayed) == 6
+    assert not q._ready
+
+    assert q.sync_queue.get_many(10) == [0, 1, 2, 3, 4]
+    assert len(q._delayed) == 1
+
+
+def test_cost_of_delayed_items():
+    q = DelayQueue(maxcost=10, sizer=len)
+
+    q.sync_queue.put(b'abc', delay=0.01)
+    q.sync_queue.put(b'defg')
+    assert q.cost == 7
+
+    assert q.sync_queue.get() == b'defg'
+    assert q.sync_queue.get() == b'abc'
+    assert q.cost == 0
@@ -0,0 +1,217 @@
+import pytest
+import asyncio
+import os
+import stat
+import threading
+import time
+
+from newt import (
+    DurableQueue
+)
+
+
+def test_recovers_unacknowledged_items(tmp_path):
+    directory = str(tmp_path)
+    q = DurableQueue(directory)
+
+    q.sync_queue.put_many(range(10))
+    assert q.sync_queue.get_many(4) == [0, 1, 2, 3]
+
+    for _ in range(3):
+        q.sync_queue.task_done()
+
+    q.close()
+
+    q = DurableQueue(directory)
+
+    assert q.sync_queue.get_many(10) == [3, 4, 5, 6, 7, 8, 9]
+    for _ in range(7):
+        q.sync_queue.task_done()
+    q.sync_queue.join()
+
+    q.close()
+
+    q = DurableQueue(directory)
+    assert q.sync_queue.empty()
+    q.close()
+
+
+def test_truncates_torn_tail(tmp_path):
+    directory = str(tmp_path)
+    q = DurableQueue(directory)
+    q.sync_queue.put('a')
+    q.sync_queue.put('b')
+    q.close()
+
+    segment, = os.listdir(directory)
+    path = os.path.join(directory, segment)
+    os.truncate(path, os.path.getsize(path) - 1)
+
+    q = DurableQueue(directory)
+    assert q.sync_queue.get_many(10) == ['a']
+    q.close()
+
+
+def test_compacts_acknowledged_segments(tmp_path):
+    directory = str(tmp_path)
+    q = DurableQueue(directory, segment_size=64)
+
+    q.sync_queue.put_many(range(50))
+    assert len(os.listdir(directory)) > 5
+
+    for _ in range(50):
+        q.sync_queue.get()
+        q.sync_queue.task_done()
+
+    # Trigger another commit
+    q.sync_queue.put('last')
+
+    # Segments are removed by the committer once it wakes up the putters
+    deadline = time.monotonic() + 5
+    while len(os.listdir(directory)) > 2:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+    q.close()
+
+    q = DurableQueue(directory)
+    assert q.sync_queue.get_many(100) == ['last']
+    q.close()
+
+
+def test_group_commit(tmp_path, monkeypatch):
+    fsyncs = []
+    fsync = os.fsync
+
+    def counting_fsync(fd):
+        fsyncs.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(os, 'fsync', counting_fsync)
+
+    q = DurableQueue(str(tmp_path), max_delay=0.01)
+
+    def produce(start):
+        for i in range(start, start + 20):
+            q.sync_queue.put(i)
+
+    threads = [
+        threading.Thread(target=produce, args=(i * 20,))
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(q.sync_queue.get_many(200)) == list(range(160))
+    assert len(fsyncs) < 160 / 2
+
+    q.close()
+
+
+def test_fsyncs_directory_of_new_segments(tmp_path, monkeypatch):
+    directories = []
+    fsync = os.fsync
+
+    def recording_fsync(fd):
+        if stat.S_ISDIR(os.fstat(fd).st_mode):
+            directories.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(os, 'fsync', recording_fsync)
+
+    q = DurableQueue(str(tmp_path))
+    q.sync_queue.put(1)
+    q.sync_queue.put(2)
+
+    # Only once for the segment which is created
+    assert len(directories) == 1
+
+    q.close()
+
+
+def test_removes_segments_without_the_lock(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    held = []
+    remove = os.remove
+
+    def recording_remove(path):
+        lock = q._log._cond
+        acquired = lock.acquire(False)
+        if acquired:
+            lock.release()
+        held.append(not acquired)
+        remove(path)
+
+    monkeypatch.setattr(os, 'remove', recording_remove)
+
+    q = DurableQueue(directory, segment_size=64)
+    q.sync_queue.put_many(range(50))
+    q.sync_queue.get_many(50)
+    for _ in range(50):
+        q.sync_queue.task_done()
+
+    # Committed with the acknowledgements, which compacts the log
+    q.sync_queue.put('a')
+
+    deadline = time.monotonic() + 5
+    while len(os.listdir(directory)) > 2:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+    assert held and not any(held)
+
+    q.close()
+
+
+@pytest.mark.asyncio
+async def test_async_wait_never_blocks_on_the_log_lock(tmp_path):
+    q = DurableQueue(str(tmp_path))
+    await q.async_queue.put(1)
+
+    log = q._log
+    held = threading.Event()
+
+    def hold():
+        with log._cond:
+            held.set()
+            time.sleep(0.5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+
+    start = time.monotonic()
+    await log.wait_async(log.appended)
+    assert time.monotonic() - start < 0.25
+
+    thread.join()
+
+    q.close()
+    await q.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_async_put_and_task_done(tmp_path):
+    directory = str(tmp_path)
+    q = DurableQueue(directory)
+
+    await asyncio.gather(*[q.async_queue.put(i) for i in range(10)])
+
+    async def consume():
+        item = await q.async_queue.get()
+        await asyncio.sleep(0)
+        q.async_queue.task_done()
+        return item
+
+    # Each task acknowledges the item it got
+    got = await asyncio.gather(*[consume() for _ in range(4)])
+    assert sorted(got) == [0, 1, 2, 3]
+
+    q.close()
+    await q.wait_closed()
+
+    q = DurableQueue(directory)
+    assert q.sync_queue.get_many(10) == list(range(4, 10))
+    q.close()
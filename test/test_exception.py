@@ -1,6 +1,4 @@
 import pytest
-import asyncio
-import sys
 
 from newt import (
     Queue
@@ -28,24 +26,6 @@ def test_modify_closed_queue():
             consumer
         )
 
-# Only test this in Python < 3.10
-@pytest.mark.skipif(
-    sys.version_info >= (3, 10),
-    reason='Python >= 3.10 does not throw an error'
-)
-def test_init_fail():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(None)
-
-    with pytest.raises(
-        RuntimeError,
-        match='not an issue of newt'
-    ):
-        Queue()
-
-    asyncio.set_event_loop(loop)
-
-
 @pytest.mark.asyncio
 async def test_await_for_unclosed_queue():
     q = Queue()
@@ -0,0 +1,230 @@
+import pytest
+import asyncio
+import threading
+import time
+from queue import Empty
+
+from newt import (
+    Queue,
+    LifoQueue,
+    PriorityQueue,
+    RingQueue
+)
+
+
+def wait_for(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_sync_handoff_is_not_stolen():
+    q = Queue()
+    got = []
+
+    thread = threading.Thread(target=lambda: got.append(q.sync_queue.get()))
+    thread.start()
+    wait_for(lambda: q._sync_getters)
+
+    q.sync_queue.put(1)
+
+    # The item never enters the queue, so a barging getter misses it
+    assert q.sync_queue.qsize() == 0
+    with pytest.raises(Empty):
+        q.sync_queue.get_nowait()
+
+    thread.join()
+    assert got == [1]
+
+    assert q._unfinished_tasks == 1
+    q.sync_queue.task_done()
+    q.sync_queue.join()
+
+
+def test_no_handoff_for_priority_queue():
+    q = PriorityQueue()
+    got = []
+
+    thread = threading.Thread(target=lambda: got.append(q.sync_queue.get()))
+    thread.start()
+    wait_for(lambda: q._sync_getters)
+
+    q.sync_queue.put(1)
+    assert q.sync_queue.qsize() == 1
+
+    thread.join()
+    assert got == [1]
+
+
+@pytest.mark.asyncio
+async def test_async_handoff():
+    q = Queue()
+
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    q.async_queue.put_nowait(None)
+
+    assert q.async_queue.qsize() == 0
+    with pytest.raises(asyncio.QueueEmpty):
+        q.async_queue.get_nowait()
+
+    # `None` is a valid item to hand over
+    assert await getter is None
+
+    getter = asyncio.ensure_future(q.async_queue.get_many(3))
+    await asyncio.sleep(0)
+
+    await q.async_queue.put_many([1, 2, 3])
+    assert await getter == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_handed_item_of_cancelled_getter_is_requeued():
+    q = Queue()
+
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    q.async_queue.put_nowait(1)
+    getter.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await getter
+
+    assert q.async_queue.get_nowait() == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('cls, maxsize, expected', [
+    (Queue, 0, ['A', 'B']),
+    (RingQueue, 2, ['A', 'B']),
+    # The item is older than the items put after it
+    (LifoQueue, 0, ['B', 'A'])
+])
+async def test_requeued_item_keeps_its_order(cls, maxsize, expected):
+    q = cls(maxsize)
+
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    q.async_queue.put_nowait('A')
+    getter.cancel()
+    q.async_queue.put_nowait('B')
+
+    with pytest.raises(asyncio.CancelledError):
+        await getter
+
+    assert q.async_queue.qsize() == 2
+    assert [q.async_queue.get_nowait() for _ in range(2)] == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('cls, maxsize, expected', [
+    (Queue, 0, ['A', 'B']),
+    (RingQueue, 2, ['A', 'B']),
+    (LifoQueue, 0, ['B', 'A'])
+])
+async def test_items_of_two_cancelled_getters_keep_their_order(
+    cls, maxsize, expected
+):
+    q = cls(maxsize)
+
+    getters = [asyncio.ensure_future(q.async_queue.get()) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    q.async_queue.put_nowait('A')
+    q.async_queue.put_nowait('B')
+
+    for getter in getters:
+        getter.cancel()
+
+    for getter in getters:
+        with pytest.raises(asyncio.CancelledError):
+            await getter
+
+    assert q.async_queue.qsize() == 2
+    assert [q.async_queue.get_nowait() for _ in range(2)] == expected
+
+
+@pytest.mark.asyncio
+async def test_handoff_never_exceeds_maxsize():
+    q = RingQueue(1)
+
+    getters = [asyncio.ensure_future(q.async_queue.get()) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    q.async_queue.put_nowait('A')
+
+    # Not handed to the other getter, since 'A' takes up the only slot
+    with pytest.raises(asyncio.QueueFull):
+        q.async_queue.put_nowait('B')
+
+    for getter in getters:
+        getter.cancel()
+
+    for getter in getters:
+        with pytest.raises(asyncio.CancelledError):
+            await getter
+
+    assert q.async_queue.qsize() == 1
+    assert q.async_queue.get_nowait() == 'A'
+    with pytest.raises(asyncio.QueueEmpty):
+        q.async_queue.get_nowait()
+
+
+@pytest.mark.asyncio
+async def test_handed_item_takes_up_a_slot():
+    q = RingQueue(1)
+
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    q.async_queue.put_nowait('A')
+    getter.cancel()
+
+    # 'A' could be put back, so there is no room for 'B' yet
+    with pytest.raises(asyncio.QueueFull):
+        q.async_queue.put_nowait('B')
+
+    with pytest.raises(asyncio.CancelledError):
+        await getter
+
+    assert q.async_queue.qsize() == 1
+    assert q.async_queue.get_nowait() == 'A'
+
+    # The slot is released once the getter receives the item
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    q.async_queue.put_nowait('B')
+    with pytest.raises(asyncio.QueueFull):
+        q.async_queue.put_nowait('C')
+
+    assert await getter == 'B'
+    q.async_queue.put_nowait('C')
+    assert q.async_queue.get_nowait() == 'C'
+
+
+@pytest.mark.asyncio
+async def test_handed_item_from_thread_is_requeued():
+    q = Queue()
+
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    # The wakeup is pending in the loop when the getter is cancelled
+    thread = threading.Thread(target=q.sync_queue.put, args=(1,))
+    thread.start()
+    thread.join()
+    getter.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await getter
+
+    await asyncio.sleep(0)
+    assert q.async_queue.get_nowait() == 1
+
+    q.close()
+    await q.wait_closed()
@@ -0,0 +1,64 @@
+import pytest
+import asyncio
+import threading
+
+from newt import (
+    Queue
+)
+
+
+def test_sync_iteration_stops_when_closed_and_drained():
+    q = Queue()
+    got = []
+
+    def consume():
+        for item in q.sync_queue:
+            got.append(item)
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+
+    q.sync_queue.put_many(range(100))
+    q.close()
+    thread.join()
+
+    assert got == list(range(100))
+
+
+def test_sync_chunked():
+    q = Queue()
+    q.sync_queue.put_many(range(5))
+    q.close()
+
+    assert list(q.sync_queue.chunked(2)) == [[0, 1], [2, 3], [4]]
+
+
+@pytest.mark.asyncio
+async def test_async_iteration_stops_when_closed_and_drained():
+    q = Queue(10)
+
+    def produce():
+        for i in range(100):
+            q.sync_queue.put(i)
+        q.close()
+
+    async def consume():
+        return [item async for item in q.async_queue]
+
+    consumer = asyncio.ensure_future(consume())
+    await asyncio.sleep(0)
+
+    await asyncio.get_running_loop().run_in_executor(None, produce)
+
+    assert await consumer == list(range(100))
+    await q.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_async_chunked():
+    q = Queue()
+    await q.async_queue.put_many(range(5))
+    q.close()
+
+    chunks = [chunk async for chunk in q.async_queue.chunked(3)]
+    assert chunks == [[0, 1, 2], [3, 4]]
@@ -0,0 +1,116 @@
+import pytest
+import asyncio
+import threading
+import time
+from queue import Empty
+
+from newt import (
+    Queue,
+    render_prometheus
+)
+
+
+def test_counters():
+    q = Queue(2, overflow='drop_newest')
+    assert q.metrics_snapshot() is None
+
+    q.enable_metrics()
+
+    q.sync_queue.put_many([1, 2, 3])
+    assert q.sync_queue.get_many(2) == [1, 2]
+
+    with pytest.raises(Empty):
+        q.sync_queue.get(timeout=0.01)
+
+    snapshot = q.metrics_snapshot()
+    assert snapshot['puts'] == 2
+    assert snapshot['gets'] == 2
+    assert snapshot['dropped'] == 1
+    assert snapshot['depth'] == 0
+    assert snapshot['max_depth'] == 2
+    assert snapshot['unfinished_tasks'] == 2
+    assert snapshot['timeouts'] == 1
+    assert snapshot['get_wait']['count'] == 1
+    assert snapshot['get_wait']['max'] >= 0.01
+
+    q.disable_metrics()
+    assert q.metrics_snapshot() is None
+
+
+def test_handoff_is_counted():
+    q = Queue()
+    q.enable_metrics()
+
+    thread = threading.Thread(target=q.sync_queue.get)
+    thread.start()
+    while not q._sync_getters:
+        time.sleep(0.001)
+
+    q.sync_queue.put(1)
+    thread.join()
+
+    snapshot = q.metrics_snapshot()
+    assert snapshot['puts'] == 1
+    assert snapshot['gets'] == 1
+    assert snapshot['max_depth'] == 0
+    assert snapshot['get_wait']['count'] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_waits_and_join_lag():
+    q = Queue(1)
+    q.enable_metrics()
+
+    await q.async_queue.put(1)
+    with pytest.raises(asyncio.TimeoutError):
+        await q.async_queue.put(2, timeout=0.01)
+
+    joiner = asyncio.ensure_future(q.async_queue.join())
+    await asyncio.sleep(0)
+
+    assert await q.async_queue.get() == 1
+    q.async_queue.task_done()
+    await joiner
+
+    snapshot = q.metrics_snapshot()
+    assert snapshot['timeouts'] == 1
+    assert snapshot['put_wait']['count'] == 1
+    assert snapshot['join_lag']['count'] == 1
+
+    # `join()` which does not block records no lag
+    await q.async_queue.join()
+    assert q.metrics_snapshot()['join_lag']['count'] == 1
+
+
+def test_render_prometheus():
+    q = Queue()
+    q.enable_metrics()
+    q.sync_queue.put(1)
+    q.sync_queue.get()
+
+    with pytest.raises(Empty):
+        q.sync_queue.get(timeout=0.001)
+
+    text = render_prometheus({
+        'jobs "a"': q,
+        # Skipped, since its metrics are not enabled
+        'other': Queue()
+    })
+
+    assert '# TYPE newt_queue_puts_total counter' in text
+    assert 'newt_queue_puts_total{queue="jobs \\"a\\""} 1' in text
+    assert 'newt_queue_depth{queue="jobs \\"a\\""} 0' in text
+    assert (
+        'newt_queue_get_wait_seconds_bucket{queue="jobs \\"a\\"",le="+Inf"} 1'
+        in text
+    )
+    assert 'newt_queue_get_wait_seconds_count{queue="jobs \\"a\\""} 1' in text
+
+    # Including the empty buckets, which are the same for every queue
+    assert text.count('newt_queue_put_wait_seconds_bucket{') == 33
+    assert (
+        'newt_queue_put_wait_seconds_bucket{queue="jobs \\"a\\"",le="1e-06"} 0'
+        in text
+    )
+    assert 'queue="other"' not in text
+    assert text.endswith('\n')
@@ -0,0 +1,222 @@
+import pytest
+import asyncio
+import threading
+
+from newt import (
+    Queue,
+    PriorityQueue
+)
+
+
+def hold_mutex(q, seconds):
+    acquired = threading.Event()
+
+    def hold():
+        with q._sync_mutex:
+            acquired.set()
+            threading.Event().wait(seconds)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    acquired.wait()
+    return thread
+
+
+@pytest.mark.asyncio
+async def test_coroutines_do_not_block_loop():
+    q = Queue()
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    ticker = asyncio.ensure_future(tick())
+    await asyncio.sleep(0)
+
+    thread = hold_mutex(q, 0.05)
+    start = ticks
+
+    await q.async_queue.put(1)
+    assert await q.async_queue.get() == 1
+
+    # The loop keeps running while the mutex is held by the thread
+    assert ticks - start > 1
+    assert q.loop_stalls == 0
+
+    ticker.cancel()
+    thread.join()
+
+
+@pytest.mark.asyncio
+async def test_nowait_stall_is_counted():
+    q = Queue()
+
+    thread = hold_mutex(q, 0.02)
+    q.async_queue.put_nowait(1)
+    thread.join()
+
+    assert q.loop_stalls == 1
+    assert q.loop_stall_time >= 0.01
+
+    assert q.async_queue.get_nowait() == 1
+    assert q.loop_stalls == 1
+
+
+@pytest.mark.asyncio
+async def test_cancel_while_waiting_for_mutex():
+    q = Queue()
+
+    thread = hold_mutex(q, 0.02)
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    getter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await getter
+
+    thread.join()
+
+    # The mutex is not left acquired
+    assert q._sync_mutex.acquire(False)
+    q._sync_mutex.release()
+
+
+@pytest.mark.asyncio
+async def test_cancel_while_relocking_after_wakeup():
+    q = PriorityQueue()
+
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    acquired = threading.Event()
+
+    def put_and_hold():
+        with q._sync_mutex:
+            q._put_internal(1)
+            q._notify_async_not_empty(threadsafe=True)
+            acquired.set()
+            threading.Event().wait(0.05)
+
+    thread = threading.Thread(target=put_and_hold)
+    thread.start()
+    acquired.wait()
+
+    # The getter is woken up, and waits for the mutex to take the item
+    await asyncio.sleep(0.01)
+    getter.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await getter
+
+    thread.join()
+
+    assert q._sync_mutex.acquire(False)
+    q._sync_mutex.release()
+    assert q.async_queue.get_nowait() == 1
+
+
+@pytest.mark.asyncio
+async def test_coroutines_are_not_starved_by_threads():
+    q = Queue()
+    stopping = threading.Event()
+
+    def hammer():
+        while not stopping.is_set():
+            q.sync_queue.put(None)
+            q.sync_queue.get()
+
+    threads = [threading.Thread(target=hammer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    async def produce():
+        for i in range(100):
+            await q.async_queue.put(i)
+
+    try:
+        await asyncio.wait_for(produce(), 5)
+    finally:
+        stopping.set()
+        for thread in threads:
+            thread.join()
+
+
+@pytest.mark.asyncio
+async def test_timeout_covers_the_mutex():
+    q = Queue()
+
+    thread = hold_mutex(q, 0.5)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await q.async_queue.put(1, timeout=0.05)
+
+    assert loop.time() - start < 0.4
+    thread.join()
+
+    assert q._sync_mutex.acquire(False)
+    q._sync_mutex.release()
+    assert q.async_queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_cancel_while_waiting_for_mutex_in_executor():
+    q = Queue()
+
+    thread = hold_mutex(q, 0.1)
+    getter = asyncio.ensure_future(q.async_queue.get())
+    # Longer than the retries on the loop
+    await asyncio.sleep(0.02)
+
+    getter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await getter
+
+    thread.join()
+
+    # The executor thread acquires the mutex for nobody, and releases it
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + 5
+    while not q._sync_mutex.acquire(False):
+        assert loop.time() < deadline
+        await asyncio.sleep(0.001)
+    q._sync_mutex.release()
+
+
+@pytest.mark.asyncio
+async def test_wakeups_wait_for_mutex_without_spinning():
+    q = Queue()
+    calls = 0
+    flush_wakeups = q._flush_wakeups
+
+    def counting_flush_wakeups(state):
+        nonlocal calls
+        calls += 1
+        flush_wakeups(state)
+
+    q._flush_wakeups = counting_flush_wakeups
+
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    acquired = threading.Event()
+
+    def put_and_hold():
+        with q._sync_mutex:
+            q._put_internal(1)
+            q._notify_async_not_empty(threadsafe=True)
+            acquired.set()
+            threading.Event().wait(0.05)
+
+    thread = threading.Thread(target=put_and_hold)
+    thread.start()
+    acquired.wait()
+
+    assert await asyncio.wait_for(getter, 5) == 1
+    thread.join()
+
+    assert calls == 1
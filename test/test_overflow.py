@@ -0,0 +1,117 @@
+import pytest
+import asyncio
+
+from newt import (
+    BucketPriorityQueue,
+    DelayQueue,
+    IndexedPriorityQueue,
+    LifoQueue,
+    PriorityQueue,
+    Queue,
+    RingQueue
+)
+
+
+def test_unsupported_policy():
+    with pytest.raises(ValueError, match='evict_lowest_priority'):
+        Queue(overflow='evict_lowest_priority')
+
+    with pytest.raises(ValueError, match='drop_oldest'):
+        DelayQueue(overflow='drop_oldest')
+
+    assert Queue().overflow == 'block'
+
+
+@pytest.mark.parametrize('cls', [Queue, RingQueue])
+def test_drop_oldest(cls):
+    q = cls(3, overflow='drop_oldest')
+
+    q.sync_queue.put_many(range(5))
+    q.sync_queue.put(5)
+    q.sync_queue.put_nowait(6)
+
+    assert q.dropped == 4
+    assert q.sync_queue.get_many(10) == [4, 5, 6]
+
+    # Dropped items don't need `task_done()`
+    for _ in range(3):
+        q.sync_queue.task_done()
+    q.sync_queue.join()
+
+
+def test_lifo_drop_oldest():
+    q = LifoQueue(2, overflow='drop_oldest')
+    q.sync_queue.put_many([1, 2, 3])
+
+    assert q.sync_queue.get_many(10) == [3, 2]
+
+
+def test_drop_newest():
+    q = Queue(2, overflow='drop_newest')
+
+    q.sync_queue.put_many(range(4))
+    assert q.sync_queue.put(4) is None
+
+    assert q.dropped == 3
+    assert q.sync_queue.get_many(10) == [0, 1]
+
+
+def test_drop_newest_by_cost():
+    q = Queue(maxcost=5, sizer=len, overflow='drop_newest')
+    q.sync_queue.put_many(['abc', 'defg', 'h'])
+
+    assert q.sync_queue.get_many(10) == ['abc', 'h']
+    assert q.dropped == 1
+
+
+@pytest.mark.parametrize('cls', [
+    PriorityQueue,
+    BucketPriorityQueue,
+    IndexedPriorityQueue
+])
+def test_evict_lowest_priority(cls):
+    key = (lambda entry: entry[0])
+    q = cls(3, key=key, overflow='evict_lowest_priority')
+
+    q.sync_queue.put_many([(3, 'a'), (1, 'b'), (3, 'c')])
+
+    # Evicts the newest item of the lowest priority
+    q.sync_queue.put((2, 'd'))
+    # Drops the new item of no higher priority than any queued one
+    q.sync_queue.put((3, 'e'))
+    q.sync_queue.put((0, 'f'))
+
+    assert q.dropped == 3
+    assert q.sync_queue.get_many(10) == [(0, 'f'), (1, 'b'), (2, 'd')]
+
+
+def test_evict_lowest_priority_without_key():
+    q = PriorityQueue(2, overflow='evict_lowest_priority')
+    q.sync_queue.put_many([5, 1, 3, 0, 9])
+
+    assert q.sync_queue.get_many(10) == [0, 1]
+    assert q.dropped == 3
+
+
+def test_evict_keeps_the_heap():
+    q = PriorityQueue(50, overflow='evict_lowest_priority')
+    # Deterministic, but not sorted
+    items = [(i * 37) % 101 for i in range(300)]
+    q.sync_queue.put_many(items)
+
+    assert q.sync_queue.get_many(100) == sorted(items)[:50]
+
+
+@pytest.mark.asyncio
+async def test_async_never_blocks():
+    q = Queue(2, overflow='drop_oldest')
+
+    await q.async_queue.put_many(range(5))
+    await asyncio.wait_for(q.async_queue.put(5), 1)
+    q.async_queue.put_nowait(6)
+
+    assert await q.async_queue.get_many(10) == [5, 6]
+    assert q.dropped == 5
+
+    q.close()
+    await q.wait_closed()
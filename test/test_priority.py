@@ -0,0 +1,157 @@
+import pytest
+import asyncio
+import random
+import threading
+
+from newt import (
+    BucketPriorityQueue,
+    IndexedPriorityQueue,
+    PriorityQueue
+)
+
+
+class Payload:
+    # Not comparable
+    def __init__(self, priority: int, value: int) -> None:
+        self.priority = priority
+        self.value = value
+
+
+def test_priority_queue_with_key_is_stable():
+    q = PriorityQueue(key=lambda payload: payload.priority)
+
+    q.sync_queue.put_many([
+        Payload(priority % 3, value)
+        for value, priority in enumerate([2, 0, 1, 0, 2, 1, 0])
+    ])
+
+    got = [
+        (payload.priority, payload.value)
+        for payload in q.sync_queue.get_many(10)
+    ]
+
+    assert got == [
+        (0, 1), (0, 3), (0, 6),
+        (1, 2), (1, 5),
+        (2, 0), (2, 4)
+    ]
+
+
+def test_indexed_priority_queue():
+    q = IndexedPriorityQueue(key=lambda x: x[0])
+    sync_queue = q.sync_queue
+
+    a = sync_queue.put((2, 'a'))
+    b = sync_queue.put((1, 'b'))
+    c = sync_queue.put((1, 'c'))
+
+    assert b.priority == 1
+    assert q.peek() == (1, 'b')
+
+    assert q.update_priority(a, 0)
+    assert q.peek() == (2, 'a')
+
+    assert q.remove(b)
+    assert not b.queued
+    assert not q.remove(b)
+    assert not q.update_priority(b, 3)
+
+    assert sync_queue.get() == (2, 'a')
+    assert sync_queue.get() == (1, 'c')
+    assert not c.queued
+
+    with pytest.raises(IndexError):
+        q.peek()
+
+
+def test_indexed_priority_queue_fifo_for_equal_priorities():
+    q = IndexedPriorityQueue()
+
+    for i in range(10):
+        q.sync_queue.put(0 if i % 2 else 1)
+
+    handles = [q.sync_queue.put(0) for _ in range(3)]
+    q.update_priority(handles[0], 0)
+
+    assert q.sync_queue.get_many(20) == [0] * 8 + [1] * 5
+
+
+def test_indexed_priority_queue_random_operations():
+    q = IndexedPriorityQueue()
+    handles = {}
+    rand = random.Random(0)
+
+    for i in range(500):
+        handles[i] = q.sync_queue.put(rand.random())
+
+    for i in rand.sample(range(500), 150):
+        assert q.remove(handles.pop(i))
+
+    for i in rand.sample(list(handles), 100):
+        q.update_priority(handles[i], rand.random())
+
+    expected = [
+        handle.item for handle in sorted(
+            handles.values(),
+            key=lambda handle: handle.priority
+        )
+    ]
+    got = [q.sync_queue.get() for _ in range(len(handles))]
+
+    assert got == expected
+
+
+def test_remove_marks_item_done_and_frees_slot():
+    q = IndexedPriorityQueue(1)
+    handle = q.sync_queue.put(1)
+
+    thread = threading.Thread(target=q.sync_queue.put, args=(2,))
+    thread.start()
+
+    assert q.remove(handle)
+    thread.join()
+
+    assert q.sync_queue.get() == 2
+    q.sync_queue.task_done()
+
+    # Only the item which was got needs `task_done()`
+    q.sync_queue.join()
+
+
+def test_bucket_priority_queue():
+    q = BucketPriorityQueue(levels=4)
+    entries = [(3, 'a'), (0, 'b'), (2, 'c'), (0, 'd'), (3, 'e'), (1, 'f')]
+
+    q.sync_queue.put_many(entries)
+
+    assert q.sync_queue.get_many(10) == sorted(
+        entries, key=lambda entry: entry[0])
+
+    with pytest.raises(ValueError, match='range'):
+        q.sync_queue.put((4, 'g'))
+
+    with pytest.raises(ValueError, match='range'):
+        q.sync_queue.put((-1, 'g'))
+
+    assert q.sync_queue.empty()
+    assert q._bitmap == 0
+
+
+@pytest.mark.asyncio
+async def test_bucket_priority_queue_with_key():
+    q = BucketPriorityQueue(2, levels=2, key=lambda n: n % 2)
+
+    thread = threading.Thread(
+        target=q.sync_queue.put_many, args=(range(6),))
+    thread.start()
+
+    got = []
+    while len(got) < 6:
+        got += await q.async_queue.get_many(6)
+
+    await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+    assert sorted(got) == list(range(6))
+
+    q.close()
+    await q.wait_closed()
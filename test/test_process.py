@@ -0,0 +1,140 @@
+import pytest
+import asyncio
+import multiprocessing
+from asyncio import QueueEmpty
+from queue import Empty, Full
+
+from newt import (
+    ProcessQueue
+)
+
+
+RANGE = 1000
+
+
+def produce(q, count):
+    for i in range(count):
+        q.sync_queue.put(i)
+    q.release()
+
+
+def consume(q, count, results):
+    results.put(sum(q.sync_queue.get() for _ in range(count)))
+    q.release()
+
+
+def test_sync_wraps_around():
+    q = ProcessQueue(64)
+
+    with pytest.raises(ValueError):
+        ProcessQueue(4)
+
+    with pytest.raises(ValueError, match='capacity'):
+        q.sync_queue.put(b'x' * 64)
+
+    for i in range(100):
+        q.sync_queue.put_nowait((i, 'x' * (i % 7)))
+        assert q.sync_queue.qsize() == 1
+        assert q.sync_queue.get_nowait() == (i, 'x' * (i % 7))
+
+    with pytest.raises(Empty):
+        q.sync_queue.get(timeout=0.01)
+
+    while True:
+        try:
+            q.sync_queue.put_nowait(None)
+        except Full:
+            break
+
+    with pytest.raises(Full):
+        q.sync_queue.put(None, timeout=0.01)
+
+    assert q.sync_queue.get() is None
+
+    q.close()
+    assert q.closed
+
+    with pytest.raises(RuntimeError):
+        q.sync_queue.get()
+
+    q.release()
+
+
+@pytest.mark.asyncio
+async def test_async_get_from_another_process():
+    ctx = multiprocessing.get_context('spawn')
+    q = ProcessQueue(256, ctx=ctx)
+
+    with pytest.raises(QueueEmpty):
+        q.async_queue.get_nowait()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await q.async_queue.get(timeout=0.01)
+
+    process = ctx.Process(target=produce, args=(q, RANGE))
+    process.start()
+
+    got = [await q.async_queue.get() for _ in range(RANGE)]
+
+    await asyncio.get_running_loop().run_in_executor(None, process.join)
+    assert got == list(range(RANGE))
+
+    q.close()
+    await q.wait_closed()
+    q.release()
+
+
+@pytest.mark.asyncio
+async def test_async_put_to_other_processes():
+    ctx = multiprocessing.get_context('spawn')
+    q = ProcessQueue(256, ctx=ctx)
+    results = ctx.Queue()
+
+    processes = [
+        ctx.Process(target=consume, args=(q, RANGE // 2, results))
+        for _ in range(2)
+    ]
+    for process in processes:
+        process.start()
+
+    for i in range(RANGE):
+        await q.async_queue.put(i)
+
+    loop = asyncio.get_running_loop()
+    for process in processes:
+        await loop.run_in_executor(None, process.join)
+
+    assert results.get() + results.get() == sum(range(RANGE))
+    assert q.async_queue.empty()
+
+    q.close()
+    await q.wait_closed()
+    q.release()
+
+
+@pytest.mark.asyncio
+async def test_async_does_not_block_loop_on_lock():
+    q = ProcessQueue(256)
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    ticker = asyncio.ensure_future(tick())
+    await asyncio.sleep(0)
+
+    # As if another process held the lock
+    q._lock.acquire()
+    asyncio.get_running_loop().call_later(0.05, q._lock.release)
+
+    await q.async_queue.put(1)
+    assert await q.async_queue.get() == 1
+    assert ticks > 1
+
+    ticker.cancel()
+    q.close()
+    await q.wait_closed()
+    q.release()
@@ -0,0 +1,139 @@
+import pytest
+import asyncio
+import threading
+import time
+
+from newt import (
+    Queue,
+    PriorityQueue
+)
+from newt.profile import Histogram
+
+
+def hold_mutex(q, seconds):
+    acquired = threading.Event()
+
+    def hold():
+        with q._sync_mutex:
+            acquired.set()
+            time.sleep(seconds)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    acquired.wait()
+    return thread
+
+
+def test_histogram():
+    histogram = Histogram()
+    assert histogram.percentile(50) == 0.
+
+    for seconds in (0.0000005, 0.000003, 0.000003, 0.1):
+        histogram.record(seconds)
+
+    assert histogram.count == 4
+    assert histogram.max == 0.1
+    assert histogram.buckets() == [
+        [0.000001, 1],
+        [0.000004, 2],
+        [0.131072, 1]
+    ]
+    assert histogram.percentile(50) == 0.000004
+    assert histogram.percentile(99) == 0.1
+
+
+def test_enable_disable():
+    q = Queue()
+    assert q.profile_snapshot() is None
+
+    q.enable_profiling()
+    snapshot = q.profile_snapshot()
+    assert snapshot['sync_lock_wait']['count'] == 0
+    assert snapshot['wakeups_sent'] == 0
+
+    q.sync_queue.put(1)
+    assert q.sync_queue.get() == 1
+
+    q.disable_profiling()
+    assert q.profile_snapshot() is None
+    assert isinstance(q._sync_mutex, type(threading.Lock()))
+
+
+def test_sync_lock_wait():
+    q = Queue()
+    q.enable_profiling()
+
+    thread = hold_mutex(q, 0.02)
+    q.sync_queue.put(1)
+    thread.join()
+
+    histogram = q.profile_snapshot()['sync_lock_wait']
+    assert histogram['count'] == 1
+    assert histogram['max'] >= 0.01
+
+
+@pytest.mark.asyncio
+async def test_async_lock_wait_and_loop_stall():
+    q = Queue()
+    q.enable_profiling()
+
+    thread = hold_mutex(q, 0.02)
+    await q.async_queue.put(1)
+    thread.join()
+
+    thread = hold_mutex(q, 0.02)
+    q.async_queue.put_nowait(2)
+    thread.join()
+
+    snapshot = q.profile_snapshot()
+    assert snapshot['async_lock_wait']['count'] == 1
+    assert snapshot['loop_stall']['count'] == 1
+    assert snapshot['sync_lock_wait']['count'] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('cls', [Queue, PriorityQueue])
+async def test_cross_wakeups(cls):
+    q = cls()
+    q.enable_profiling()
+    loop = asyncio.get_running_loop()
+
+    # A sync getter woken up by a coroutine
+    getter = loop.run_in_executor(None, q.sync_queue.get)
+    while not q._sync_getters:
+        await asyncio.sleep(0.001)
+
+    await q.async_queue.put(1)
+    assert await getter == 1
+
+    # An async getter woken up by a thread
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    await loop.run_in_executor(None, q.sync_queue.put, 2)
+    assert await getter == 2
+
+    snapshot = q.profile_snapshot()
+    assert snapshot['wakeups_sent'] == 2
+    assert snapshot['wakeups_needed'] == 2
+
+
+@pytest.mark.asyncio
+async def test_wakeup_not_needed():
+    q = PriorityQueue()
+    q.enable_profiling()
+
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    # Woken up by a thread, but another coroutine takes the item first
+    q.sync_queue.put(1)
+    assert q.async_queue.get_nowait() == 1
+    await asyncio.sleep(0.01)
+
+    assert not getter.done()
+    snapshot = q.profile_snapshot()
+    assert snapshot['wakeups_sent'] == 1
+    assert snapshot['wakeups_needed'] == 0
+
+    getter.cancel()
@@ -8,7 +8,8 @@ from typing import (
 from newt import (
     LifoQueue,
     PriorityQueue,
-    Queue
+    Queue,
+    RingQueue
 )
 
 from .runner import create_runner
@@ -91,6 +92,35 @@ def test_queue(
     run(queue_ctor, max_size, options)
 
 
+@pytest.mark.parametrize(
+    'queue_ctor,max_size,options',
+    itertools.product(
+        [
+            RingQueue
+        ],
+        [
+            1,
+            3
+        ],
+        map_two_options([
+            (True, False),
+            (False, True)
+        ])
+    )
+)
+def test_ring_queue(
+    queue_ctor,
+    max_size: int,
+    options: Tuple[dict, dict]
+):
+    run(queue_ctor, max_size, options)
+
+
+def test_ring_queue_requires_maxsize():
+    with pytest.raises(ValueError, match='maxsize'):
+        RingQueue()
+
+
 priority_queue_sequence = [
     (2, 1),
     (1, 0),
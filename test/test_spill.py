@@ -0,0 +1,101 @@
+import pytest
+import asyncio
+import os
+import threading
+import time
+
+from newt import (
+    SpillQueue
+)
+
+
+def _wait_for(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_spills_in_fifo_order(tmp_path):
+    q = SpillQueue(memory_items=4, directory=str(tmp_path), segment_size=64)
+
+    q.sync_queue.put_many(range(50))
+
+    # Only the items in memory could be got right away
+    assert q.sync_queue.qsize() == 4
+    assert q.spilled == 46
+    _wait_for(lambda: len(os.listdir(tmp_path)) > 1)
+
+    assert q.sync_queue.get_many(10) == [0, 1, 2, 3]
+    assert [q.sync_queue.get(timeout=5) for _ in range(6)] == list(range(4, 10))
+
+    # Later items are spilled as well while there are spilled items
+    q.sync_queue.put(50)
+    assert 50 not in q._memory
+
+    got = [q.sync_queue.get(timeout=5) for _ in range(41)]
+    assert got == list(range(10, 51))
+    assert q.spilled == 0
+    _wait_for(lambda: os.listdir(tmp_path) == [])
+
+    # Items go to memory again once nothing is spilled
+    q.sync_queue.put(51)
+    assert q.spilled == 0
+    assert q.sync_queue.get_nowait() == 51
+
+
+def test_memory_bytes():
+    q = SpillQueue(memory_bytes=10, memory_sizer=len)
+
+    with pytest.raises(ValueError):
+        SpillQueue(memory_items=0)
+
+    q.sync_queue.put_many([b'abcd', b'efgh', b'ijkl', b'm'])
+
+    # The fourth item would fit, but the third one is already spilled
+    assert list(q._memory) == [b'abcd', b'efgh']
+    assert q.spilled == 2
+
+    got = [q.sync_queue.get(timeout=5) for _ in range(4)]
+    assert got == [b'abcd', b'efgh', b'ijkl', b'm']
+    assert q._size == 0
+
+
+def test_unpicklable_items_are_kept_in_place():
+    q = SpillQueue(memory_items=1)
+    items = [0, lambda: 1, 2, threading.Lock()]
+
+    q.sync_queue.put_many(items)
+
+    assert [q.sync_queue.get(timeout=5) for _ in items] == items
+
+
+def test_cost_and_overflow():
+    q = SpillQueue(
+        memory_items=1, sizer=len, maxcost=10, overflow='drop_newest')
+
+    q.sync_queue.put_many([b'abcd', b'efgh', b'ijkl'])
+
+    assert q.dropped == 1
+    assert q.cost == 8
+    assert q.spilled == 1
+
+
+@pytest.mark.asyncio
+async def test_async_consumer_catches_up():
+    q = SpillQueue(100, memory_items=10, segment_size=256)
+
+    thread = threading.Thread(target=q.sync_queue.put_many, args=(range(1000),))
+    thread.start()
+
+    got = []
+    while len(got) < 1000:
+        got += await q.async_queue.get_many(7)
+
+    await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+    assert got == list(range(1000))
+    assert q.spilled == 0
+
+    q.close()
+    await q.wait_closed()
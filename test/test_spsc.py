@@ -0,0 +1,93 @@
+import pytest
+import asyncio
+import threading
+from asyncio import QueueEmpty, QueueFull
+from queue import Empty, Full
+
+from newt import (
+    SPSCQueue
+)
+
+
+RANGE = 1000
+
+
+def test_sync_nowait():
+    q = SPSCQueue(2)
+
+    with pytest.raises(ValueError):
+        SPSCQueue(0)
+
+    q.sync_queue.put(1)
+    q.sync_queue.put_nowait(None)
+    assert q.sync_queue.full()
+
+    with pytest.raises(Full):
+        q.sync_queue.put(3, timeout=0.01)
+
+    assert q.sync_queue.get() == 1
+    assert q.sync_queue.get_nowait() is None
+    assert q.sync_queue.empty()
+
+    with pytest.raises(Empty):
+        q.sync_queue.get(timeout=0.01)
+
+
+@pytest.mark.asyncio
+async def test_async_nowait():
+    q = SPSCQueue(1)
+
+    q.async_queue.put_nowait(1)
+
+    with pytest.raises(QueueFull):
+        q.async_queue.put_nowait(2)
+
+    assert q.async_queue.get_nowait() == 1
+
+    with pytest.raises(QueueEmpty):
+        q.async_queue.get_nowait()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('maxsize', [1, 16])
+async def test_thread_to_coroutine(maxsize):
+    q = SPSCQueue(maxsize)
+
+    def produce():
+        for i in range(RANGE):
+            q.sync_queue.put(i)
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+
+    got = [await q.async_queue.get() for _ in range(RANGE)]
+    thread.join()
+
+    assert got == list(range(RANGE))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('maxsize', [1, 16])
+async def test_coroutine_to_thread(maxsize):
+    q = SPSCQueue(maxsize)
+    got = []
+
+    def consume():
+        for _ in range(RANGE):
+            got.append(q.sync_queue.get())
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+
+    for i in range(RANGE):
+        await q.async_queue.put(i)
+
+    await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+    assert got == list(range(RANGE))
+
+    q.close()
+    await q.wait_closed()
+
+    with pytest.raises(RuntimeError, match='closed queue'):
+        await q.async_queue.put(1)
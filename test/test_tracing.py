@@ -0,0 +1,132 @@
+import pytest
+import asyncio
+import threading
+import time
+
+from newt import (
+    Queue,
+    DelayQueue
+)
+from newt.tracing import Sketch
+
+
+def test_sketch():
+    sketch = Sketch(0.01)
+    assert sketch.percentile(50) == 0.
+
+    for i in range(1, 10001):
+        sketch.add(i / 1000)
+
+    assert sketch.count == 10000
+    assert sketch.min == 0.001
+    assert sketch.max == 10.
+    assert sketch.percentile(50) == pytest.approx(5., rel=0.01)
+    assert sketch.percentile(99) == pytest.approx(9.9, rel=0.01)
+    assert sketch.percentile(100) == 10.
+
+    sketch.add(0.)
+    assert sketch.percentile(0) == 0.
+
+    with pytest.raises(ValueError):
+        Sketch(1)
+
+
+def test_sampling():
+    q = Queue()
+    assert q.trace_snapshot() is None
+
+    with pytest.raises(ValueError):
+        q.enable_tracing(0)
+
+    q.enable_tracing(0.1)
+
+    for i in range(100):
+        q.sync_queue.put(i)
+    # The same object could be put more than once
+    q.sync_queue.put_many([None] * 10)
+
+    assert len(q.sync_queue.get_many(200)) == 110
+
+    snapshot = q.trace_snapshot()
+    assert snapshot['sync->sync']['count'] == 11
+    assert snapshot['sync->async']['count'] == 0
+    assert q._tracer._pending == 0
+
+    q.disable_tracing()
+    assert q.trace_snapshot() is None
+
+
+def test_dropped_items_are_forgotten():
+    q = Queue(1, overflow='drop_oldest')
+    q.enable_tracing(1)
+
+    q.sync_queue.put(1)
+    q.sync_queue.put(2)
+    assert q._tracer._pending == 1
+
+    assert q.sync_queue.get() == 2
+    assert q.trace_snapshot()['sync->sync']['count'] == 1
+
+
+def test_not_traceable():
+    with pytest.raises(TypeError, match='DelayQueue does not support'):
+        DelayQueue().enable_tracing()
+
+
+@pytest.mark.asyncio
+async def test_directions():
+    q = Queue()
+    q.enable_tracing(1)
+    loop = asyncio.get_running_loop()
+
+    await q.async_queue.put(1)
+    assert await loop.run_in_executor(None, q.sync_queue.get) == 1
+
+    await loop.run_in_executor(None, q.sync_queue.put, 2)
+    assert await q.async_queue.get() == 2
+
+    await q.async_queue.put(3)
+    assert q.async_queue.get_nowait() == 3
+
+    # Handed directly to a waiting getter
+    getter = asyncio.ensure_future(q.async_queue.get())
+    await asyncio.sleep(0)
+
+    thread = threading.Thread(target=q.sync_queue.put, args=(4,))
+    thread.start()
+    thread.join()
+    assert await getter == 4
+
+    snapshot = q.trace_snapshot()
+    assert snapshot['async->sync']['count'] == 1
+    assert snapshot['sync->async']['count'] == 2
+    assert snapshot['async->async']['count'] == 1
+    assert snapshot['sync->sync']['count'] == 0
+    assert snapshot['sync->async']['max'] > 0
+
+    q.close()
+    await q.wait_closed()
+
+
+def test_only_distinct_objects_are_told_apart():
+    q = Queue()
+    q.enable_tracing(0.5)
+
+    # Equal, but distinct objects
+    first, second = [1], [1]
+    q.sync_queue.put(first)
+    time.sleep(0.05)
+    q.sync_queue.put(second)
+
+    assert q.sync_queue.get() is first
+    assert q.trace_snapshot()['sync->sync']['count'] == 0
+    assert q.sync_queue.get() is second
+    assert q.trace_snapshot()['sync->sync']['max'] < 0.05
+
+    # The same object put twice could not be told apart, so the get of
+    # the first put is matched to the stamp of the second one
+    item = object()
+    q.sync_queue.put(item)
+    q.sync_queue.put(item)
+    q.sync_queue.get()
+    assert q.trace_snapshot()['sync->sync']['count'] == 2